@@ -0,0 +1,82 @@
+"""
+微基准：单次扫描的 ParsedOutput 解析 vs 旧式"每个问题各扫一遍全文"。
+
+用法: python benchmarks/bench_parse.py [--sizes 1 10 50] [--repeat 3]
+(sizes 单位 MB，会在临时目录生成合成的 Gaussian / ORCA opt+freq 输出)
+"""
+import argparse
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from src.parsers import parse_output  # noqa: E402
+from mock_program import write_gaussian_out, write_orca_out  # noqa: E402
+
+def write_gaussian(path: Path, size_mb: float):
+    """合成 Gaussian opt+freq 日志：大量优化步 + 尾部频率/热化学/终止"""
+    write_gaussian_out(path, size_mb, n_atoms=40)
+
+def write_orca(path: Path, size_mb: float):
+    write_orca_out(path, size_mb, n_atoms=40)
+
+# ---------- 旧实现：整文件读入 + 每个问题各自扫描 ----------
+def legacy_gaussian(path: Path):
+    with open(path, 'r', encoding='latin-1', errors='ignore') as f: c = f.read()
+    failed = "Error termination" in c or "severe error" in c
+    finished = "Normal termination" in c
+    converged = "Stationary point found" in c
+    parts = c.split("Harmonic frequencies")
+    m = re.search(r"Frequencies\s*--\s*(.*)", parts[-1]) if len(parts) > 1 else None
+    imag = bool(m) and any(float(x) < -0.1 for x in m.group(1).split())
+    cm = re.search(r"Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)", c)
+    idx = c.rfind("Standard orientation")
+    coords = c[idx:].split('\n')[:60]
+    scf = re.findall(r"SCF Done:.*=\s*(-?\d+\.\d+)", c)
+    g = re.search(r"Thermal correction to Gibbs Free Energy=\s*(-?\d+\.\d+)", c)
+    return failed, finished, converged, imag, cm, coords, scf[-1], g
+
+def legacy_orca(path: Path):
+    with open(path, 'r', encoding='latin-1', errors='ignore') as f: c = f.read()
+    finished = "ORCA TERMINATED NORMALLY" in c
+    failed = "ORCA finished by error" in c or "FATAL ERROR" in c
+    converged = "THE OPTIMIZATION HAS CONVERGED" in c
+    blk = c.split("VIBRATIONAL FREQUENCIES")[-1]
+    imag = any(float(f) < -0.1 for f in re.findall(r":\s+(-?\d+\.\d+)\s+cm\*\*-1", blk))
+    cm = re.search(r"\*\s+xyz\s+(-?\d+)\s+(\d+)", c)
+    cnt = c.split("FINAL ENERGY EVALUATION AT THE STATIONARY POINT")[-1]
+    coords = cnt.split("CARTESIAN COORDINATES (ANGSTROEM)")[1].strip().split('\n')[:60]
+    e = re.search(r"FINAL SINGLE POINT ENERGY\s+(-?\d+\.\d+)", c)
+    g = re.search(r"G-E\(el\)\s+.*?(-?\d+\.\d+)\s+Eh", c)
+    return finished, failed, converged, imag, cm, coords, e, g
+
+def best_of(fn, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter(); fn(path); best = min(best, time.perf_counter() - t0)
+    return best
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=float, nargs="+", default=[1, 10, 50], help="合成输出大小 (MB)")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+
+    print(f"{'program':<10}{'size':>10}{'legacy (ms)':>14}{'record (ms)':>14}{'speedup':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for program, writer, legacy in [("gaussian", write_gaussian, legacy_gaussian),
+                                        ("orca", write_orca, legacy_orca)]:
+            for size in args.sizes:
+                path = Path(tmp) / f"{program}_{size}.out"
+                writer(path, size)
+                real_mb = path.stat().st_size / 1e6
+                assert parse_output(path).status(is_opt=True) == ("DONE", "")
+                t_old = best_of(legacy, path, args.repeat)
+                t_new = best_of(parse_output, path, args.repeat)
+                print(f"{program:<10}{real_mb:>8.1f}MB{t_old*1e3:>14.2f}{t_new*1e3:>14.2f}{t_old/t_new:>9.1f}x")
+                path.unlink()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,455 @@
+"""
+宏观基准：在合成的"战役规模"目录树上测量各热路径
+(全量扫描 / 增量扫描 / 输出解析 / Tracker 写盘 / Sweeper 扫描 / 结果库)。
+
+每一项都在独立的子进程中运行，互不污染缓存和峰值内存，报告：
+  wall_s          墙钟时间
+  cpu_s           用户态 + 内核态 CPU 时间
+  peak_rss_kb     子进程峰值 RSS（含解释器与导入的基线）
+  rss_growth_kb   计时区间内峰值 RSS 的增长
+  sys_read / sys_write / read_mb / write_mb   来自 /proc/self/io (仅 Linux)
+结果写成 JSON，可用 --compare 在两次提交之间对比。
+
+用法:
+  python benchmarks/bench_suite.py                                   # 默认 2000 分子
+  python benchmarks/bench_suite.py --molecules 10000 --extra 2000 --big 1 50 200
+  python benchmarks/bench_suite.py --only scan_cold parse_large --out before.json
+  python benchmarks/bench_suite.py --only thermo_qrrho thermo_grid:1 thermo_grid:100 --molecules 10000 --modes 300
+  python benchmarks/bench_suite.py --compare before.json after.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+REPO = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+
+from mock_program import write_gaussian_out, write_orca_out  # noqa: E402
+
+STEPS = ["opt", "gas", "solv", "sp"]
+
+
+# ================= 合成目录树 =================
+def tree_params(args) -> Dict[str, object]:
+    return {"molecules": args.molecules, "extra": args.extra, "big": args.big, "atoms": args.atoms, "v": 1}
+
+
+def generate_tree(root: Path, params: Dict[str, object]):
+    """
+    生成与真实工作目录相同布局的合成树：
+    xyz/、data/{opt,gas,solv,sp}/ (输入 + 输出)、extra_jobs/ (分子目录)、big/ (大输出)。
+    opt/gas/solv 用 Gaussian，sp 用 ORCA；每 10 个分子有 1 个缺少 sp 输出 (模拟进行中)。
+    """
+    if root.exists(): shutil.rmtree(root)
+    n_mol, n_extra, atoms = int(params["molecules"]), int(params["extra"]), int(params["atoms"])
+    tmp = root / "tmpl"
+    tmp.mkdir(parents=True)
+    write_gaussian_out(tmp / "g.out", 0, n_atoms=atoms)
+    write_orca_out(tmp / "o.out", 0, n_atoms=atoms)
+    g_out, o_out = (tmp / "g.out").read_bytes(), (tmp / "o.out").read_bytes()
+    shutil.rmtree(tmp)
+
+    xyz_dir = root / "xyz"
+    xyz_dir.mkdir()
+    dirs = {s: root / "data" / s for s in STEPS}
+    for d in dirs.values(): d.mkdir(parents=True)
+    xyz = "2\nCharge=0 Multiplicity=1\nC 0 0 0\nH 0 0 1\n"
+    for i in range(n_mol):
+        mol = f"m{i:05d}"
+        (xyz_dir / f"{mol}.xyz").write_text(xyz)
+        for step in STEPS:
+            ext, out = (".inp", o_out) if step == "sp" else (".gjf", g_out)
+            (dirs[step] / f"{mol}_{step}{ext}").write_text("%nprocshared=16\nMock\n")
+            if step == "sp" and i % 10 == 9: continue
+            (dirs[step] / f"{mol}_{step}.out").write_bytes(out)
+
+    extra = root / "extra_jobs"
+    extra.mkdir()
+    for j in range(n_extra):
+        sub = extra / f"batch{j % 20:02d}"
+        sub.mkdir(exist_ok=True)
+        (sub / f"e{j:05d}.gjf").write_text("Mock\n")
+        if j % 4: (sub / f"e{j:05d}.out").write_bytes(g_out)
+
+    big = root / "big"
+    big.mkdir()
+    for mb in params["big"]:
+        write_gaussian_out(big / f"gaussian_{mb:g}MB.out", mb, n_atoms=40)
+        write_orca_out(big / f"orca_{mb:g}MB.out", mb, n_atoms=40)
+    (root / "params.json").write_text(json.dumps(params))
+
+
+def ensure_tree(base: Path, params: Dict[str, object]) -> Path:
+    """同一组参数的树只生成一次，之后直接复用"""
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:10]
+    root = base / f"gibbs-bench-{digest}"
+    marker = root / "params.json"
+    if not (marker.exists() and json.loads(marker.read_text()) == params):
+        t0 = time.perf_counter()
+        print(f"Generating synthetic tree at {root} ...", file=sys.stderr)
+        generate_tree(root, params)
+        print(f"  done in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return root
+
+
+def point_config_at(root: Path):
+    from src import config
+    config.XYZ_DIR = root / "xyz"
+    config.TEMPLATE_DIR = root / "templates"
+    config.DATA_DIR = root / "data"
+    config.SWEEPER_DIR = root / "extra_jobs"
+    config.DIRS = {s: root / "data" / s for s in STEPS}
+
+
+# ================= 计量 =================
+def _proc_io() -> Dict[str, int]:
+    try:
+        with open("/proc/self/io") as f:
+            return {k: int(v) for k, v in (line.split(":") for line in f)}
+    except OSError:
+        return {}
+
+
+def _maxrss_kb() -> int:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss  # macOS 以字节计
+
+
+def measure(fn: Callable[[], Optional[Dict[str, object]]]) -> Dict[str, object]:
+    io0, rss0, ru0 = _proc_io(), _maxrss_kb(), resource.getrusage(resource.RUSAGE_SELF)
+    t0 = time.perf_counter()
+    extra = fn() or {}
+    wall = time.perf_counter() - t0
+    ru1, io1 = resource.getrusage(resource.RUSAGE_SELF), _proc_io()
+    out = {
+        "wall_s": wall,
+        "cpu_s": (ru1.ru_utime - ru0.ru_utime) + (ru1.ru_stime - ru0.ru_stime),
+        "peak_rss_kb": _maxrss_kb(),
+        "rss_growth_kb": _maxrss_kb() - rss0,
+    }
+    if io0:
+        out.update(sys_read=io1["syscr"] - io0["syscr"], sys_write=io1["syscw"] - io0["syscw"],
+                   read_mb=(io1["rchar"] - io0["rchar"]) / 1e6, write_mb=(io1["wchar"] - io0["wchar"]) / 1e6)
+    out.update(extra)
+    return out
+
+
+# ================= 热路径 =================
+# 每个 setup(root, state_dir, args) 做完不计时的准备工作，返回被计时的函数
+
+def _workflow(state: Path, backend: str = "json", cache: bool = True):
+    from src.job_manager import JobManager
+    from src.parse_cache import ParseCache
+    from src.sweeper import TaskSweeper
+    from src.tracker import StatusTracker
+    tracker = StatusTracker(str(state / "task_status.json"), backend=backend)
+    mgr = JobManager(tracker, parse_cache=ParseCache(str(state / "parse_cache.json")) if cache else None)
+    return tracker, mgr, TaskSweeper(mgr)
+
+
+def setup_scan_cold(root, state, args):
+    from main import perform_full_scan
+    tracker, mgr, sweeper = _workflow(state, args.backend)
+    return lambda: perform_full_scan(tracker, mgr, sweeper)
+
+
+def setup_scan_warm(root, state, args):
+    """同一进程内的第二次全量扫描：解析全部命中缓存、状态无变化"""
+    from main import perform_full_scan
+    tracker, mgr, sweeper = _workflow(state, args.backend)
+    perform_full_scan(tracker, mgr, sweeper)
+    def run():
+        perform_full_scan(tracker, mgr, sweeper)
+        return {"cache_hits": mgr.parse_cache.hits}
+    return run
+
+
+def setup_scan_restart(root, state, args):
+    """重启后的第一次扫描：计时包含从磁盘加载 Tracker 与解析缓存"""
+    from main import perform_full_scan
+    tracker, mgr, sweeper = _workflow(state, args.backend)
+    perform_full_scan(tracker, mgr, sweeper)
+    tracker.close()
+    def run():
+        t, m, s = _workflow(state, args.backend)
+        perform_full_scan(t, m, s)
+        t.close()
+    return run
+
+
+def setup_scan_incremental(root, state, args):
+    """事件驱动路径：只刷新一个分子 (classify_changes 之后的典型调用)"""
+    from main import perform_full_scan, scan_xyz
+    from src import config
+    tracker, mgr, sweeper = _workflow(state, args.backend)
+    perform_full_scan(tracker, mgr, sweeper)
+    xyz_files = scan_xyz(config.XYZ_DIR)
+    mol = xyz_files[len(xyz_files) // 2].stem
+    def run():
+        for _ in range(100): perform_full_scan(tracker, mgr, sweeper, xyz_files, mols={mol}, sweep=False)
+        return {"iterations": 100}
+    return run
+
+
+def setup_parse_small(root, state, args):
+    """无缓存解析全部 KB 级输出 (get_parser + parse)"""
+    from src.parsers import parse_output
+    files = sorted((root / "data").rglob("*.out"))
+    def run():
+        for f in files: parse_output(f).status(is_opt=True)
+        return {"files": len(files)}
+    return run
+
+
+def setup_parse_large(root, state, args):
+    from src.parsers import parse_output
+    files = sorted((root / "big").glob("*.out"), key=lambda p: p.stat().st_size)
+    def run():
+        per_file = {}
+        for f in files:
+            t0 = time.perf_counter()
+            assert parse_output(f).status(is_opt=True) == ("DONE", ""), f
+            per_file[f.name] = time.perf_counter() - t0
+        return {"per_file_s": per_file}
+    return run
+
+
+def _preloaded_tracker(state: Path, backend: str, n: int):
+    from src.tracker import StatusTracker
+    tracker = StatusTracker(str(state / "task_status.json"), backend=backend)
+    with tracker.batch():
+        for i in range(n):
+            for step in STEPS: tracker.finish_task(f"m{i:05d}", step, "DONE")
+    return tracker
+
+
+def _setup_tracker(backend: str, batched: bool):
+    def setup(root, state, args):
+        tracker = _preloaded_tracker(state, backend, args.molecules)
+        n = args.molecules if batched else min(args.tracker_updates, args.molecules)
+        def run():
+            if batched:
+                with tracker.batch():
+                    for i in range(n): tracker.finish_task(f"m{i:05d}", "sp", "ERR_NC", "bench")
+            else:
+                for i in range(n): tracker.finish_task(f"m{i:05d}", "sp", "ERR_NC", "bench")
+            tracker.close()
+            return {"updates": n}
+        return run
+    return setup
+
+
+def setup_sweeper_scan(root, state, args):
+    tracker, mgr, sweeper = _workflow(state, args.backend)
+    def run():
+        with tracker.batch(): sweeper.scan()
+        return {"jobs": sum(1 for k in tracker.data if k.startswith("[Extra]"))}
+    return run
+
+
+def setup_results_upsert(root, state, args):
+    from src.results_store import ResultsStore
+    store = ResultsStore(str(state / "results.db"), legacy_csv=None)
+    row = {"G_Final (kcal/mol)": -62698.8, "E_SP (Ha)": -100.0, "E_Gas (Ha)": -100.0, "E_Solv (Ha)": -100.0,
+           "Thermal_Corr (Ha)": 0.08, "dG_Solv (kcal/mol)": 0.0, "G_Final (Ha)": -99.9}
+    def run():
+        for i in range(args.molecules): store.upsert(f"m{i:05d}", row, f"fp{i}")
+        store.close()
+        return {"rows": args.molecules}
+    return run
+
+
+def setup_results_export(root, state, args):
+    run_upsert = setup_results_upsert(root, state, args)
+    run_upsert()
+    from src.results_store import ResultsStore
+    store = ResultsStore(str(state / "results.db"), legacy_csv=None)
+    return lambda: store.export_csv(str(state / "results.csv"))
+
+
+def setup_ingest_ensemble(root, state, args):
+    """多帧 xyz 展开为 --molecules 个分子，并为每帧渲染 opt 输入 (模板只编译一次)"""
+    from src import config
+    from src.opt_generator import OptGenerator
+    from src.xyz_stream import EnsembleIngestor
+    xyz_dir, tpl_dir = state / "xyz", state / "templates"
+    xyz_dir.mkdir()
+    tpl_dir.mkdir()
+    (tpl_dir / "opt.gjf").write_text("%nprocshared=16\n# opt freq b3lyp/6-31g(d)\n\n[NAME]\n\n"
+                                     "[Charge] [Multiplicity]\n[GEOMETRY]\n\n")
+    config.XYZ_DIR, config.TEMPLATE_DIR = xyz_dir, tpl_dir
+    config.DIRS = {**config.DIRS, "opt": state / "opt"}
+    atoms = "".join(f"C {i * 0.1:.6f} {i * 0.2:.6f} {i * 0.3:.6f}\n" for i in range(args.atoms))
+    with open(xyz_dir / "ens.xyz", "w") as f:
+        for i in range(args.molecules):
+            f.write(f"{args.atoms}\n{'Charge=0 Multiplicity=1' if i == 0 else ''} E={-100 - i * 1e-4:.6f}\n{atoms}")
+    def run():
+        frames = EnsembleIngestor(xyz_dir).expand([xyz_dir / "ens.xyz"])
+        gen = OptGenerator()
+        for p in xyz_dir.glob("*.xyz"): gen.generate(p)
+        return {"frames": frames}
+    return run
+
+
+def _freq_records(args):
+    """--molecules 个带 --modes 个振动模式的合成 opt 记录 (含低频，每 20 个有一个虚频)"""
+    import numpy as np
+    from src.parsers import ParsedOutput
+    rng = np.random.default_rng(0)
+    records = {}
+    for i in range(args.molecules):
+        freqs = np.sort(rng.uniform(5.0, 3500.0, args.modes))
+        freqs[0] = -rng.uniform(0, 50) if i % 20 == 0 else freqs[0]
+        records[f"m{i:05d}"] = ParsedOutput("gaussian", True, False, True, False, 0, 1, None, -100.0, 0.08,
+                                            tuple(freqs.tolist()), 100.0 + i % 500,
+                                            tuple(rng.uniform(0.1, 5.0, 3).tolist()), 1)
+    return records
+
+
+def setup_thermo_qrrho(root, state, args):
+    """--molecules 个分子 × --modes 个振动模式的 quasi-RRHO 热校正整批计算"""
+    from src.thermo import thermal_corrections
+    records = _freq_records(args)
+    def run():
+        corr = thermal_corrections(records, method="grimme")
+        return {"molecules": len(corr), "modes": args.modes}
+    return run
+
+
+def _setup_thermo_grid(n_temps: int):
+    """同样的分子在 n_temps 个温度 × 2 个浓度上求 G 网格 (含打包、写 npz / CSV)"""
+    def setup(root, state, args):
+        from src.grid import evaluate_grid, write_grid
+        records = _freq_records(args)
+        energies = {m: {"sp": -100.0, "gas": -100.0, "solv": -100.01} for m in records}
+        def run():
+            grid = evaluate_grid(records, energies, [298.15] if n_temps == 1 else
+                                 [200.0 + 300.0 * i / (n_temps - 1) for i in range(n_temps)], [1.0], [1.0, 0.1],
+                                 method="grimme")
+            write_grid(grid, state / "grid")
+            return {"points": int(grid.g[0].size)}
+        return run
+    return setup
+
+
+BENCHES: Dict[str, Callable] = {
+    "scan_cold": setup_scan_cold,
+    "scan_warm": setup_scan_warm,
+    "scan_restart": setup_scan_restart,
+    "scan_incremental": setup_scan_incremental,
+    "parse_small": setup_parse_small,
+    "parse_large": setup_parse_large,
+    "sweeper_scan": setup_sweeper_scan,
+    "results_upsert": setup_results_upsert,
+    "results_export": setup_results_export,
+    "ingest_ensemble": setup_ingest_ensemble,
+    "thermo_qrrho": setup_thermo_qrrho,
+    "thermo_grid:1": _setup_thermo_grid(1),
+    "thermo_grid:100": _setup_thermo_grid(100),
+}
+for _backend in ["json", "journal", "sqlite"]:
+    BENCHES[f"tracker_single:{_backend}"] = _setup_tracker(_backend, batched=False)
+    BENCHES[f"tracker_batch:{_backend}"] = _setup_tracker(_backend, batched=True)
+
+
+# ================= 子进程 / 汇总 =================
+def run_child(name: str, root: Path, args) -> Dict[str, object]:
+    point_config_at(root)
+    with tempfile.TemporaryDirectory(prefix="gibbs-bench-state-") as state:
+        run = BENCHES[name](root, Path(state), args)
+        return measure(run)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def fmt_row(name: str, r: Dict[str, object]) -> str:
+    if "error" in r: return f"{name:<24} ERROR {r['error']}"
+    return (f"{name:<24}{r['wall_s']*1e3:>11.1f}{r['cpu_s']*1e3:>11.1f}{r['peak_rss_kb']/1024:>10.1f}"
+            f"{r['rss_growth_kb']/1024:>10.1f}{r.get('sys_read', '-'):>10}{r.get('sys_write', '-'):>10}")
+
+
+def compare(old_file: str, new_file: str, threshold: float) -> int:
+    old, new = (json.loads(Path(f).read_text()) for f in (old_file, new_file))
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']}  (threshold {threshold:.0%})")
+    print(f"{'benchmark':<24}{'metric':<14}{'old':>12}{'new':>12}{'ratio':>9}")
+    regressions = 0
+    for name, n in new["results"].items():
+        o = old["results"].get(name)
+        if not o or "error" in o or "error" in n: continue
+        for metric in ["wall_s", "peak_rss_kb", "sys_read", "sys_write"]:
+            if metric not in o or metric not in n: continue
+            ratio = n[metric] / o[metric] if o[metric] else (1.0 if not n[metric] else float("inf"))
+            flag = ""
+            # 墙钟时间太短时噪声主导，不计为回归
+            if ratio > 1 + threshold and not (metric == "wall_s" and n[metric] < 0.005):
+                flag, regressions = "  <-- regression", regressions + 1
+            print(f"{name:<24}{metric:<14}{o[metric]:>12.4g}{n[metric]:>12.4g}{ratio:>8.2f}x{flag}")
+    return 1 if regressions else 0
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--molecules", type=int, default=2000)
+    ap.add_argument("--extra", type=int, default=500, help="extra_jobs 中的任务数")
+    ap.add_argument("--big", type=float, nargs="*", default=[1, 50], help="大输出文件大小 (MB)")
+    ap.add_argument("--atoms", type=int, default=20, help="合成输出中每个结构的原子数")
+    ap.add_argument("--tracker-updates", type=int, default=200,
+                    help="逐条写盘 (tracker_single) 的更新次数，整文件后端为 O(N) 每次")
+    ap.add_argument("--modes", type=int, default=300, help="thermo_qrrho 中每个分子的振动模式数")
+    ap.add_argument("--backend", default="json", help="扫描类基准使用的 Tracker 后端")
+    ap.add_argument("--only", nargs="+", choices=sorted(BENCHES), metavar="NAME")
+    ap.add_argument("--tree-dir", default=tempfile.gettempdir(), help="合成树的存放目录 (按参数复用)")
+    ap.add_argument("--out", default="bench_results.json")
+    ap.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="对比两个结果文件后退出")
+    ap.add_argument("--threshold", type=float, default=0.10, help="--compare 判定回归的比例")
+    ap.add_argument("--child", help=argparse.SUPPRESS)
+    ap.add_argument("--root", help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+
+    if args.compare: return compare(*args.compare, args.threshold)
+    if args.child:
+        print(json.dumps(run_child(args.child, Path(args.root), args)))
+        return 0
+
+    params = tree_params(args)
+    root = ensure_tree(Path(args.tree_dir), params)
+    passthrough = ["--molecules", str(args.molecules), "--tracker-updates", str(args.tracker_updates),
+                   "--backend", args.backend, "--modes", str(args.modes)]
+    results = {}
+    print(f"{'benchmark':<24}{'wall ms':>11}{'cpu ms':>11}{'rss MB':>10}{'+rss MB':>10}{'reads':>10}{'writes':>10}")
+    for name in args.only or BENCHES:
+        proc = subprocess.run([sys.executable, __file__, "--child", name, "--root", str(root), *passthrough],
+                              cwd=REPO, capture_output=True, text=True)
+        if proc.returncode == 0:
+            results[name] = json.loads(proc.stdout.strip().splitlines()[-1])
+        else:
+            results[name] = {"error": (proc.stderr.strip().splitlines() or ["failed"])[-1]}
+        print(fmt_row(name, results[name]), flush=True)
+
+    meta = {"commit": git_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(), "platform": platform.platform(),
+            "cpu_count": os.cpu_count(), "params": params, "tracker_updates": args.tracker_updates,
+            "backend": args.backend}
+    Path(args.out).write_text(json.dumps({"meta": meta, "results": results}, indent=2))
+    print(f"\nResults written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,33 @@
 import os
 import time, sys
+import argparse
 import threading
 from pathlib import Path
 from src import config
-from src.parsers import get_parser
 from src.opt_generator import OptGenerator
-from src.sub_generator import SubGenerator
-from src.job_manager import JobManager
+from src.sub_generator import SubGenerator, pack_dir
+from src.job_manager import JobManager, stop_marker
+from src.executors import create_executor, EXECUTORS
+from src.staging import ScratchStager
+from src.compression import OutputCompressor, METHODS
+from src.parsers import find_output as find_output_file, COMPRESSED_SUFFIXES
+from src.summary import rebuild_summaries, summary_path, SUMMARY_SUFFIX
+from src.parse_cache import ParseCache
 from src.tracker import StatusTracker
 from src.calculator import ThermodynamicsCalculator
+from src.results_store import ResultsStore, fingerprint
 from src.sweeper import TaskSweeper
 from src.tui import GibbsApp
+from src.headless import HeadlessRunner
+from src.watcher import create_watcher
+from src.scheduler import DagScheduler, SUB_STEPS
+from src.restarter import OptRestarter
+from src.result_cache import ResultCache
+from src.xyz_stream import EnsembleIngestor
+from src.thermo import QRRHO_METHODS
+from src.grid import grid_from_results, parse_axis, write_grid
+from src.reactions import ReactionMonitor
+from src.work_queue import WorkQueue, file_priority, PRIORITY_SUFFIX
 
 def scan_xyz(d): 
     return sorted(list(d.glob("*.xyz")), key=lambda x: x.stat().st_mtime)
@@ -20,165 +37,371 @@ def cleanup_sub_tasks(mol: str):
         for e in config.VALID_EXTENSIONS:
             inp = config.DIRS[t] / f"{mol}_{t}{e}"
             if inp.exists(): inp.unlink()
-        out = next((config.DIRS[t]/f"{mol}_{t}{e}" for e in [".out", ".log"] if (config.DIRS[t]/f"{mol}_{t}{e}").exists()), None)
-        if out and out.exists(): out.unlink()
+        for e in [".out", ".log"]:
+            for z in ("", *COMPRESSED_SUFFIXES):
+                out = config.DIRS[t] / f"{mol}_{t}{e}{z}"
+                if out.exists(): out.unlink()
+        summary = summary_path(config.DIRS[t] / f"{mol}_{t}.out")
+        if summary.exists(): summary.unlink()
+        stop_marker(config.DIRS[t] / f"{mol}_{t}").unlink(missing_ok=True)
+    for f in pack_dir().glob(f"{mol}_pack.*"): f.unlink()
 
 # --- 新增：全局状态扫描函数 ---
-def perform_full_scan(tracker, mgr, sweeper):
-    """扫描所有任务（主流程+Sweeper）并更新 Tracker，确保仪表盘实时反映所有文件状态"""
+def perform_full_scan(tracker, mgr, sweeper, xyz_files=None, mols=None, sweep=True):
+    """
+    扫描所有任务（主流程+Sweeper）并更新 Tracker，确保仪表盘实时反映所有文件状态。
+    事件驱动模式下可只刷新 mols 中的分子 (None = 全部)，sweep=False 时跳过 extra_jobs。
+    """
     
-    # 1. 扫描主流程任务
-    xyz_files = scan_xyz(config.XYZ_DIR)
-    tracker.set_order([f.stem for f in xyz_files]) # 立即更新列表顺序
+    # 整轮扫描的状态变化合并为一次写盘
+    with tracker.batch():
+        # 1. 扫描主流程任务
+        if xyz_files is None: xyz_files = scan_xyz(config.XYZ_DIR)
+        tracker.set_order([f.stem for f in xyz_files]) # 立即更新列表顺序
 
-    for xyz in xyz_files:
-        mol = xyz.stem
-        tracker.mark_xyz_found(mol)
+        for xyz in xyz_files:
+            mol = xyz.stem
+            if mols is not None and mol not in mols: continue
+            tracker.mark_xyz_found(mol)
         
-        # 检查所有步骤的状态
-        for step in ["opt", "gas", "solv", "sp"]:
-            # 尝试寻找输出文件 (.out 优先, 然后 .log)
-            out_file = None
-            base_path = config.DIRS[step] / f"{mol}_{step}"
-            if base_path.with_suffix(".out").exists():
-                out_file = base_path.with_suffix(".out")
-            elif base_path.with_suffix(".log").exists():
-                out_file = base_path.with_suffix(".log")
+            # 检查所有步骤的状态
+            for step in ["opt", "gas", "solv", "sp"]:
+                # 正在槽位中运行的任务由 JobManager 负责结算，这里不覆盖 RUNNING 状态
+                if mgr.is_running(mol, step): continue
+
+                # 尝试寻找输出文件 (.out 优先, 然后 .log；已压缩的 .gz / .zst 同样识别)
+                out_file = find_output_file(config.DIRS[step] / f"{mol}_{step}")
             
-            # 获取并更新状态
-            if out_file:
-                st, err = mgr.get_status_from_file(out_file, is_opt=(step=="opt"))
-                tracker.finish_task(mol, step, st, err)
-            else:
-                # 如果没有输出文件，也要更新为 MISSING (TUI显示为 PENDING)
-                # 这样可以防止之前显示 DONE 但文件被删的情况
-                # 注意：如果任务正在运行(RUNNING)，这里检查不到 output 是正常的，
-                # 但 finish_task 会保留 RUNNING 状态吗？
-                # JobManager 会在 start_task 时设为 RUNNING。
-                # 如果我们在这里设为 MISSING，会覆盖 RUNNING 吗？
-                # 答：会。所以我们需要判断一下，如果是 RUNNING 且进程还在，跳过更新？
-                # 简化处理：StatusTracker.finish_task 内部逻辑是直接覆盖。
-                # 在单线程模型中，如果代码运行到这里，说明没有任务在 submit_and_wait 阻塞中。
-                # 所以此时应该没有 RUNNING 的任务（除非是异常退出的）。
-                # 所以直接更新是可以的。
-                tracker.finish_task(mol, step, "MISSING", "")
-
-    # 2. 扫描 Sweeper 任务
-    sweeper.scan()
-
-
-def main():
-    tracker = StatusTracker()
-    mgr = JobManager(tracker)
-    opt_gen, sub_gen, sweeper = OptGenerator(), SubGenerator(), TaskSweeper(mgr)
+                # 获取并更新状态
+                if out_file:
+                    st, err = mgr.get_status_from_file(out_file, is_opt=(step=="opt"))
+                    tracker.finish_task(mol, step, st, err)
+                    mgr.compress_output(out_file, st)
+                elif stop_marker(config.DIRS[step] / f"{mol}_{step}").exists():
+                    # 用户手动停止、还没有输出的任务保持 Stopped，不会被当作未开始重新提交
+                    tracker.finish_task(mol, step, "ERROR", "Stopped")
+                else:
+                    # 如果没有输出文件，也要更新为 MISSING (TUI显示为 PENDING)
+                    # 这样可以防止之前显示 DONE 但文件被删的情况
+                    # 正在运行的任务已在上面跳过，这里不会覆盖 RUNNING 状态
+                    tracker.finish_task(mol, step, "MISSING", "")
+
+        # 2. 扫描 Sweeper 任务
+        if sweep: sweeper.scan()
+
+    # 3. 解析缓存落盘 (仅在有新解析结果时写)
+    if mgr.parse_cache: mgr.parse_cache.save()
+
+
+def classify_changes(paths):
+    """
+    把监视器报告的变化文件映射为需要刷新的范围：
+    (xyz 列表是否变化, 受影响的分子集合 (None = 全部), 是否需要扫描 extra_jobs)
+    """
+    xyz_changed, mols, sweep = False, set(), False
+    step_dirs = {d: step for step, d in config.DIRS.items()}
+    for p in paths:
+        # 摘要文件由本进程在解析后写出，不代表输出有变化
+        if p.name.endswith(SUMMARY_SUFFIX): continue
+        if p.parent == config.XYZ_DIR:
+            if p.suffix == ".xyz": xyz_changed = True
+            # 优先级旁车文件 (<mol>.prio) 只影响该分子
+            if p.suffix in (".xyz", PRIORITY_SUFFIX) and mols is not None: mols.add(p.stem)
+        elif p == config.SWEEPER_DIR or config.SWEEPER_DIR in p.parents:
+            sweep = True
+        elif p.parent in step_dirs:
+            step = step_dirs[p.parent]
+            stem = p.name.split(".")[0]
+            if stem.endswith(f"_{step}") and mols is not None: mols.add(stem[:-len(step) - 1])
+        else:
+            # 模板变化或目录本身被删除/重建：影响所有分子
+            mols = None
+    return xyz_changed, mols, sweep
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Automated Gibbs Free Energy Workflow")
+    ap.add_argument("--max-concurrent", type=int, default=config.MAX_CONCURRENT,
+                    help="同时运行的任务槽位数 (默认 1 = 阻塞式逐个运行)")
+    ap.add_argument("--cores", type=int, default=config.CORES_BUDGET,
+                    help="总核数预算，按输入文件中的 %%nprocshared / %%pal nprocs 计")
+    ap.add_argument("--state-backend", choices=["json", "journal", "sqlite"], default=config.TRACKER_BACKEND,
+                    help="任务状态持久化后端")
+    ap.add_argument("--watch", choices=["auto", "inotify", "poll"], default=config.WATCH_MODE,
+                    help="文件变化监视方式 (auto: Linux 上用 inotify，否则自适应轮询)")
+    ap.add_argument("--executor", choices=list(EXECUTORS), default=config.EXECUTOR,
+                    help="任务执行后端 (local: 本机子进程; slurm: sbatch 提交，批量轮询 squeue)")
+    ap.add_argument("--scratch", metavar="DIR", default=config.SCRATCH_DIR,
+                    help="在节点本地 scratch (如 /dev/shm 或 '$TMPDIR') 的私有目录中运行任务，只复制回声明的产物")
+    ap.add_argument("--compress", choices=list(METHODS), default=config.COMPRESS_OUTPUTS,
+                    help="在后台把已完成的输出压缩为 .out.gz / .out.zst (读取时透明解压)")
+    ap.add_argument("--qrrho", choices=QRRHO_METHODS, default=config.QRRHO,
+                    help="由保存的频率重新计算 quasi-RRHO 热校正 (默认采用程序打印的值)")
+    ap.add_argument("--pack", action="store_true", default=config.PACK_SUBJOBS,
+                    help="把每个分子的 gas/solv/sp 合并为一次运行 (--Link1-- / $new_job)")
+    ap.add_argument("--max-restarts", type=int, default=config.OPT_RESTART_MAX,
+                    help="优化未收敛 / 中断时从最后几何自动续算的次数上限 (默认 0 = 关闭，失败的优化留给人工检查)")
+    ap.add_argument("--no-result-cache", action="store_true",
+                    help="不使用内容寻址结果缓存 (相同输入也重新计算)")
+    ap.add_argument("--headless", action="store_true",
+                    help="不启动界面，输出结构化日志；队列清空后打印吞吐汇总并退出")
+    ap.add_argument("--export-interval", metavar="SECONDS", type=float, default=config.RESULTS_EXPORT_INTERVAL,
+                    help="运行中有新结果时最多每隔多少秒整表导出一次 results.csv (退出时总会导出；0 = 每轮都导出)")
+    ap.add_argument("--export-results", metavar="FILE",
+                    help="把 results.db 导出为 CSV 后退出 (不启动工作流)")
+    ap.add_argument("--grid", metavar="OUT",
+                    help="对结果库中全部分子在 T × P × c 网格上重算 G，写出 OUT.npz 与 OUT.csv 后退出 (不重跑任务)")
+    ap.add_argument("--temps", nargs="+", default=[str(t) for t in config.GRID_TEMPERATURES],
+                    help="网格温度 (K)，可写 START:STOP:NUM，如 200:400:101")
+    ap.add_argument("--pressures", nargs="+", default=[str(p) for p in config.GRID_PRESSURES_ATM],
+                    help="网格压力 (atm)")
+    ap.add_argument("--concs", nargs="+", default=[str(c) for c in config.GRID_CONCENTRATIONS_M],
+                    help="网格浓度 (mol/L)")
+    ap.add_argument("--rebuild-summaries", metavar="WORKERS", type=int, nargs="?", const=0,
+                    help="为 data/ 与 extra_jobs/ 中已有的输出并行重建缺失或过期的摘要文件后退出 (默认进程数 = CPU 数)")
+    args = ap.parse_args(argv)
+    # 网格的 CSV 不能覆盖运行中持续导出的结果表
+    if args.grid and Path(args.grid).with_suffix(".csv").resolve() == Path(config.RESULTS_CSV).resolve():
+        ap.error(f"--grid {args.grid} would overwrite {config.RESULTS_CSV}; choose another name")
+    return args
+
+
+def uses_tui(args) -> bool:
+    """是否启动 Textual 界面 (退出后需要复位终端)；一次性命令和无界面模式不需要"""
+    return not (args.headless or args.export_results or args.grid or args.rebuild_summaries is not None)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.rebuild_summaries is not None:
+        counts = rebuild_summaries([*config.DIRS.values(), config.SWEEPER_DIR], workers=args.rebuild_summaries or None)
+        print("Summaries: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+        return 1 if counts["failed"] else 0
+    results = ResultsStore()
+    if args.grid:
+        config.QRRHO = args.qrrho
+        grid = grid_from_results(results, *(parse_axis(v) for v in (args.temps, args.pressures, args.concs)))
+        results.close()
+        npz, table = write_grid(grid, Path(args.grid))
+        print(f"Grid: {len(grid.molecules)} molecules x {grid.g.shape[1:]} (T, P, c) -> {npz}, {table}")
+        return
+    if args.export_results:
+        results.export_csv(args.export_results)
+        results.close()
+        print(f"Exported results to {args.export_results}")
+        return
+    config.QRRHO = args.qrrho
+    tracker = StatusTracker(backend=args.state_backend)
+    stager = ScratchStager(args.scratch) if args.scratch else None
+    mgr = JobManager(tracker, max_concurrent=args.max_concurrent, cores_budget=args.cores,
+                     parse_cache=ParseCache(), executor=create_executor(args.executor), stager=stager)
+    if args.compress: mgr.compressor = OutputCompressor(args.compress, parse_cache=mgr.parse_cache)
+    result_cache = None if args.no_result_cache else ResultCache()
+    opt_gen, sub_gen, sweeper = OptGenerator(result_cache), SubGenerator(result_cache), TaskSweeper(mgr)
+    restarter = OptRestarter(mgr, max_attempts=args.max_restarts)
     config.SWEEPER_DIR.mkdir(exist_ok=True)
+    for d in config.DIRS.values(): d.mkdir(parents=True, exist_ok=True)
+    watcher = create_watcher([config.XYZ_DIR, config.TEMPLATE_DIR, *config.DIRS.values()],
+                             recursive=[config.SWEEPER_DIR], mode=args.watch)
+    mgr.on_exit = watcher.wake  # 任务一结束就唤醒主循环结算，不必等到超时
     
     stop_event = threading.Event()
 
+    def dispatch(job_in, mol, step, on_done=None) -> bool:
+        """有空闲槽位（且核数够）时非阻塞提交"""
+        if not mgr.has_capacity(mgr.job_cores(job_in)): return False
+        return mgr.submit(job_in, mol, step, on_done=on_done)
+
+    def on_opt_done(mol):
+        def _cb(ok):
+            if ok: cleanup_sub_tasks(mol)
+        return _cb
+
+    def find_input(mol, step):
+        return next((config.DIRS[step]/f"{mol}_{step}{e}" for e in config.VALID_EXTENSIONS if (config.DIRS[step]/f"{mol}_{step}{e}").exists()), None)
+
+    def find_output(mol, step):
+        return find_output_file(config.DIRS[step] / f"{mol}_{step}")
+
+    def on_job_event(event, slot):
+        """成功结束的任务输出存入结果缓存 (打包运行按切分后的各步骤分别存)"""
+        if event != "finish" or result_cache is None: return
+        for out in (slot.outputs.values() if slot.outputs else [slot.output_file]):
+            if mgr.get_status_from_file(out, is_opt=(slot.step == "opt"))[0] == "DONE": result_cache.commit(out)
+
+    mgr.observers.append(on_job_event)
+
+    # 批处理后端：接管上次运行时提交、仍在队列中的作业 (优化任务结束后照常清理旧子任务)
+    if mgr.reattach():
+        for s in mgr.slots.values():
+            if s.step == "opt": s.on_done = on_opt_done(s.mol_name)
+    # 上次运行遗留的 scratch 目录 (保留的失败现场 / 被强杀的任务) 过期后清理
+    if stager: stager.prune(active=[s.job_file.stem for s in mgr.slots.values()])
+
+    def settle(mol, step) -> bool:
+        """输出已经存在 (命中结果缓存) 时直接结算，不再提交"""
+        out = find_output(mol, step)
+        if out is None: return False
+        status, err = mgr.get_status_from_file(out, is_opt=(step == "opt"))
+        tracker.finish_task(mol, step, status, err)
+        if step == "opt" and status == "DONE": cleanup_sub_tasks(mol)
+        return True
+
+    def launch(mol, step) -> bool:
+        """提交任务图中一个就绪的节点；输入文件缺失时先生成"""
+        job_in = find_input(mol, step)
+
+        # --- OPT: 输入由 XYZ 生成；未收敛 / 中断的从最后几何续算 ---
+        if step == "opt":
+            if job_in and restarter.can_restart(mol):
+                if not mgr.has_capacity(mgr.job_cores(job_in)): return False
+                job_in = restarter.prepare(mol) or job_in
+            if not job_in:
+                try:
+                    job_in = opt_gen.generate(config.XYZ_DIR / f"{mol}.xyz")
+                except Exception as e:
+                    tracker.finish_task(mol, "opt", "ERROR", str(e)); return False
+                if settle(mol, "opt"): return False
+            return dispatch(job_in, mol, "opt", on_done=on_opt_done(mol))
+
+        # --- GAS / SOLV / SP: 输入由优化结构生成 (只补齐缺失且未在运行的) ---
+        if not job_in:
+            missing = [t for t in SUB_STEPS if not find_input(mol, t) and not mgr.is_running(mol, t)]
+            if args.pack: missing = [t for t in missing if not find_output(mol, t)]
+            try:
+                record = mgr.get_record(find_output(mol, "opt"), with_coords=True)
+                packed = sub_gen.generate_packed(mol, record.charge, record.mult, record.coordinates, missing) \
+                    if args.pack and record.coordinates is not None else None
+                if packed is None:
+                    missing = [t for t in missing if not find_output(mol, t)]
+                    if missing: sub_gen.generate_from_record(mol, record, missing)
+            except Exception as e:
+                tracker.finish_task(mol, "opt", "ERROR", f"SubGen:{e}"); return False
+            if packed is not None and step in packed[1]:
+                pack_in, steps = packed
+                if not mgr.has_capacity(mgr.job_cores(pack_in)): return False
+                outputs = {t: config.DIRS[t] / f"{mol}_{t}.out" for t in steps}
+                return mgr.submit(pack_in, mol, "pack", outputs=outputs)
+            job_in = find_input(mol, step)
+        # 同一分子的其他子任务生成时可能已经从缓存恢复了本步骤的输出
+        if settle(mol, step): return False
+        if not job_in:
+            tracker.finish_task(mol, step, "ERROR", "Template missing"); return False
+        return dispatch(job_in, mol, step)
+
+    def calc(mol):
+        """calc 节点：gas/solv/sp 全部完成后计算 G 并写入结果库"""
+        try:
+            outs = {t: find_output(mol, t) for t in ["opt", *SUB_STEPS]}
+            if None in outs.values(): return
+            # 输出文件都没变化时结果已是最新，不再解析和重算
+            fp = fingerprint(list(outs.values()))
+            if fp: fp += ThermodynamicsCalculator.settings_tag()
+            if results.is_current(mol, fp): return
+            # 记录直接取自解析缓存，文件未变化时不再重读输出
+            sub_records = {t: mgr.get_record(outs[t]) for t in SUB_STEPS}
+            energies = ThermodynamicsCalculator.collect_energies(mgr.get_record(outs["opt"]), sub_records)
+            res = ThermodynamicsCalculator.calculate_g(energies, mol)
+            results.upsert(mol, ThermodynamicsCalculator.build_row(energies, res), fp)
+            tracker.set_result(mol, res['G_Final (kcal)'])
+            network.update(mol, res['G_Final (kcal)'])
+            if tracker.get(mol, "calc"): tracker.finish_task(mol, "calc", "DONE")
+        except Exception as e:
+            # 失败记到 calc 步骤上 (界面 G 列显示报错)，输出文件变化后会重新计算
+            tracker.finish_task(mol, "calc", "ERROR", f"{type(e).__name__}: {e}")
+
+    network = ReactionMonitor(config.REACTIONS_FILE, results)
+
+    # 主流程与 extra_jobs 共用一个带优先级 / 公平共享 / 老化的队列
+    queue = WorkQueue(weights=config.FAIR_SHARE, aging_per_hour=config.PRIORITY_AGING)
+    scheduler = DagScheduler(tracker, mgr, launch, calc, queue=queue,
+                             priority=lambda mol: file_priority(config.XYZ_DIR / f"{mol}.xyz"),
+                             retry=lambda mol, step: step == "opt" and restarter.can_restart(mol))
+    scheduler.add_class("extra", lambda e: sweeper.launch(e.payload, *e.key))
+
+    def sync_extra():
+        """把 Sweeper 最近一次扫描得到的待运行任务同步进队列 (只增删有变化的条目)"""
+        for key in [k for k, e in queue.entries.items() if e.cls == "extra" and k not in sweeper.pending]:
+            queue.discard(key)
+        for key, job in sweeper.pending.items():
+            queue.push("extra", key, file_priority(job), job)
+
+    last_export = float("-inf")
+
+    def dispatch_pass() -> bool:
+        """按优先级与公平共享从队列取任务填满空闲槽位；有任务启动返回 True"""
+        act = scheduler.dispatch(stop=stop_event.is_set)
+
+        # 有新结果时整表导出 results.csv，按间隔节流 (退出时再补一次)
+        nonlocal last_export
+        if results.dirty and time.monotonic() - last_export >= args.export_interval:
+            results.export_csv(config.RESULTS_CSV)
+            last_export = time.monotonic()
+        # 反应网络只重算涉及新结果的反应，有变化时导出 reactions.csv / profiles.csv
+        network.sync()
+
+        if not act and not mgr.slots:
+            tracker.set_running_msg(f"Idle. Watching for changes ({watcher.name})...")
+        if network.error: tracker.set_running_msg(network.error)
+        return act
+
+    # 多帧 xyz (构象系综) 展开为每帧一个分子
+    ingestor = EnsembleIngestor(config.XYZ_DIR)
+
     def workflow_loop():
+        # 事件驱动：只有文件变化、任务结束或定期兜底时才扫描并派发；空闲时阻塞在监视器上
+        xyz_files = []
+        changed = None      # None = 需要全量扫描 (启动 / 事件溢出)
+        last_full = 0.0
         while not stop_event.is_set():
-            # --- 关键修改：每轮循环开始前，先全量刷新一遍状态 ---
-            # 这确保了队列后方的任务、手动修改的文件等都能及时反映在仪表盘上
-            perform_full_scan(tracker, mgr, sweeper)
+            finished = mgr.poll()
+            act = None
+            if changed is None or time.monotonic() - last_full > config.WATCH_RESCAN_INTERVAL:
+                # 网络文件系统上 inotify 可能漏事件，定期全量扫描兜底
+                xyz_files = scan_xyz(config.XYZ_DIR)
+                if ingestor.expand(xyz_files): xyz_files = scan_xyz(config.XYZ_DIR)
+                perform_full_scan(tracker, mgr, sweeper, xyz_files)
+                last_full = time.monotonic()
+                scheduler.invalidate()
+                scheduler.refresh([f.stem for f in xyz_files], prune=True)
+                sync_extra()
+                act = dispatch_pass()
+            elif changed or finished:
+                xyz_changed, mols, sweep = classify_changes(changed)
+                sweep = sweep or any(s.mol_name.startswith("[Extra]") for s in finished)
+                if xyz_changed:
+                    if ingestor.expand(p for p in changed if p.parent == config.XYZ_DIR and p.suffix == ".xyz"):
+                        mols = None
+                    xyz_files = scan_xyz(config.XYZ_DIR)
+                perform_full_scan(tracker, mgr, sweeper, xyz_files, mols=mols, sweep=sweep)
+                # 只重新评估有变化 / 刚结束任务的分子，队列增量更新
+                if mols is not None: mols |= {s.mol_name for s in finished}
+                scheduler.invalidate(mols)
+                stems = [f.stem for f in xyz_files]
+                if mols is None or xyz_changed: scheduler.refresh(stems, prune=True)
+                else: scheduler.refresh([m for m in stems if m in mols])
+                if sweep: sync_extra()
+                act = dispatch_pass()
+            if stop_event.is_set(): return
+            # 无界面模式：完整派发一轮后既没有新任务也没有运行中的任务，说明队列已清空
+            if args.headless and act is False and not mgr.slots: return
+            changed = watcher.wait(timeout=0.5 if mgr.slots else 1.0)
 
-            xyz_files = scan_xyz(config.XYZ_DIR)
-            xyz_order_list = [f.stem for f in xyz_files]
-            
-            act = False
-            
-            for xyz_file in xyz_files:
-                if stop_event.is_set(): return
-
-                mol = xyz_file.stem
-                
-                # --- PHASE 1: OPT ---
-                opt_in = next((config.DIRS["opt"]/f"{mol}_opt{e}" for e in config.VALID_EXTENSIONS if (config.DIRS["opt"]/f"{mol}_opt{e}").exists()), None)
-                
-                if not opt_in:
-                    try: 
-                        opt_in = opt_gen.generate(xyz_file)
-                        if not mgr.submit_and_wait(opt_in, mol, "opt", xyz_list=xyz_order_list): 
-                            if stop_event.is_set(): return
-                            continue 
-                        cleanup_sub_tasks(mol)
-                        act = True; break 
-                    except Exception as e: 
-                        tracker.finish_task(mol, "opt", "ERROR", str(e)); continue
-
-                opt_out = opt_in.with_suffix(".out")
-                opt_status = "PENDING"
-                
-                if not opt_out.exists():
-                    # 重新提交逻辑
-                    tracker.finish_task(mol, "opt", "MISSING", "Output deleted")
-                    if not mgr.submit_and_wait(opt_in, mol, "opt", xyz_list=xyz_order_list):
-                        if stop_event.is_set(): return
-                        continue
-                    cleanup_sub_tasks(mol)
-                    act = True; break
-                else:
-                    st, err = mgr.get_status_from_file(opt_out, is_opt=True)
-                    tracker.finish_task(mol, "opt", st, err)
-                    opt_status = st
-
-                if opt_status != "DONE": continue
-
-                # --- PHASE 2: GEN SUBS ---
-                subs = ["gas", "solv", "sp"]
-                inputs_missing = any(not any((config.DIRS[t]/f"{mol}_{t}{e}").exists() for e in config.VALID_EXTENSIONS) for t in subs)
-                
-                if inputs_missing:
-                    try:
-                        p = get_parser(opt_out)
-                        sub_gen.generate_all(mol, *p.get_charge_mult(), p.get_coordinates())
-                        act = True 
-                    except Exception as e:
-                        tracker.finish_task(mol, "opt", "ERROR", f"SubGen:{e}"); continue
-
-                # --- PHASE 3: RUN SUBS ---
-                grp_fail = False
-                for t in subs:
-                    if stop_event.is_set(): return
-
-                    job_in = next((config.DIRS[t]/f"{mol}_{t}{e}" for e in config.VALID_EXTENSIONS if (config.DIRS[t]/f"{mol}_{t}{e}").exists()), None)
-                    if not job_in: grp_fail = True; break
-                    
-                    job_out = job_in.with_suffix(".out")
-                    if not job_out.exists():
-                        tracker.finish_task(mol, t, "MISSING", "Output deleted")
-                        if not mgr.submit_and_wait(job_in, mol, t, xyz_list=xyz_order_list): 
-                            if stop_event.is_set(): return
-                            grp_fail = True; break
-                        act = True; break 
-                    else:
-                        st, err = mgr.get_status_from_file(job_out)
-                        tracker.finish_task(mol, t, st, err)
-                        if st != "DONE": grp_fail = True; break
-                
-                if grp_fail or act: 
-                    if act: break 
-                    continue
-
-                # --- PHASE 4: CALC ---
-                try:
-                    energies = {"thermal_corr": get_parser(opt_out).get_thermal_correction()}
-                    for t in subs:
-                        f = next((config.DIRS[t]/f"{mol}_{t}{e}" for e in [".out", ".log"] if (config.DIRS[t]/f"{mol}_{t}{e}").exists()), None)
-                        if f is None: raise FileNotFoundError
-                        energies[t] = get_parser(f).get_electronic_energy()
-                    res = ThermodynamicsCalculator.calculate_g(energies, mol)
-                    ThermodynamicsCalculator.update_csv(mol, energies, res)
-                    tracker.set_result(mol, res['G_Final (kcal)'])
-                except: pass
-
-            if not act and not sweeper.run():
-                tracker.set_running_msg("Idle. Scanning...")
-                if stop_event.wait(timeout=1.0):
-                    return
-    
-    app = GibbsApp(workflow_loop, tracker, mgr, stop_event)
-    app.run()
+    runner = HeadlessRunner if args.headless else GibbsApp
+    app = runner(workflow_loop, tracker, mgr, stop_event)
+    try:
+        rc = app.run()
+    finally:
+        watcher.close()
+        mgr.close()
+        if results.dirty: results.export_csv(config.RESULTS_CSV)
+        results.close()
+        tracker.close()
+    return rc if args.headless else 0
 
 if __name__ == "__main__": 
-    main()
-    os.system('cls' if os.name == 'nt' else 'reset')
\ No newline at end of file
+    tui = uses_tui(parse_args())
+    rc = main()
+    if tui:
+        os.system('cls' if os.name == 'nt' else 'reset')
+    sys.exit(rc or 0)
\ No newline at end of file
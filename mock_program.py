@@ -1,3 +1,5 @@
+import os
+import re
 import sys
 import time
 import argparse
@@ -5,38 +7,88 @@ import argparse
 # 这是一个伪造的计算程序，用于欺骗 JobManager
 # 它会生成 Parser 能识别的最小化输出
 
-def write_gaussian_out(filepath):
-    with open(filepath, 'w') as f:
-        f.write("Entering Gaussian System\n")
+DASH = " " + "-" * 69 + "\n"
+_SYMBOLS = {1: "H", 6: "C"}
+
+
+def _gaussian_step(n_atoms: int, energy: float, padding: int) -> str:
+    """一个优化步：完整格式的 Standard orientation 块 + SCF Done + 若干填充行"""
+    rows = "".join(f"   {i+1:>3}          {6 if i == 0 else 1:>2}           0        "
+                   f"{0.0:>10.6f}  {0.0:>10.6f}  {float(i):>10.6f}\n" for i in range(n_atoms))
+    return (" Standard orientation:\n" + DASH +
+            " Center     Atomic      Atomic             Coordinates (Angstroms)\n"
+            " Number     Number       Type             X           Y           Z\n" + DASH +
+            rows + DASH +
+            f" SCF Done:  E(RB3LYP) =  {energy:.9f}     A.U. after   12 cycles\n" +
+            " Iteration padding line for the optimizer output\n" * padding)
+
+
+def write_gaussian_out(filepath, size_mb: float = 0.0, n_atoms: int = 2,
+                       energy: float = -100.0, mode: str = 'w'):
+    """
+    Gaussian opt+freq 输出：size_mb > 0 时重复优化步把文件撑到约 size_mb，
+    用于基准测试中的大文件；默认生成 KB 级的最小输出。mode='a' 用于拼接 --Link1-- 多任务输出。
+    """
+    step = _gaussian_step(n_atoms, energy, 200 if size_mb else 0)
+    with open(filepath, mode) as f:
+        f.write(" Entering Gaussian System\n")
         f.write(" Charge = 0 Multiplicity = 1\n")
-        f.write(" Standard orientation:\n")
-        f.write(" ---------------------------------------------------------------------\n")
-        f.write("    1          6             0.000000    0.000000    0.000000\n")
-        f.write("    2          1             0.000000    0.000000    1.000000\n")
-        f.write(" ---------------------------------------------------------------------\n")
-        f.write(" SCF Done:  E(RB3LYP) = -100.000000000 A.U.\n")
-        f.write(" Harmonic frequencies (cm**-1), ...\n")
+        for _ in range(int(size_mb * 1e6 / len(step))): f.write(step)
+        f.write(" Optimization completed.\n")
+        f.write("    -- Stationary point found.\n")
+        f.write(_gaussian_step(n_atoms, energy, 0))
+        f.write(" Harmonic frequencies (cm**-1), IR intensities (KM/Mole)\n")
         f.write(" Frequencies --   100.0000   200.0000   300.0000\n")
+        f.write(" - Thermochemistry -\n Molecular mass:    16.03130 amu.\n Rotational symmetry number  1.\n")
+        f.write(" Rotational constants (GHZ):    157.00000   157.00000   157.00000\n")
         f.write(" Zero-point correction=                           0.100000 (Hartree/Particle)\n")
         f.write(" Thermal correction to Gibbs Free Energy=         0.080000\n")
-        f.write(" Stationary point found.\n")
         f.write(" Normal termination of Gaussian 16.\n")
 
-def write_orca_out(filepath):
+
+def _orca_step(n_atoms: int, padding: int, energy: float = -100.0) -> str:
+    rows = "".join(f"  {'C' if i == 0 else 'H'}      {0.0:.6f}    {0.0:.6f}    {float(i):.6f}\n" for i in range(n_atoms))
+    return ("CARTESIAN COORDINATES (ANGSTROEM)\n---------------------------------\n" + rows +
+            f"\nFINAL SINGLE POINT ENERGY      {energy:.12f}\n" +
+            " Geometry optimization padding line\n" * padding)
+
+
+def write_orca_out(filepath, size_mb: float = 0.0, n_atoms: int = 2):
+    """ORCA opt+freq 输出，size_mb 含义同 write_gaussian_out"""
+    step = _orca_step(n_atoms, 200 if size_mb else 0)
     with open(filepath, 'w') as f:
         f.write("* O   R   C   A *\n")
+        f.write("                                       INPUT FILE\n")
+        f.write("|  1> ! B3LYP def2-SVP Opt Freq\n")
+        f.write("|  2> * xyz 0 1\n")
         f.write("Total Charge      Charge ....    0\n")
         f.write("Mult              Mult   ....    1\n")
+        for _ in range(int(size_mb * 1e6 / len(step))): f.write(step)
         f.write("THE OPTIMIZATION HAS CONVERGED\n")
+        f.write("FINAL ENERGY EVALUATION AT THE STATIONARY POINT\n")
+        f.write(_orca_step(n_atoms, 0))
         f.write("VIBRATIONAL FREQUENCIES\n")
         f.write("   0:     100.00 cm**-1\n")
-        f.write("FINAL SINGLE POINT ENERGY      -100.000000000000\n")
+        f.write("THERMOCHEMISTRY AT 298.15K\nTotal Mass          ...    16.03 AMU\n")
+        f.write("Point Group:  C1, Symmetry Number:   1\nRotational constants in cm-1:     5.237     5.237     5.237\n")
         f.write("G-E(el)           0.08000000 Eh\n")
-        f.write("CARTESIAN COORDINATES (ANGSTROEM)\n")
-        f.write("---------------------------------\n")
-        f.write("C      0.000000    0.000000    0.000000\n")
-        f.write("H      0.000000    0.000000    1.000000\n")
-        f.write("---------------------------------\n")
+        f.write("ORCA TERMINATED NORMALLY\n")
+
+
+def write_packed_out(filepath, n_jobs: int, orca: bool = False):
+    """打包输入 (--Link1-- / $new_job) 的合并输出：每个子任务一段，能量依次为 -100, -101, ..."""
+    if not orca:
+        for i in range(n_jobs): write_gaussian_out(filepath, energy=-100.0 - i, mode='w' if i == 0 else 'a')
+        return
+    with open(filepath, 'w') as f:
+        f.write("* O   R   C   A *\n")
+        f.write("|  1> ! B3LYP def2-SVP\n")
+        f.write("|  2> * xyz 0 1\n")
+        for i in range(n_jobs):
+            if i: f.write(f"\n                         ***********************\n"
+                          f"                         *    JOB NUMBER  {i + 1}    *\n"
+                          f"                         ***********************\n")
+            f.write(_orca_step(2, 0, -100.0 - i))
         f.write("ORCA TERMINATED NORMALLY\n")
 
 if __name__ == "__main__":
@@ -48,7 +100,18 @@ if __name__ == "__main__":
     print(f"Mocking calculation for {input_file}...")
     time.sleep(duration) # 模拟耗时
 
-    if input_file.endswith(".gjf"):
+    with open(input_file, 'r', errors='ignore') as f: text = f.read()
+    # 与真实 Gaussian 一样：%chk 写到工作目录，.rwf 临时文件写到 GAUSS_SCRDIR (用于测试 scratch 暂存)
+    chk = re.search(r"%chk\s*=\s*(\S+)", text, re.IGNORECASE)
+    if chk:
+        with open(chk.group(1), 'w') as f: f.write("checkpoint\n" * 100)
+        with open(os.path.join(os.environ.get("GAUSS_SCRDIR", "."), f"Gau-{os.getpid()}.rwf"), 'w') as f:
+            f.write("rwf\n" * 5000)
+    if "--Link1--" in text:
+        write_packed_out(output_file, text.count("--Link1--") + 1)
+    elif "$new_job" in text:
+        write_packed_out(output_file, text.count("$new_job") + 1, orca=True)
+    elif input_file.endswith(".gjf"):
         write_gaussian_out(output_file)
     elif input_file.endswith(".inp"):
         write_orca_out(output_file)
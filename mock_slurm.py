@@ -0,0 +1,78 @@
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 伪造的 Slurm 命令行 (sbatch / squeue / sacct / scancel)，用于离线测试 SlurmExecutor
+# 用法：python mock_slurm.py <sbatch|squeue|sacct|scancel> [参数...]
+# 作业在本机后台直接运行；状态保存在 $MOCK_SLURM_DIR (默认系统临时目录下的 mock_slurm/)
+# $MOCK_SLURM_PENDING 秒内作业保持 PENDING，之后才开始运行
+
+STATE_DIR = Path(os.environ.get("MOCK_SLURM_DIR", Path(tempfile.gettempdir()) / "mock_slurm"))
+
+
+def _job(job_id: str) -> dict:
+    try: return json.loads((STATE_DIR / f"{job_id}.json").read_text())
+    except (OSError, ValueError): return {}
+
+
+def _state(job_id: str) -> tuple:
+    """(状态, 退出码)；未知作业返回 (None, 0)"""
+    job = _job(job_id)
+    if not job: return None, 0
+    if (STATE_DIR / f"{job_id}.cancelled").exists(): return "CANCELLED", 0
+    rc = STATE_DIR / f"{job_id}.rc"
+    if rc.exists():
+        code = int(rc.read_text().strip() or 0)
+        return ("COMPLETED" if code == 0 else "FAILED"), code
+    if time.time() < job["start"]: return "PENDING", 0
+    return "RUNNING", 0
+
+
+def sbatch(args):
+    script = Path(args[-1]).resolve()
+    STATE_DIR.mkdir(parents=True, exist_ok=True)
+    counter = STATE_DIR / "next_id"
+    job_id = str(int(counter.read_text()) if counter.exists() else 1000)
+    counter.write_text(str(int(job_id) + 1))
+    delay = float(os.environ.get("MOCK_SLURM_PENDING", "0"))
+    rc = STATE_DIR / f"{job_id}.rc"
+    # 退出码先写临时文件再改名，squeue 不会读到半个文件
+    cmd = f"sleep {delay}; bash {script}; echo $? > {rc}.tmp; mv {rc}.tmp {rc}"
+    proc = subprocess.Popen(["sh", "-c", cmd], cwd=str(script.parent), start_new_session=True,
+                            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    (STATE_DIR / f"{job_id}.json").write_text(json.dumps({"pid": proc.pid, "start": time.time() + delay,
+                                                         "script": str(script)}))
+    print(job_id if "--parsable" in args else f"Submitted batch job {job_id}")
+
+
+def squeue(args):
+    # 与真实 squeue 一样，结束的作业不再出现
+    for f in sorted(STATE_DIR.glob("*.json")) if STATE_DIR.exists() else []:
+        state, _ = _state(f.stem)
+        if state in ("PENDING", "RUNNING"): print(f"{f.stem} {state}")
+
+
+def sacct(args):
+    ids = args[args.index("-j") + 1].split(",") if "-j" in args else []
+    for job_id in ids:
+        state, code = _state(job_id)
+        if state: print(f"{job_id}|{state}|{code}:0")
+
+
+def scancel(args):
+    for job_id in args:
+        job = _job(job_id)
+        if not job: continue
+        (STATE_DIR / f"{job_id}.cancelled").touch()
+        try: os.killpg(job["pid"], signal.SIGTERM)
+        except (ProcessLookupError, PermissionError): pass
+
+
+if __name__ == "__main__":
+    tool, rest = sys.argv[1], sys.argv[2:]
+    {"sbatch": sbatch, "squeue": squeue, "sacct": sacct, "scancel": scancel}[tool](rest)
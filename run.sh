@@ -13,7 +13,7 @@ uv sync
 
 # 3. 启动主程序 (nohup 后台运行，防止断网中断)
 echo "Starting Gibbs Workflow in background..."
-nohup uv run gibbs-run > workflow.log 2>&1 &
+nohup uv run main.py --headless > workflow.log 2>&1 &
 
 echo "Workflow started! Check workflow.log for details."
 echo "PID: $!"
\ No newline at end of file
@@ -12,11 +12,28 @@ from pathlib import Path
 # 或者我们可以在导入后动态修改 config 的变量
 
 from src import config
-from src.job_manager import JobManager
+from src.job_manager import JobManager, stop_marker
 from src.tracker import StatusTracker
 from src.opt_generator import OptGenerator
 from src.sub_generator import SubGenerator
 from src.sweeper import TaskSweeper
+from src.parse_cache import ParseCache
+from src.watcher import create_watcher
+from src.supervisor import ProcessSupervisor
+from src.results_store import ResultsStore, fingerprint
+from src.headless import HeadlessRunner
+from src.scheduler import DagScheduler
+from src.work_queue import WorkQueue, file_priority
+from src.parsers import parse_output, split_output
+from src.restarter import OptRestarter
+from src.result_cache import ResultCache, input_key, cacheable
+from src.xyz_stream import iter_frames, is_ensemble, EnsembleIngestor
+from src.templates import load_template
+from src.executors import SlurmExecutor
+from src.staging import ScratchStager
+from src.compression import OutputCompressor
+from src.parsers import find_output
+from src.summary import summary_path, read_summary, rebuild_summaries
 
 # 定义测试目录
 TEST_ROOT = Path("test_env")
@@ -137,24 +154,27 @@ class GibbsWorkflowTests(unittest.TestCase):
         config.COMMAND_MAP[".gjf"] = cmd_long
 
         print("   >> Starting long process...")
-        # 模拟 JobManager 的 submit 行为，手动启动进程
-        mgr.current_proc = import_subprocess().Popen(
-            f"{sys.executable} -c 'import time; time.sleep(5)'", 
-            shell=True
-        )
+        # 通过槽位提交，任务运行在独立进程组中
+        self.assertTrue(mgr.submit(long_job, "[Extra]long_job", "root"), "Submit failed")
+        key = JobManager.slot_key("[Extra]long_job", "root")
+        proc = mgr.slots[key].proc
         
         time.sleep(0.5)
-        self.assertIsNone(mgr.current_proc.poll(), "Process should be running")
+        self.assertIsNone(proc.poll(), "Process should be running")
+        self.assertEqual(tracker.data["[Extra]long_job"]["root"]["status"], "RUNNING")
         
         print("   >> Sending Stop signal...")
-        mgr.stop_current_job()
+        self.assertTrue(mgr.stop_job(key), "Slot should be stoppable")
         
         # --- 修复：显式等待进程结束以消除 ResourceWarning ---
         try:
-            mgr.current_proc.wait(timeout=2)
+            proc.wait(timeout=2)
         except:
             pass
         # ------------------------------------------------
+        self.assertIsNotNone(proc.poll(), "Process group should be killed")
+        mgr.poll()
+        self.assertNotIn(key, mgr.slots, "Finished slot should be reaped")
         
         # 恢复命令配置
         config.COMMAND_MAP[".gjf"] = original_cmd
@@ -176,12 +196,25 @@ class GibbsWorkflowTests(unittest.TestCase):
         with open(extra_job, 'w') as f: f.write("Mock Extra")
         
         print("   >> Running Sweeper...")
-        ran = sweeper.run()
-        
-        self.assertTrue(ran, "Sweeper should have found and run the job")
+        sweeper.scan()
+        key = ("[Extra]manual_calc", "root")
+        self.assertEqual(sweeper.pending, {key: extra_job}, "Sweeper should have found the job")
+        self.assertTrue(sweeper.launch(extra_job, *key))
+        mgr.slots[JobManager.slot_key(*key)].proc.wait(timeout=10)
+        mgr.poll()
         
         # 此时应该只运行了 manual_calc.gjf
         self.assertTrue(extra_job.with_suffix(".out").exists(), "Sweeper output missing")
+        sweeper.scan()
+        self.assertEqual(sweeper.pending, {}, "Finished job must not be pending again")
+        
+        # 输出已被压缩的任务同样视为已运行
+        import gzip
+        zipped = TEST_EXTRA / "zipped_calc.gjf"
+        zipped.write_text("Mock Extra")
+        with gzip.open(TEST_EXTRA / "zipped_calc.out.gz", "wt") as f: f.write(extra_job.with_suffix(".out").read_text())
+        sweeper.scan()
+        self.assertEqual(sweeper.pending, {})
         
         # 检查是否记录在 Tracker (带 [Extra] 前缀)
         key = "[Extra]manual_calc"
@@ -189,6 +222,1292 @@ class GibbsWorkflowTests(unittest.TestCase):
             data = json.load(f)
         self.assertIn(key, data, "Sweeper job not in history")
 
+    def test_06_concurrent_slots(self):
+        """测试多槽位并发执行与核数预算"""
+        print("\n🧪 Test 6: Concurrent Slots")
+        
+        conc_dir = TEST_EXTRA / "conc"
+        conc_dir.mkdir(exist_ok=True)
+        jobs = []
+        for i in range(3):
+            job = conc_dir / f"conc_{i}.gjf"
+            with open(job, 'w') as f: f.write("%nprocshared=4\nMock")
+            jobs.append(job)
+        
+        tracker = StatusTracker(str(TEST_LOG))
+        mgr = JobManager(tracker, max_concurrent=2)
+        self.assertEqual(mgr.job_cores(jobs[0]), 4, "Should read %nprocshared")
+        
+        for i, job in enumerate(jobs):
+            if mgr.has_capacity(mgr.job_cores(job)):
+                mgr.submit(job, f"[Extra]conc_{i}", "conc")
+        self.assertEqual(len(mgr.slots), 2, "Only 2 slots should be used")
+        self.assertIn("Running (2)", tracker.status_line())
+        
+        peak = 0
+        while mgr.slots:
+            peak = max(peak, len(mgr.slots))
+            time.sleep(0.1)
+            mgr.poll()
+        self.assertTrue(mgr.submit(jobs[2], "[Extra]conc_2", "conc"))
+        while mgr.slots:
+            time.sleep(0.1)
+            mgr.poll()
+        
+        self.assertLessEqual(peak, 2)
+        
+        # 核数预算：2 个 4 核任务放不进 6 核
+        budget_mgr = JobManager(tracker, max_concurrent=4, cores_budget=6)
+        self.assertTrue(budget_mgr.submit(jobs[0], "[Extra]conc_0", "budget"))
+        self.assertFalse(budget_mgr.has_capacity(4), "Cores budget should block a second 4-core job")
+        self.assertTrue(budget_mgr.has_capacity(2))
+        while budget_mgr.slots:
+            time.sleep(0.1)
+            budget_mgr.poll()
+        
+        for job in jobs:
+            self.assertTrue(job.with_suffix(".out").exists(), f"{job.name} output missing")
+        self.assertEqual(tracker.data["[Extra]conc_0"]["conc"]["status"], "DONE")
+
+    def test_07_parse_cache(self):
+        """测试基于 stat 的解析缓存（命中、失效、跨重启复用）"""
+        print("\n🧪 Test 7: Parse Cache")
+        import mock_program
+        
+        out = TEST_DATA / "opt" / "cache_mol_opt.out"
+        mock_program.write_gaussian_out(out)
+        cache_file = TEST_ROOT / "parse_cache.json"
+        
+        mgr = JobManager(parse_cache=ParseCache(str(cache_file)))
+        first = mgr.get_record(out)
+        self.assertEqual(mgr.parse_cache.misses, 1)
+        self.assertAlmostEqual(first.thermal_corr, 0.08)
+        self.assertEqual(mgr.get_status_from_file(out, is_opt=True), first.status(is_opt=True))
+        self.assertEqual(mgr.parse_cache.hits, 1, "Unchanged file should hit the cache")
+        mgr.parse_cache.save()
+        
+        # 重启后复用
+        mgr2 = JobManager(parse_cache=ParseCache(str(cache_file)))
+        self.assertEqual(mgr2.get_record(out).energy, -100.0)
+        self.assertEqual(mgr2.parse_cache.hits, 1, "Cache should survive restart")
+        
+        # 文件变化后重新解析
+        with open(out, 'a') as f: f.write(" Error termination via Lnk1e\n")
+        self.assertEqual(mgr2.get_status_from_file(out, is_opt=True)[0], "ERROR")
+        self.assertEqual(mgr2.parse_cache.misses, 1)
+
+        # 解析失败同样被缓存
+        bad = TEST_DATA / "opt" / "bad_mol_opt.out"
+        bad.write_text("garbage")
+        self.assertEqual(mgr2.get_status_from_file(bad)[0], "ERROR")
+        self.assertEqual(mgr2.get_status_from_file(bad)[0], "ERROR")
+        self.assertEqual(mgr2.parse_cache.hits, 2)
+
+    def test_08_tail_parser(self):
+        """测试 mmap 尾部优先解析（跨窗口的最后匹配、坐标块、虚频）"""
+        print("\n🧪 Test 8: Tail-first Parser")
+        from src.parsers import get_parser
+        from src.parsers.reader import OutputReader
+        
+        out = TEST_DATA / "opt" / "big_mol_opt.out"
+        dash = " " + "-" * 69 + "\n"
+        with open(out, 'w') as f:
+            f.write(" Entering Gaussian System\n Charge = 1 Multiplicity = 2\n")
+            for i in range(300):
+                f.write(" Standard orientation:\n" + dash)
+                f.write(" Center Atomic Atomic Coordinates (Angstroms)\n Number Number Type X Y Z\n" + dash)
+                f.write(f"    1          8           0    {i:.6f}    0.000000    0.000000\n" + dash)
+                f.write(f" SCF Done:  E(RB3LYP) =  -{76 + i * 1e-4:.9f}     A.U. after   10 cycles\n")
+                f.write(" padding line\n" * 20)
+            f.write("    -- Stationary point found.\n")
+            f.write(" Harmonic frequencies (cm**-1), ...\n")
+            f.write(" Frequencies --   -50.1234   200.0000   300.0000\n")
+            f.write(" Thermal correction to Gibbs Free Energy=         0.012345\n")
+            f.write(" Normal termination of Gaussian 16.\n")
+        
+        # 缩小窗口，强制反向搜索跨越多个窗口
+        old_window = OutputReader.WINDOW
+        OutputReader.WINDOW = 4096
+        try:
+            p = get_parser(out)
+            self.assertTrue(p.is_finished())
+            self.assertFalse(p.is_failed())
+            self.assertTrue(p.is_converged())
+            self.assertTrue(p.has_imaginary_freq())
+            self.assertEqual(p.get_charge_mult(), (1, 2))
+            self.assertAlmostEqual(p.get_electronic_energy(), -(76 + 299 * 1e-4))
+            self.assertAlmostEqual(p.get_thermal_correction(), 0.012345)
+            self.assertIn("299.000000", p.get_coordinates())
+            self.assertIsNone(p._content, "Full text should never be loaded")
+            p.close()
+        finally:
+            OutputReader.WINDOW = old_window
+
+    def test_09_parsed_output_record(self):
+        """测试单次扫描生成的 ParsedOutput 记录 (Gaussian / ORCA)"""
+        print("\n🧪 Test 9: ParsedOutput Record")
+        import mock_program
+        from src.parsers import parse_output, ParsedOutput
+        from src.calculator import ThermodynamicsCalculator
+        
+        g_out, o_out = TEST_ROOT / "rec_g.out", TEST_ROOT / "rec_o.out"
+        mock_program.write_gaussian_out(g_out)
+        mock_program.write_orca_out(o_out)
+        
+        g, o = parse_output(g_out), parse_output(o_out)
+        self.assertIsInstance(g, ParsedOutput)
+        self.assertEqual((g.program, o.program), ("gaussian", "orca"))
+        self.assertEqual(g.status(is_opt=True), ("DONE", ""))
+        self.assertEqual(o.status(is_opt=True), ("DONE", ""))
+        self.assertEqual(o.coordinates.split()[0], "C")
+        self.assertEqual(g.coordinates.split()[0], "C", "Mock Standard orientation block should be parseable")
+        with self.assertRaises(Exception):
+            o.energy = 0.0  # 记录不可变
+        
+        energies = ThermodynamicsCalculator.collect_energies(g, {"gas": o, "solv": o, "sp": o})
+        self.assertEqual(energies, {"thermal_corr": 0.08, "gas": -100.0, "solv": -100.0, "sp": -100.0})
+        
+        paths = SubGenerator().generate_from_record("rec_mol", o)
+        self.assertEqual(len(paths), 3)
+
+    def test_10_state_backends(self):
+        """测试 Tracker 持久化后端：批量合并写、追加日志压缩、SQLite、损坏恢复"""
+        print("\n🧪 Test 10: State Backends")
+        state_dir = TEST_ROOT / "state"
+        state_dir.mkdir(exist_ok=True)
+        
+        for backend in ["journal", "sqlite"]:
+            tracker = StatusTracker(str(state_dir / "status.json"), backend=backend)
+            with tracker.batch():
+                for i in range(50):
+                    tracker.finish_task(f"mol_{i}", "opt", "DONE")
+            tracker.start_task("mol_0", "gas")
+            tracker.remove("mol_49")
+            tracker.close()
+            
+            reloaded = StatusTracker(str(state_dir / "status.json"), backend=backend)
+            self.assertEqual(len(reloaded.data), 49, f"{backend}: wrong record count")
+            self.assertEqual(reloaded.data["mol_0"]["gas"]["status"], "RUNNING")
+            reloaded.close()
+        
+        # 追加日志：未变化的状态不写入；一个批次一个分子只写一行
+        journal = state_dir / "status.jsonl"
+        tracker = StatusTracker(str(journal), backend="journal")
+        lines_before = tracker.store.lines
+        tracker.finish_task("mol_1", "opt", "DONE")
+        self.assertEqual(tracker.store.lines, lines_before, "Unchanged status must not be written")
+        with tracker.batch():
+            for st in ["ERROR", "MISSING", "DONE", "ERR_NC"]:
+                tracker.finish_task("mol_1", "opt", st)
+        self.assertEqual(tracker.store.lines, lines_before + 1, "Batch should coalesce writes")
+        
+        # 超过阈值后压缩
+        tracker.store.min_compact, tracker.store.compact_factor = 10, 1
+        for st in ["ERROR", "DONE"] * 40:
+            tracker.finish_task("mol_2", "opt", st)
+        self.assertLessEqual(tracker.store.lines, len(tracker.data) + 1, "Journal should have been compacted")
+        tracker.close()
+        
+        # 崩溃时写了一半的最后一行被忽略
+        with open(journal, 'a') as f: f.write('{"k": "mol_broken", "v": {"opt": ')
+        self.assertNotIn("mol_broken", StatusTracker(str(journal), backend="journal").data)
+        
+        # JSON 文件损坏时改名保留而不是静默丢弃
+        bad = state_dir / "bad.json"
+        bad.write_text("{not json")
+        self.assertEqual(StatusTracker(str(bad), backend="json").data, {})
+        self.assertTrue(list(state_dir.glob("bad.json.corrupt-*")), "Corrupt file should be kept aside")
+
+    def test_11_watchers(self):
+        """测试文件监视：inotify 与轮询回退都能及时发现新文件，wake() 能打断等待"""
+        print("\n🧪 Test 11: File Watchers")
+        watch_dir, tree = TEST_ROOT / "watch", TEST_ROOT / "watch_tree"
+        watch_dir.mkdir(exist_ok=True)
+        tree.mkdir(exist_ok=True)
+        
+        modes = ["poll"] + (["inotify"] if sys.platform.startswith("linux") else [])
+        for mode in modes:
+            w = create_watcher([watch_dir], recursive=[tree], mode=mode)
+            try:
+                self.assertEqual(w.name, mode)
+                f = watch_dir / f"new_{mode}.xyz"
+                f.write_text("1\n\nH 0 0 0\n")
+                t0 = time.monotonic()
+                changed = set()
+                while f not in changed and time.monotonic() - t0 < 5:
+                    changed |= w.wait(timeout=1.0) or set()
+                self.assertIn(f, changed, f"{mode} watcher missed a new file")
+                
+                # 递归目录中新建的子目录及其文件
+                sub = tree / f"job_{mode}"
+                sub.mkdir()
+                (sub / "a.gjf").write_text("x")
+                t0, changed = time.monotonic(), set()
+                while sub / "a.gjf" not in changed and time.monotonic() - t0 < 5:
+                    changed |= w.wait(timeout=1.0) or set()
+                self.assertIn(sub / "a.gjf", changed, f"{mode} watcher missed a file in a new subdir")
+                
+                # 无变化时 wake() 立即返回
+                w.wake()
+                t0 = time.monotonic()
+                w.wait(timeout=5.0)
+                self.assertLess(time.monotonic() - t0, 1.0, "wake() should interrupt wait()")
+            finally:
+                w.close()
+
+    def test_12_supervisor(self):
+        """测试 asyncio 进程监管：可 await 的接口、退出即通知、独立的耗时定时器"""
+        print("\n🧪 Test 12: Process Supervisor")
+        import asyncio
+        
+        # 协程接口可在任意事件循环中直接 await
+        self.assertEqual(asyncio.run(ProcessSupervisor().run("exit 3", TEST_ROOT)), 3)
+        
+        tracker = StatusTracker(str(TEST_LOG))
+        mgr = JobManager(tracker, max_concurrent=2, supervisor=ProcessSupervisor(tick=0.1))
+        exited = []
+        mgr.on_exit = lambda: exited.append(time.monotonic())
+        
+        sup_dir = TEST_EXTRA / "sup"
+        sup_dir.mkdir(exist_ok=True)
+        job = sup_dir / "sup_job.gjf"
+        job.write_text("Mock")
+        original_cmd = config.COMMAND_MAP[".gjf"]
+        config.COMMAND_MAP[".gjf"] = "sleep 0.5; echo done > {output}"
+        try:
+            self.assertTrue(mgr.submit(job, "[Extra]sup_job", "root"))
+            key = JobManager.slot_key("[Extra]sup_job", "root")
+            time.sleep(0.3)
+            self.assertIn(key, tracker.job_msgs, "Elapsed timer should run without poll()")
+            
+            mgr.slots[key].proc.wait(timeout=5)
+            t_exit = time.monotonic()
+            time.sleep(0.05)
+            self.assertTrue(exited, "on_exit should fire when the child exits")
+            self.assertLess(exited[0] - t_exit, 0.05)
+            self.assertEqual(len(mgr.poll()), 1)
+            self.assertNotIn(key, tracker.job_msgs)
+            
+            # 阻塞式提交不再有 0.5s 的轮询空转
+            t0 = time.monotonic()
+            mgr.submit_and_wait(job, "[Extra]sup_job", "again")
+            self.assertLess(time.monotonic() - t0, 0.9)
+        finally:
+            config.COMMAND_MAP[".gjf"] = original_cmd
+            mgr.close()
+
+    def test_13_results_store(self):
+        """测试增量结果库：单行 upsert、指纹跳过重算、旧版 CSV 导入、按需导出"""
+        print("\n🧪 Test 13: Results Store")
+        res_dir = TEST_ROOT / "results"
+        res_dir.mkdir(exist_ok=True)
+        legacy = res_dir / "results.csv"
+        legacy.write_text("Molecule,G_Final (kcal/mol),E_SP (Ha)\nold_mol,-1.500000,-2.000000\n")
+        
+        store = ResultsStore(str(res_dir / "results.db"), legacy_csv=str(legacy))
+        self.assertEqual(store.get("old_mol")["E_SP (Ha)"], -2.0, "Legacy CSV should be imported")
+        
+        out = res_dir / "a.out"
+        out.write_text("x")
+        fp = fingerprint([out])
+        self.assertFalse(store.is_current("mol_a", fp))
+        store.upsert("mol_a", {"G_Final (kcal/mol)": -10.0}, fp)
+        self.assertTrue(store.is_current("mol_a", fp))
+        store.upsert("mol_a", {"G_Final (kcal/mol)": -11.0}, fp)
+        self.assertEqual([r["Molecule"] for r in store.rows()], ["old_mol", "mol_a"], "Upsert keeps row order")
+        
+        out.write_text("changed")
+        self.assertFalse(store.is_current("mol_a", fingerprint([out])), "Changed output must invalidate")
+        self.assertEqual(fingerprint([res_dir / "missing.out"]), "")
+        
+        csv_out = res_dir / "export.csv"
+        store.export_csv(str(csv_out))
+        lines = csv_out.read_text().splitlines()
+        self.assertTrue(lines[0].startswith("Molecule,G_Final (kcal/mol)"))
+        self.assertEqual(lines[2].split(",")[:2], ["mol_a", "-11.000000"])
+        store.close()
+        
+        # calc 失败记到 calc 步骤上，界面 G 列显示报错而不是看起来已完成
+        from src.tui import GibbsApp, ERROR
+        tr = StatusTracker(str(res_dir / "calc_status.json"))
+        tr.finish_task("mol_b", "calc", "ERROR", "KeyError: 'sp'")
+        row = GibbsApp(None, tr, None, None).main_row("mol_b", tr.get("mol_b"))
+        self.assertIn("calc: KeyError", row.cells[-1])
+        self.assertTrue(row.flags & ERROR)
+        
+        # 计算模块不再在导入时拉起 pandas
+        subprocess = import_subprocess()
+        code = "import sys; import src.calculator; print('pandas' in sys.modules)"
+        self.assertEqual(subprocess.check_output([sys.executable, "-c", code], text=True).strip(), "False")
+
+    def test_14_headless(self):
+        """测试无界面运行：结构化日志、队列清空后退出、吞吐与失败汇总"""
+        print("\n🧪 Test 14: Headless Runner")
+        import io, threading
+        hl_dir = TEST_EXTRA / "headless"
+        hl_dir.mkdir(exist_ok=True)
+        good, bad = hl_dir / "good.gjf", hl_dir / "bad.inp"
+        good.write_text("%nprocshared=2\nMock")
+        bad.write_text("Mock")
+        bad.with_suffix(".out").unlink(missing_ok=True)
+        
+        tracker = StatusTracker(str(TEST_LOG))
+        mgr = JobManager(tracker, max_concurrent=2)
+        original_map = dict(config.COMMAND_MAP)
+        mock_script = Path("mock_program.py").absolute()
+        config.COMMAND_MAP[".gjf"] = f"{sys.executable} {mock_script} {{input}} {{output}} 0.2"
+        config.COMMAND_MAP[".inp"] = "true"  # 不写输出 -> MISSING，计入失败
+        
+        def workflow():
+            mgr.submit(good, "[Extra]good", "root")
+            mgr.submit(bad, "[Extra]bad", "root")
+            while mgr.slots:
+                time.sleep(0.05)
+                mgr.poll()
+        
+        out = io.StringIO()
+        try:
+            runner = HeadlessRunner(workflow, tracker, mgr, threading.Event(), progress_interval=5, stream=out)
+            rc = runner.run()
+        finally:
+            config.COMMAND_MAP.clear()
+            config.COMMAND_MAP.update(original_map)
+            mgr.close()
+        
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[0].startswith("ts=") and "event=begin" in lines[0])
+        self.assertEqual(sum("event=start" in l for l in lines), 2)
+        summary = lines[-1]
+        self.assertIn("event=summary", summary)
+        self.assertIn("jobs=2", summary)
+        self.assertIn("failures=MISSING:1", summary)
+        self.assertEqual(runner.stats.by_status["DONE"], 1)
+        self.assertGreaterEqual(runner.stats.core_seconds, 0.2 * 2, "Core-seconds should count cores x runtime")
+        self.assertEqual(rc, 1, "Failures should give a non-zero exit code")
+
+        # 重启后成功：失败按 (mol, step) 的最终结果统计，被重启覆盖的尝试不计入
+        retry = hl_dir / "retry.gjf"
+        retry.write_text("%nprocshared=1\nMock")
+        retry.with_suffix(".out").unlink(missing_ok=True)
+        tracker = StatusTracker(str(TEST_LOG))
+        mgr = JobManager(tracker, max_concurrent=1)
+
+        def restart_workflow():
+            for cmd in ("true", f"{sys.executable} {mock_script} {{input}} {{output}} 0.1"):
+                config.COMMAND_MAP[".gjf"] = cmd
+                mgr.submit(retry, "[Extra]retry", "opt")
+                while mgr.slots:
+                    time.sleep(0.05)
+                    mgr.poll()
+
+        out = io.StringIO()
+        try:
+            runner = HeadlessRunner(restart_workflow, tracker, mgr, threading.Event(), progress_interval=5, stream=out)
+            rc = runner.run()
+        finally:
+            config.COMMAND_MAP.clear()
+            config.COMMAND_MAP.update(original_map)
+            mgr.close()
+
+        self.assertEqual(runner.stats.by_status["MISSING"], 1, "The first attempt still counts as an attempt")
+        self.assertEqual(runner.stats.failures, {})
+        self.assertIn("failures=-", out.getvalue().splitlines()[-1])
+        self.assertEqual(rc, 0, "A job that succeeds after a restart should not fail the run")
+
+    def test_15_dag_scheduler(self):
+        """测试任务图调度：opt 完成后 gas/solv/sp 同轮并行派发，calc 在三者完成后触发一次"""
+        print("\n🧪 Test 15: DAG Scheduler")
+        tracker = StatusTracker(str(TEST_ROOT / "dag_status.json"))
+        mgr = JobManager(tracker, max_concurrent=3)
+        launched, calcs = [], []
+        
+        def launch(mol, step):
+            launched.append((mol, step))
+            tracker.start_task(mol, step)
+            return True
+        
+        sched = DagScheduler(tracker, mgr, launch, calcs.append)
+        for step in ["opt", "gas", "solv", "sp"]: tracker.finish_task("dag_a", step, "MISSING")
+        tracker.finish_task("dag_b", "opt", "ERR_NC")
+        
+        self.assertTrue(sched.dispatch(["dag_a", "dag_b"]))
+        self.assertEqual(launched, [("dag_a", "opt")], "Only opt is ready at first; failed opt blocks its subs")
+        
+        tracker.finish_task("dag_a", "opt", "DONE")
+        launched.clear()
+        sched.dispatch(["dag_a", "dag_b"])
+        self.assertEqual(sorted(s for _, s in launched), ["gas", "solv", "sp"], "Sub-jobs should dispatch together")
+        self.assertEqual(calcs, [])
+        
+        # 槽位上限：只占用空闲槽位
+        mgr.max_concurrent = 0
+        tracker.finish_task("dag_a", "sp", "MISSING")
+        launched.clear()
+        self.assertFalse(sched.dispatch(["dag_a"]))
+        self.assertEqual(launched, [])
+        mgr.max_concurrent = 3
+        
+        for step in ["gas", "solv", "sp"]: tracker.finish_task("dag_a", step, "DONE")
+        sched.dispatch(["dag_a"])
+        sched.dispatch(["dag_a"])
+        self.assertEqual(calcs, ["dag_a"], "calc fires once when all parents are DONE")
+        sched.invalidate(["dag_a"])
+        sched.dispatch(["dag_a"])
+        self.assertEqual(calcs, ["dag_a", "dag_a"], "calc re-fires after the molecule changes")
+        mgr.close()
+
+    def test_16_work_queue(self):
+        """测试优先级队列：类内优先级与老化、类间加权公平共享、优先级文件"""
+        print("\n🧪 Test 16: Priority Queue / Fair Share")
+        now = [0.0]
+        q = WorkQueue({"main": 3.0, "extra": 1.0}, aging_per_hour=1.0, clock=lambda: now[0])
+        q.push("main", "low", 0)
+        now[0] = 1800
+        q.push("main", "high", 1)
+        self.assertEqual(q.pop_next().key, "high", "Higher priority goes first")
+        
+        # 老化：等待 2 小时以上的低优先级任务超过新来的 +1 任务
+        now[0] = 3 * 3600
+        q.push("main", "new", 1)
+        self.assertEqual(q.pop_next().key, "low", "Aged entry should overtake")
+        
+        # 重复 push / 更新优先级保留原入队时间
+        t0 = q.entries["new"].enqueued_at
+        now[0] += 100
+        q.push("main", "new", 5)
+        self.assertEqual(q.entries["new"].enqueued_at, t0)
+        self.assertTrue(q.discard("new"))
+        self.assertEqual(len(q), 0)
+        self.assertIsNone(q.pop_next())
+        
+        # 公平共享：两类都积压时按 3:1 派发
+        for i in range(40):
+            q.push("main", ("m", i), 0)
+            q.push("extra", ("e", i), 100)
+        picks = []
+        for _ in range(20):
+            e = q.pop_next()
+            q.charge(e.cls, 1)
+            picks.append(e.cls)
+        self.assertEqual(picks.count("main"), 15, f"Expected 3:1 split, got {picks}")
+        
+        # can_run 为假时跳到下一类，类内不回填
+        e = q.pop_next(lambda e: e.cls == "extra")
+        self.assertEqual(e.cls, "extra")
+        
+        # 优先级文件：旁车 .prio 优先于文件名前缀
+        f1 = TEST_ROOT / "P7_mol.xyz"
+        f1.write_text("x")
+        self.assertEqual(file_priority(f1), 7)
+        f1.with_suffix(".prio").write_text("-3\n")
+        self.assertEqual(file_priority(f1), -3)
+        self.assertEqual(file_priority(TEST_ROOT / "plain.xyz"), 0)
+        
+        # 调度器必须使用传入的 (可能为空的) 共享队列
+        shared = WorkQueue()
+        self.assertIs(DagScheduler(None, None, None, None, queue=shared).queue, shared)
+
+    def test_17_packed_subjobs(self):
+        """测试打包模式：gas/solv/sp 串联为一次运行，合并输出切分回各步骤"""
+        print("\n🧪 Test 17: Packed Sub-jobs")
+        import mock_program
+        mol = "pack_mol"
+        job, steps = SubGenerator().generate_packed(mol, 0, 1, "C 0 0 0", ["gas", "solv", "sp"])
+        self.assertEqual(steps, ["gas", "solv", "sp"])
+        self.assertEqual(job.read_text().count("--Link1--"), 2)
+        self.assertIn("\n\n--Link1--\n", job.read_text(), "Each Link1 block must end with a blank line")
+        
+        tracker = StatusTracker(str(TEST_ROOT / "pack_status.json"))
+        mgr = JobManager(tracker, max_concurrent=2)
+        outputs = {t: config.DIRS[t] / f"{mol}_{t}.out" for t in steps}
+        self.assertTrue(mgr.submit(job, mol, "pack", outputs=outputs))
+        self.assertTrue(mgr.is_running(mol, "solv"), "Packed slot covers every packed step")
+        self.assertEqual(tracker.data[mol]["sp"]["status"], "RUNNING")
+        mgr.slot_for(mol, "gas").proc.wait(timeout=10)
+        mgr.poll()
+        for i, t in enumerate(steps):
+            self.assertEqual(tracker.data[mol][t]["status"], "DONE")
+            self.assertAlmostEqual(parse_output(outputs[t]).energy, -100.0 - i)
+        mgr.close()
+        
+        # ORCA $new_job 输出：只有末尾有终止行，前面的片段也应判定为完成
+        combined = TEST_ROOT / "orca_pack.out"
+        mock_program.write_packed_out(combined, 3, orca=True)
+        targets = [TEST_ROOT / f"orca_pack_{t}.out" for t in steps]
+        self.assertEqual(split_output(combined, targets), targets)
+        for i, t in enumerate(targets):
+            rec = parse_output(t)
+            self.assertEqual((rec.program, rec.status()), ("orca", ("DONE", "")))
+            self.assertAlmostEqual(rec.energy, -100.0 - i)
+        
+        # 运行中断：只切出已开始的子任务，未完成的片段判为 Incomplete
+        partial = TEST_ROOT / "g_partial.out"
+        mock_program.write_gaussian_out(partial)
+        with open(partial, 'a') as f: f.write(" Entering Gaussian System\n SCF Done:  E(RB3LYP) =  -101.0 A.U.\n")
+        written = split_output(partial, [TEST_ROOT / "gp_1.out", TEST_ROOT / "gp_2.out", TEST_ROOT / "gp_3.out"])
+        self.assertEqual(len(written), 2)
+        self.assertEqual(parse_output(written[1]).status(), ("ERROR", "Incomplete"))
+
+    def test_18_opt_restart(self):
+        """测试优化续算：从最后几何生成续算输入、复用 chk/gbw、归档旧尝试、次数上限"""
+        print("\n🧪 Test 18: Opt Restart")
+        import mock_program
+        opt_dir = config.DIRS["opt"]
+        tracker = StatusTracker(str(TEST_ROOT / "restart_status.json"))
+        mgr = JobManager(tracker)
+        restarter = OptRestarter(mgr, max_attempts=1)
+        
+        # Gaussian：被杀的任务 (无终止行)，有 chk
+        g_in = opt_dir / "rs_g_opt.gjf"
+        g_in.write_text("%chk=rs_g_opt.chk\n# opt freq b3lyp/6-31g\n\ntitle\n\n0 1\nC 0 0 0\nH 0 0 1.5\n\n1 2 F\n\n")
+        (opt_dir / "rs_g_opt.chk").write_text("chk")
+        g_out = opt_dir / "rs_g_opt.out"
+        mock_program.write_gaussian_out(g_out)
+        g_out.write_text(g_out.read_text().replace(" Normal termination of Gaussian 16.\n", ""))
+        st, err = mgr.get_status_from_file(g_out, is_opt=True)
+        tracker.finish_task("rs_g", "opt", st, err)
+        self.assertEqual((st, err), ("ERROR", "Incomplete"))
+        
+        # 默认关闭：失败的优化留给人工检查
+        self.assertEqual(config.OPT_RESTART_MAX, 0)
+        self.assertFalse(OptRestarter(mgr).can_restart("rs_g"))
+        self.assertTrue(restarter.can_restart("rs_g"))
+        self.assertEqual(restarter.prepare("rs_g"), g_in)
+        text = g_in.read_text()
+        self.assertIn("# opt freq b3lyp/6-31g Guess=Read", text)
+        self.assertNotIn("H 0 0 1.5", text, "Geometry should come from the last output point")
+        self.assertIn("1.000000", text)
+        self.assertIn("\n\n1 2 F\n", text, "Sections after the geometry must be kept")
+        self.assertTrue((opt_dir / "rs_g_opt.r1.out").exists())
+        self.assertTrue((opt_dir / "rs_g_opt.r1.gjf").exists())
+        self.assertFalse(g_out.exists())
+        
+        # 再次失败时达到上限，不再续算
+        mock_program.write_gaussian_out(g_out)
+        g_out.write_text(g_out.read_text().replace(" Normal termination of Gaussian 16.\n", ""))
+        self.assertEqual(restarter.attempts("rs_g"), 1)
+        self.assertFalse(restarter.can_restart("rs_g"))
+        
+        # ORCA：未收敛，.gbw 改名后 MORead
+        o_in = opt_dir / "rs_o_opt.inp"
+        o_in.write_text("! B3LYP def2-SVP Opt\n* xyz 0 1\nC 0 0 0\nH 0 0 1.5\n*\n")
+        (opt_dir / "rs_o_opt.gbw").write_text("gbw")
+        o_out = opt_dir / "rs_o_opt.out"
+        mock_program.write_orca_out(o_out)
+        o_out.write_text(o_out.read_text().replace("THE OPTIMIZATION HAS CONVERGED\n", ""))
+        tracker.finish_task("rs_o", "opt", *mgr.get_status_from_file(o_out, is_opt=True))
+        self.assertEqual(tracker.data["rs_o"]["opt"]["status"], "ERR_NC")
+        
+        sched = DagScheduler(tracker, mgr, lambda m, s: True, lambda m: None,
+                             retry=lambda mol, step: step == "opt" and restarter.can_restart(mol))
+        self.assertEqual(list(sched.ready(["rs_o", "rs_g"])), [("rs_o", "opt")])
+        
+        restarter.prepare("rs_o")
+        lines = o_in.read_text().splitlines()
+        self.assertEqual(lines[1:3], ["! MORead", '%moinp "rs_o_opt.r1.gbw"'])
+        self.assertEqual(lines[3], "* xyz 0 1")
+        self.assertTrue((opt_dir / "rs_o_opt.r1.gbw").exists())
+        self.assertEqual(lines[-1], "*")
+        
+        # 用户手动停止 (s / x) 的优化留下部分输出，但不会被自动续算或重新提交
+        partial = TEST_ROOT / "partial_opt.out"
+        mock_program.write_gaussian_out(partial)
+        partial.write_text(partial.read_text().replace(" Normal termination of Gaussian 16.\n", ""))
+        s_in = opt_dir / "rs_s_opt.gjf"
+        s_in.write_text("# opt freq b3lyp/6-31g\n\ntitle\n\n0 1\nC 0 0 0\nH 0 0 1.5\n\n")
+        original_cmd = config.COMMAND_MAP[".gjf"]
+        config.COMMAND_MAP[".gjf"] = f"cat {partial.resolve()} > {{output}}; sleep 5"
+        try:
+            self.assertTrue(mgr.submit(s_in, "rs_s", "opt"))
+            key = mgr.slot_key("rs_s", "opt")
+            proc = mgr.slots[key].proc
+            for _ in range(100):
+                if (opt_dir / "rs_s_opt.out").exists() and (opt_dir / "rs_s_opt.out").stat().st_size: break
+                time.sleep(0.02)
+            self.assertTrue(mgr.stop_job(key))
+            proc.wait(timeout=5)
+            mgr.poll()
+        finally:
+            config.COMMAND_MAP[".gjf"] = original_cmd
+        self.assertEqual(tracker.get("rs_s", "opt")["error"], "Stopped")
+        self.assertTrue(stop_marker(s_in).exists())
+        self.assertFalse(restarter.can_restart("rs_s"))
+        self.assertEqual(list(sched.ready(["rs_s"])), [])
+        # 删除标记后恢复为可续算
+        stop_marker(s_in).unlink()
+        tracker.finish_task("rs_s", "opt", *mgr.get_status_from_file(opt_dir / "rs_s_opt.out", is_opt=True))
+        self.assertEqual(list(sched.ready(["rs_s"])), [("rs_s", "opt")])
+        mgr.close()
+
+    def test_19_result_cache(self):
+        """测试内容寻址缓存：与名字无关、坐标容差、生成器短路、LRU 淘汰、调度推进"""
+        print("\n🧪 Test 19: Result Cache")
+        tpl = "# opt [NAME]\n[Charge] [Multiplicity]\n[GEOMETRY]"
+        k = input_key(tpl, 0, 1, "C 0 0 0\nH 0 0 1.0")
+        self.assertEqual(k, input_key(tpl, 0, 1, "c   0.00001  -0.0  0\nH 0 0 0.99999"), "Format / tolerance invariant")
+        self.assertNotEqual(k, input_key(tpl, 1, 2, "C 0 0 0\nH 0 0 1.0"))
+        self.assertNotEqual(k, input_key(tpl, 0, 1, "C 0 0 0\nH 0 0 1.1"))
+        
+        cache = ResultCache(TEST_ROOT / "rcache", max_bytes=10_000)
+        opt_gen = OptGenerator(cache)
+        (TEST_XYZ / "cache_a.xyz").write_text("2\nCharge=0 Multiplicity=1\nC 0 0 0\nH 0 0 1\n")
+        (TEST_XYZ / "cache_b.xyz").write_text("2\nCharge=0 Multiplicity=1\nC 0.0 0.0 0.0\nH 0.0 0.0 1.0\n")
+        a_in = opt_gen.generate(TEST_XYZ / "cache_a.xyz")
+        a_out = a_in.with_suffix(".out")
+        self.assertFalse(a_out.exists())
+        a_out.write_text("finished output A\n")
+        self.assertTrue(cache.commit(a_out))
+        
+        # 同一结构换个名字：生成输入时直接恢复输出
+        b_in = opt_gen.generate(TEST_XYZ / "cache_b.xyz")
+        self.assertEqual(b_in.with_suffix(".out").read_text(), "finished output A\n")
+        self.assertEqual(cache.hits, 1)
+        
+        # 重启后索引从磁盘重建；超出容量时淘汰最久未用的条目
+        cache = ResultCache(TEST_ROOT / "rcache", max_bytes=3000)
+        first = cache.key((TEST_TEMPLATES / "opt.gjf").read_text(), 0, 1, "C 0 0 0\nH 0 0 1")
+        self.assertIn(first, cache.index)
+        for i in range(3):
+            out = TEST_ROOT / f"lru_{i}.out"
+            out.write_text(str(i) * 1000)
+            cache.pending[str(out)] = f"{i:02d}" + "0" * 62
+            cache.commit(out)
+            time.sleep(0.01)
+        self.assertNotIn(first, cache.index, "Oldest entry should be evicted first")
+        self.assertLessEqual(cache.total, 3000)
+        
+        # 登记表持久化：重启 (新实例) 后结束的任务照样入库；检查点随输出一起缓存和恢复
+        root = TEST_ROOT / "rcache_chk"
+        chk_tpl = "%chk=[NAME].chk\n# opt [NAME]\n[Charge] [Multiplicity]\n[GEOMETRY]"
+        target = TEST_ROOT / "chk_a_opt.out"
+        self.assertFalse(ResultCache(root).lookup(chk_tpl, 0, 1, "C 0 0 0", target))
+        target.write_text("output with chk\n")
+        target.with_suffix(".chk").write_text("checkpoint\n")
+        restarted = ResultCache(root)
+        self.assertTrue(restarted.commit(target))
+        self.assertEqual(restarted.pending, {})
+        other = TEST_ROOT / "chk_b_opt.out"
+        self.assertTrue(ResultCache(root).lookup(chk_tpl, 0, 1, "C 0 0 0", other))
+        self.assertEqual(other.with_suffix(".chk").read_text(), "checkpoint\n")
+        self.assertEqual(ResultCache(root).total, len("output with chk\n") + len("checkpoint\n"))
+        # 读外部检查点 / 检查点不与输出同名的模板不缓存
+        for tpl in ("%oldchk=prev.chk\n# sp guess=read [NAME]\n[GEOMETRY]", "%chk=fixed.chk\n# opt\n[GEOMETRY]",
+                    "! B3LYP MORead\n%moinp \"x.gbw\"\n[GEOMETRY]"):
+            self.assertFalse(cacheable(tpl))
+            self.assertFalse(restarted.lookup(tpl, 0, 1, "C 0 0 0", TEST_ROOT / "nocache.out"))
+        self.assertNotIn(str(TEST_ROOT / "nocache.out"), restarted.pending)
+        
+        # 调度：launch 未启动进程但节点已完成 (命中缓存) 时，同一轮继续派发后继节点
+        tracker = StatusTracker(str(TEST_ROOT / "cache_status.json"))
+        mgr = JobManager(tracker, max_concurrent=3)
+        launched = []
+        def launch(mol, step):
+            if step == "opt":
+                tracker.finish_task(mol, "opt", "DONE"); return False
+            launched.append(step); tracker.start_task(mol, step); return True
+        sched = DagScheduler(tracker, mgr, launch, lambda m: None)
+        tracker.finish_task("cache_c", "opt", "MISSING")
+        self.assertTrue(sched.dispatch(["cache_c"]))
+        self.assertEqual(sorted(launched), ["gas", "solv", "sp"])
+        mgr.close()
+
+    def test_20_xyz_ensemble(self):
+        """测试多帧 XYZ：流式逐帧读取、兼容旧单帧写法、展开为 confNNN 分子、模板编译缓存"""
+        print("\n🧪 Test 20: XYZ Ensemble / Template Cache")
+        ens_dir = TEST_ROOT / "ens_xyz"
+        ens_dir.mkdir()
+        ens = ens_dir / "crest.xyz"
+        ens.write_text("2\nCharge=-1 Multiplicity=2 E=-1.5\nC 0 0 0\nH 0 0 1\n\n"
+                       "2\n  -1.4\nC 0 0 0\nH 0 0 1.1\n"
+                       "2\n  -1.3\nC 0 0 0\nH 0 0 1.2\n")
+        frames = list(iter_frames(ens))
+        self.assertEqual([f.index for f in frames], [0, 1, 2])
+        self.assertEqual(frames[2].coords, "C 0 0 0\nH 0 0 1.2")
+        self.assertTrue(is_ensemble(ens))
+        
+        # 旧写法：原子数写错 / 第一行不是数字，第 3 行以后全部是坐标
+        legacy = ens_dir / "legacy.xyz"
+        legacy.write_text("2\nCharge=0 Multiplicity=1\nC 0 0 0\nH 0 0 1\nH 0 1 0")
+        self.assertFalse(is_ensemble(legacy))
+        self.assertEqual(next(iter_frames(legacy)).n_atoms, 3)
+        legacy.write_text("atoms\nCharge=0 Multiplicity=1\nC 0 0 0\nH 0 0 1")
+        self.assertEqual(next(iter_frames(legacy)).coords, "C 0 0 0\nH 0 0 1")
+        
+        ingestor = EnsembleIngestor(ens_dir)
+        self.assertEqual(ingestor.expand(sorted(ens_dir.glob("*.xyz"))), 3)
+        self.assertFalse(ens.exists())
+        self.assertTrue((ens_dir / "ensembles" / "crest.xyz").exists())
+        conf = ens_dir / "crest_conf002.xyz"
+        self.assertEqual(conf.read_text(), "2\nCharge=-1 Multiplicity=2 -1.4\nC 0 0 0\nH 0 0 1.1\n")
+        self.assertEqual(OptGenerator()._parse_xyz(conf), (-1, 2, "C 0 0 0\nH 0 0 1.1"))
+        self.assertEqual(ingestor.expand(sorted(ens_dir.glob("*.xyz"))), 0, "Single-frame files are not re-split")
+        
+        # 模板：编译一次，修改后按 mtime 重新编译
+        tpl_file = TEST_ROOT / "tpl.gjf"
+        tpl_file.write_text("# [NAME]\n[Charge] [Multiplicity]\n[GEOMETRY]\n")
+        tpl = load_template(tpl_file)
+        self.assertIs(load_template(tpl_file), tpl)
+        self.assertEqual(tpl.render("m_opt", 0, 1, "C 0 0 0"), "# m_opt\n0 1\nC 0 0 0\n")
+        tpl_file.write_text("# changed [NAME]\n")
+        os.utime(tpl_file, ns=(0, 10**9))
+        self.assertEqual(load_template(tpl_file).render("x", 0, 1, ""), "# changed x\n")
+
+    def test_21_slurm_executor(self):
+        """测试 Slurm 后端 (mock_slurm.py)：sbatch 提交、批量轮询、scancel、重启后接管在途作业"""
+        print("\n🧪 Test 21: Slurm Executor")
+        os.environ["MOCK_SLURM_DIR"] = str((TEST_ROOT / "slurm").absolute())
+        os.environ["MOCK_SLURM_PENDING"] = "0.3"
+        mock = Path("mock_slurm.py").absolute()
+        commands = {t: f"{sys.executable} {mock} {t}" for t in ("sbatch", "squeue", "sacct", "scancel")}
+        state_file = TEST_DATA / ".slurm_jobs.json"
+        make = lambda: SlurmExecutor(state_file=state_file, poll_interval=0.2, commands=commands, tick=0.1)
+        
+        tracker = StatusTracker(str(TEST_ROOT / "slurm_status.json"))
+        ex = make()
+        mgr = JobManager(tracker, max_concurrent=3, executor=ex)
+        mols = [f"slurm_{i}" for i in range(3)]
+        for mol in mols:
+            job = config.DIRS["opt"] / f"{mol}_opt.gjf"
+            job.write_text("%nprocshared=4\n# opt\n")
+            self.assertTrue(mgr.submit(job, mol, "opt"))
+        self.assertIn("--cpus-per-task=4", (config.DIRS["opt"] / "slurm_0_opt.sbatch").read_text())
+        self.assertEqual(len(json.loads(state_file.read_text())), 3)
+        mgr.stop_job(mgr.slot_key(mols[2], "opt"))
+        mgr.slots[mgr.slot_key(mols[2], "opt")].proc.wait(timeout=10)
+        mgr.poll()
+        self.assertEqual(tracker.data[mols[2]]["opt"]["status"], "ERROR")
+        self.assertEqual(tracker.data[mols[2]]["opt"]["error"], "Stopped")
+        
+        # 模拟 main.py 重启：作业仍在队列中，新的执行后端从状态文件接管
+        mgr.close()
+        ex2 = make()
+        mgr2 = JobManager(tracker, max_concurrent=3, executor=ex2)
+        t0 = time.time()
+        self.assertEqual(mgr2.reattach(), 2)
+        for mol in mols[:2]: mgr2.slots[mgr2.slot_key(mol, "opt")].proc.wait(timeout=10)
+        elapsed = time.time() - t0
+        self.assertEqual(len(mgr2.poll()), 2)
+        for mol in mols[:2]: self.assertEqual(tracker.data[mol]["opt"]["status"], "DONE")
+        # 每个周期一次 squeue，与在途作业数无关
+        self.assertLessEqual(ex2.polls, elapsed / 0.2 + 2)
+        self.assertEqual(json.loads(state_file.read_text()), {})
+        mgr2.close()
+        
+        # 没有记账记录：先等几个周期重试 sacct，仍然没有则记为 UNKNOWN，输出缺失 / 不完整时报失败
+        from types import SimpleNamespace
+        from src.executors import SlurmJob
+        ex3 = SlurmExecutor(state_file=TEST_ROOT / "slurm_unknown.json", commands=commands, accounting_retries=2)
+        ex3.query = lambda: {}
+        # sacct 第二次查询时才有 "late" 的记录，"lost" 始终没有
+        ex3.accounting = lambda ids: {"late": ("CANCELLED", 0)} if ex3.polls >= 2 and "late" in ids else {}
+        jobs = {i: SlurmJob(ex3, i, {}) for i in ("late", "lost")}
+        ex3.jobs.update(jobs)
+        ex3.refresh(); ex3.refresh()
+        self.assertEqual(jobs["late"].failure, "CANCELLED", "A late sacct record must still be used")
+        self.assertIsNone(jobs["lost"].returncode)
+        ex3.refresh()
+        self.assertEqual(jobs["lost"].failure, "UNKNOWN")
+        slot = SimpleNamespace(proc=jobs["lost"])
+        self.assertEqual(JobManager._scheduler_status(slot, "ERROR", "Incomplete"), ("ERROR", "Slurm UNKNOWN"))
+        self.assertEqual(JobManager._scheduler_status(slot, "MISSING", ""), ("ERROR", "Slurm UNKNOWN"))
+        self.assertEqual(JobManager._scheduler_status(slot, "DONE", ""), ("DONE", ""))
+
+    def test_22_scratch_staging(self):
+        """测试 scratch 暂存：在私有目录中运行，只复制回声明的产物，统计搬运字节与 scratch 占用"""
+        print("\n🧪 Test 22: Scratch Staging")
+        scratch = (TEST_ROOT / "scratch").absolute()
+        stager = ScratchStager(root=str(scratch), sample_interval=0.1)
+        tracker = StatusTracker(str(TEST_ROOT / "stage_status.json"))
+        mgr = JobManager(tracker, stager=stager)
+        finished = []
+        mgr.observers.append(lambda ev, slot: ev == "finish" and finished.append(slot))
+        
+        opt_dir = config.DIRS["opt"]
+        job = opt_dir / "stage_mol_opt.gjf"
+        job.write_text("%chk=stage_mol_opt.chk\n# opt\n")
+        (opt_dir / "stage_mol_opt.chk").write_text("old")
+        os.utime(opt_dir / "stage_mol_opt.chk", (0, 0))
+        self.assertEqual([p.name for p in stager.stage_files(job)], ["stage_mol_opt.gjf", "stage_mol_opt.chk"])
+        self.assertTrue(mgr.submit_and_wait(job, "stage_mol", "opt"))
+        
+        self.assertEqual(tracker.data["stage_mol"]["opt"]["status"], "DONE")
+        self.assertTrue((opt_dir / "stage_mol_opt.out").exists(), "Output is written straight to the shared dir")
+        self.assertEqual((opt_dir / "stage_mol_opt.chk").read_text(), "checkpoint\n" * 100)
+        self.assertFalse(list(opt_dir.glob("Gau-*.rwf")), "Scratch files must not be copied back")
+        self.assertEqual(list((scratch / ScratchStager.SUBDIR).iterdir()), [], "Scratch dir is pruned")
+        staged = finished[0].staged
+        self.assertEqual(staged["in"], job.stat().st_size + 3)
+        self.assertEqual(staged["out"], len("checkpoint\n") * 100)
+        self.assertGreater(staged["scratch"], 0)
+        self.assertFalse(stager.stats_file(job).exists())
+        
+        # 遗留目录过期后清理，运行中的任务目录保留
+        for name in ("stale_opt.abc123", "busy_opt.def456"):
+            (scratch / ScratchStager.SUBDIR / name).mkdir()
+            os.utime(scratch / ScratchStager.SUBDIR / name, (0, 0))
+        self.assertEqual(stager.prune(active=["busy_opt"]), 1)
+        self.assertTrue((scratch / ScratchStager.SUBDIR / "busy_opt.def456").exists())
+        mgr.close()
+
+    def test_23_compressed_outputs(self):
+        """测试输出压缩：后台 gzip、解析缓存随文件转移、解析器 / 状态扫描 / Sweeper 透明读取"""
+        print("\n🧪 Test 23: Compressed Outputs")
+        from mock_program import write_gaussian_out
+        import gzip
+        out = config.DIRS["gas"] / "cmp_mol_gas.out"
+        write_gaussian_out(out, size_mb=0.3, energy=-123.5)
+        plain = parse_output(out)
+        
+        tracker = StatusTracker(str(TEST_ROOT / "cmp_status.json"))
+        mgr = JobManager(tracker, parse_cache=ParseCache(str(TEST_ROOT / "cmp_cache.json")))
+        mgr.compressor = OutputCompressor("gzip", min_bytes=0, delay=0, parse_cache=mgr.parse_cache)
+        self.assertEqual(mgr.get_status_from_file(out)[0], "DONE")
+        mgr.compress_output(out, "DONE")
+        mgr.compressor.pending[str(out)][0].result(timeout=10)
+        mgr.poll()
+        gz = out.with_name(out.name + ".gz")
+        self.assertFalse(out.exists())
+        self.assertTrue(gz.exists())
+        plain_size = len(gzip.decompress(gz.read_bytes()))
+        self.assertLess(gz.stat().st_size, plain_size)
+        self.assertEqual(mgr.compressor.bytes_in, plain_size)
+        
+        # 状态扫描命中转移后的缓存 (不解压)；直接解析压缩文件得到同一条记录
+        misses = mgr.parse_cache.misses
+        self.assertEqual(mgr.get_status_from_file(out), ("DONE", ""))
+        self.assertEqual(mgr.parse_cache.misses, misses)
+        self.assertEqual(find_output(config.DIRS["gas"] / "cmp_mol_gas"), gz)
+        self.assertEqual(parse_output(gz).without_coordinates(), plain.without_coordinates())
+        self.assertEqual(mgr.get_record(out, with_coords=True).coordinates, plain.coordinates)
+        
+        # 压缩期间原文件被改写：压缩结果作废
+        out2 = config.DIRS["gas"] / "cmp_mol2_gas.out"
+        write_gaussian_out(out2)
+        self.assertTrue(mgr.compressor.submit(out2))
+        mgr.compressor.pending[str(out2)][0].result(timeout=10)
+        write_gaussian_out(out2, energy=-200.0)
+        os.utime(out2, ns=(0, 10**9))
+        self.assertEqual(mgr.compressor.drain(), [])
+        self.assertTrue(out2.exists())
+        self.assertFalse(out2.with_name(out2.name + ".gz").exists())
+        
+        # Sweeper 识别压缩后的 extra 输出
+        (TEST_EXTRA / "cmpx.gjf").write_text("x")
+        (TEST_EXTRA / "cmpx.out.gz").write_bytes(gz.read_bytes())
+        sweeper = TaskSweeper(mgr)
+        sweeper.scan()
+        self.assertEqual(tracker.data["[Extra]cmpx"]["root"]["status"], "DONE")
+        self.assertNotIn(("[Extra]cmpx", "root"), sweeper.pending)
+        for f in TEST_EXTRA.glob("cmpx.*"): f.unlink()
+        mgr.close()
+
+    def test_24_summary_sidecar(self):
+        """测试摘要文件：结束后写出、之后不再解析、输出改写后失效、并行重建"""
+        print("\n🧪 Test 24: Summary Sidecar")
+        from mock_program import write_gaussian_out
+        import src.job_manager as jm
+        out = config.DIRS["sp"] / "sum_mol_sp.out"
+        write_gaussian_out(out, energy=-50.0)
+        mgr = JobManager(StatusTracker(str(TEST_ROOT / "sum_status.json")))
+        record = mgr.get_record(out, with_coords=True)
+        self.assertTrue(summary_path(out).exists())
+        self.assertEqual(summary_path(out).name, "sum_mol_sp.summary.json")
+        self.assertEqual(read_summary(out), record)
+        self.assertEqual(record.frequencies, (100.0, 200.0, 300.0))
+        
+        # 有摘要时不再打开输出
+        original = jm.parse_output
+        jm.parse_output = lambda p: self.fail("output was reparsed")
+        try:
+            self.assertEqual(mgr.get_record(out, with_coords=True).coordinates, record.coordinates)
+            self.assertEqual(mgr.get_status_from_file(out), ("DONE", ""))
+        finally:
+            jm.parse_output = original
+        
+        # 输出被改写：摘要过期，重新解析并更新
+        write_gaussian_out(out, energy=-60.0)
+        os.utime(out, ns=(0, 10**9))
+        self.assertIsNone(read_summary(out))
+        self.assertEqual(mgr.get_record(out).energy, -60.0)
+        self.assertEqual(read_summary(out).energy, -60.0)
+        
+        # 还在运行的输出不写摘要
+        running = config.DIRS["sp"] / "sum_run_sp.out"
+        running.write_text(" Entering Gaussian System\n SCF Done:  E(RB3LYP) =  -1.0     A.U.\n")
+        mgr.get_record(running)
+        self.assertFalse(summary_path(running).exists())
+        
+        # 已有目录树并行重建
+        tree = TEST_ROOT / "sum_tree"
+        (tree / "sub").mkdir(parents=True)
+        for i, d in enumerate([tree, tree, tree / "sub"]):
+            write_gaussian_out(d / f"t{i}_opt.out")
+        counts = rebuild_summaries([tree], workers=2)
+        self.assertEqual(counts["written"], 3)
+        self.assertTrue(summary_path(tree / "sub" / "t2_opt.out").exists())
+        self.assertEqual(rebuild_summaries([tree], workers=2)["fresh"], 3)
+        mgr.close()
+
+    def test_25_qrrho_thermo(self):
+        """测试由保存的频率整批计算 quasi-RRHO 热校正"""
+        print("\n🧪 Test 25: Quasi-RRHO Thermochemistry")
+        import numpy as np
+        import mock_program
+        from src.parsers import parse_output, ParsedOutput
+        from src.calculator import ThermodynamicsCalculator
+        from src.thermo import ThermoBatch, quasi_rrho, thermal_corrections
+        
+        g_out, o_out = TEST_ROOT / "rrho_g.out", TEST_ROOT / "rrho_o.out"
+        mock_program.write_gaussian_out(g_out)
+        mock_program.write_orca_out(o_out)
+        g, o = parse_output(g_out), parse_output(o_out)
+        self.assertEqual((g.mass, g.rot_constants, g.symmetry), (16.0313, (157.0, 157.0, 157.0), 1))
+        self.assertAlmostEqual(o.rot_constants[0], 157.0, places=1)  # ORCA 的 cm^-1 换算为 GHz
+        
+        def rec(freqs, mass, rot, sym=1, mult=1):
+            return ParsedOutput("gaussian", True, False, True, False, 0, mult, None, -1.0, 0.01, freqs, mass, rot, sym)
+        
+        # 水：纯谐振子结果与标准熵 45.1 cal/(mol K) 一致；全是高频模式时三种方法相同
+        water = rec((1713.1, 3727.4, 3849.1), 18.01056, (816.9, 401.6, 269.3), sym=2)
+        s = {m: quasi_rrho(ThermoBatch.from_records({"w": water}), method=m) for m in ("rrho", "grimme", "truhlar")}
+        self.assertAlmostEqual(s["rrho"]["s_total"][0] / 4.184, 45.1, delta=0.2)
+        self.assertAlmostEqual(s["rrho"]["zpe"][0], 0.02116, places=4)
+        for m in ("grimme", "truhlar"): self.assertAlmostEqual(s[m]["g_corr"][0], s["rrho"]["g_corr"][0], places=6)
+        # 线型分子 (CO2) 的转动熵
+        co2 = quasi_rrho(ThermoBatch.from_records({"c": rec((667.0, 667.0, 1333.0, 2349.0), 43.98983, (11.7,), 2)}), method="rrho")
+        self.assertAlmostEqual(co2["s_total"][0] / 4.184, 51.1, delta=0.3)
+        
+        # 低频模式：quasi-RRHO 熵小于谐振子，虚频被忽略
+        floppy = rec((12.0, 30.0, 80.0, 1500.0), 100.0, (1.0, 2.0, 3.0))
+        b = ThermoBatch.from_records({"f": floppy, "i": rec((-40.0, 12.0, 30.0, 80.0, 1500.0), 100.0, (1.0, 2.0, 3.0))})
+        rrho, grimme, truhlar = (quasi_rrho(b, method=m) for m in ("rrho", "grimme", "truhlar"))
+        self.assertLess(grimme["s_vib"][0], rrho["s_vib"][0])
+        self.assertLess(truhlar["s_vib"][0], rrho["s_vib"][0])
+        self.assertGreater(grimme["g_corr"][0], rrho["g_corr"][0])
+        np.testing.assert_allclose(grimme["g_corr"][0], grimme["g_corr"][1])
+        
+        # 整批结果与逐个计算一致 (不同模式数补齐)
+        rng = np.random.default_rng(1)
+        recs = {f"m{i}": rec(tuple(rng.uniform(10, 3500, 3 + i).tolist()), 50.0 + i, tuple(rng.uniform(0.5, 5, 3).tolist()),
+                             mult=1 + i % 3) for i in range(30)}
+        batch = thermal_corrections(recs, method="grimme")
+        for k, r in recs.items():
+            self.assertAlmostEqual(batch[k], thermal_corrections({k: r}, method="grimme")[k], places=12)
+        self.assertIsNone(thermal_corrections({"x": rec(None, None, None)})["x"])
+        
+        # 计算器：默认采用程序打印的值，配置 QRRHO 后整批重算，缺少频率时回退
+        self.assertEqual(ThermodynamicsCalculator.thermal_corrections({"g": g})["g"], 0.08)
+        self.assertEqual(ThermodynamicsCalculator.settings_tag(), "")
+        config.QRRHO = "grimme"
+        try:
+            corr = ThermodynamicsCalculator.thermal_corrections({"g": g, "w": water, "x": rec(None, None, None)})
+            self.assertNotEqual(corr["g"], 0.08)
+            self.assertAlmostEqual(corr["w"], s["grimme"]["g_corr"][0], places=10)
+            self.assertEqual(corr["x"], 0.01)
+            self.assertEqual(ThermodynamicsCalculator.collect_energies(g, {})["thermal_corr"], corr["g"])
+            self.assertIn("grimme", ThermodynamicsCalculator.settings_tag())
+        finally:
+            config.QRRHO = None
+
+    def test_26_thermo_grid(self):
+        """测试 T × P × c 网格：一次广播求出所有分子的 G，写出 npz 与 CSV 透视表"""
+        print("\n🧪 Test 26: T/P/c Grid")
+        import csv
+        import numpy as np
+        import mock_program
+        from src.parsers import ParsedOutput
+        from src.results_store import ResultsStore
+        from src.thermo import ThermoBatch, quasi_rrho
+        from src.grid import conc_correction, evaluate_grid, write_grid, grid_from_results, parse_axis
+        
+        # 298.15 K、1 atm -> 1 M 的标准态换算即原来的固定 1.89 kcal/mol
+        one = np.array([1.0])
+        self.assertAlmostEqual(conc_correction(np.array([298.15]), one, one)[0, 0, 0] * config.HARTREE_TO_KCAL, 1.89, places=2)
+        self.assertEqual(parse_axis(["250", "300:400:3"]).tolist(), [250.0, 300.0, 350.0, 400.0])
+        
+        def rec(freqs):
+            return ParsedOutput("gaussian", True, False, True, False, 0, 1, None, -76.0, 0.0, freqs,
+                                18.01056, (816.9, 401.6, 269.3), 2)
+        water = rec((1713.1, 3727.4, 3849.1))
+        floppy = rec((15.0, 60.0, 1713.1, 3727.4))
+        records = {"mol_a": floppy, "H2O": water, "bare": rec(None)}
+        energies = {m: {"sp": -76.4, "gas": -76.3, "solv": -76.31} for m in records}
+        temps = np.linspace(250.0, 400.0, 100)
+        grid = evaluate_grid(records, energies, temps, [0.5, 1.0], [0.1, 1.0], method="grimme")
+        self.assertEqual(grid.g.shape, (3, 100, 2, 2))
+        
+        # 与单点计算一致
+        i = int(np.argmin(np.abs(temps - 298.15)))
+        t = float(temps[i])
+        g_corr = quasi_rrho(ThermoBatch.from_records({"a": floppy}), t, 1.0, method="grimme")["g_corr"][0]
+        conc = conc_correction(np.array([t]), one, one)[0, 0, 0]
+        self.assertAlmostEqual(grid.g[0, i, 1, 1], -76.4 - 0.01 + g_corr + conc, places=6)
+        # 溶液相 G 与压力无关，热校正与压力有关；浓度降低 10 倍 G 降低 RT ln 10
+        np.testing.assert_allclose(grid.g[0, :, 0], grid.g[0, :, 1], atol=1e-10)
+        self.assertGreater(grid.g_corr[0, i, 1], grid.g_corr[0, i, 0])
+        self.assertAlmostEqual((grid.g[0, i, 1, 1] - grid.g[0, i, 1, 0]) * config.HARTREE_TO_KCAL,
+                               8.314462618 * t * np.log(10) / 4184, places=4)
+        # 水保持固定浓度校正；没有频率数据的分子为 NaN
+        self.assertAlmostEqual(grid.g[1, i, 1, 0], grid.g[1, i, 1, 1])
+        self.assertTrue(np.isnan(grid.g[2]).all())
+        
+        npz, table = write_grid(grid, TEST_ROOT / "grid_out")
+        with np.load(npz) as data:
+            self.assertEqual(data["g_hartree"].shape, (3, 100, 2, 2))
+            self.assertEqual(list(data["molecules"]), ["mol_a", "H2O", "bare"])
+        with open(table, newline='') as f: rows = list(csv.reader(f))
+        self.assertEqual(len(rows), 1 + 3 * 2 * 2)
+        self.assertEqual(len(rows[0]), 3 + 100)
+        self.assertEqual(rows[-1][3], "")
+        
+        # 从结果库 + opt 输出 (摘要) 求网格
+        mock_program.write_gaussian_out(config.DIRS["opt"] / "grid_mol_opt.out")
+        store = ResultsStore(str(TEST_ROOT / "grid_results.db"), legacy_csv=None)
+        store.upsert("grid_mol", {"E_SP (Ha)": -100.0, "E_Gas (Ha)": -100.0, "E_Solv (Ha)": -100.01}, "fp")
+        store.upsert("no_output", {"E_SP (Ha)": -1.0, "E_Gas (Ha)": -1.0, "E_Solv (Ha)": -1.0}, "fp")
+        grid = grid_from_results(store, [298.15, 350.0], [1.0], [1.0])
+        store.close()
+        self.assertEqual(grid.molecules, ["grid_mol"])
+        self.assertEqual(grid.method, "rrho")
+        self.assertLess(grid.g[0, 1, 0, 0], grid.g[0, 0, 0, 0])
+
+    def test_27_reaction_network(self):
+        """测试反应网络：定义文件解析、向量化 ΔG / ΔG‡、增量重算、能量跨度与实时导出"""
+        print("\n🧪 Test 27: Reaction Network")
+        import csv
+        import numpy as np
+        from src.results_store import ResultsStore
+        from src.reactions import ReactionNetwork, ReactionMonitor, parse_reactions
+        
+        text = """# 催化循环
+ox: cat + 2 PhBr -> int1 ; ts = ts1
+tm: int1 -> int2 ; ts = ts2 + PhBr
+re: int2 -> cat + prod
+profile cycle: ox tm re
+"""
+        reactions, profiles = parse_reactions(text)
+        self.assertEqual(reactions[0].reactants, (("cat", 1.0), ("PhBr", 2.0)))
+        self.assertEqual(reactions[1].ts, (("ts2", 1.0), ("PhBr", 1.0)))
+        self.assertEqual(profiles, {"cycle": ["ox", "tm", "re"]})
+        for bad in ["a + b -> c", "r: a b", "r: a -> b ; tx = c", "r: a -> b\nr: b -> c", "profile p: nope"]:
+            with self.assertRaises(ValueError): parse_reactions(bad)
+        
+        net = ReactionNetwork(reactions, profiles)
+        net.update_many({"cat": 0.0, "PhBr": -1.0, "int1": -5.0, "ts1": 10.0, "int2": -8.0, "ts2": 5.0})
+        self.assertEqual(net.recompute(), 3)
+        self.assertEqual(net.dg[:2].tolist(), [-3.0, -3.0])
+        self.assertEqual(net.barrier[:2].tolist(), [12.0, 9.0])
+        self.assertTrue(np.isnan(net.dg[2]) and np.isnan(net.barrier[2]))
+        self.assertEqual(net.missing(2), ["prod"])
+        self.assertTrue(np.isnan(net.spans["cycle"]["span"]))
+        
+        # 新分子只触发涉及它的反应
+        self.assertFalse(net.update("unrelated", -1.0))
+        self.assertTrue(net.update("prod", -20.0))
+        self.assertEqual(net.recompute(), 1)
+        self.assertEqual(net.dg[2], -12.0)
+        span = net.spans["cycle"]
+        self.assertEqual((span["span"], span["tdi"], span["tdts"], span["dG_r"]), (12.0, "ox", "ox", -18.0))
+        self.assertFalse(net.update("prod", -20.0))
+        self.assertEqual(net.recompute(), 0)
+        
+        # 已定义但还没算出的过渡态不能当作"没有过渡态"：跨度保持 NaN
+        pending = ReactionNetwork(*parse_reactions("a: A -> B ; ts = T1\nb: B -> A ; ts = T2\nprofile p: a b\n"))
+        pending.update_many({"A": 0.0, "B": 5.0, "T2": 30.0})
+        pending.recompute()
+        span = pending.spans["p"]
+        self.assertTrue(np.isnan(span["span"]))
+        self.assertEqual((span["tdi"], span["tdts"]), ("", ""))
+        pending.update("T1", 20.0)
+        pending.recompute()
+        span = pending.spans["p"]
+        self.assertEqual((span["span"], span["tdi"], span["tdts"]), (30.0, "a", "b"))
+        
+        # 大网络：一次向量化求和与逐条计算一致
+        rng = np.random.default_rng(0)
+        species = [f"s{i}" for i in range(500)]
+        lines = [f"r{i}: {' + '.join(rng.choice(species, 2, replace=False))} -> {rng.choice(species)} ; ts = t{i}"
+                 for i in range(2000)]
+        big = ReactionNetwork(*parse_reactions("\n".join(lines)))
+        g = {s: float(v) for s, v in zip(species + [f"t{i}" for i in range(2000)], rng.normal(0, 10, 2500))}
+        big.update_many(g)
+        big.recompute()
+        for i in (0, 777, 1999):
+            r = big.reactions[i]
+            self.assertAlmostEqual(big.dg[i], sum(g[s] * n for s, n in r.products) - sum(g[s] * n for s, n in r.reactants))
+            self.assertAlmostEqual(big.barrier[i], g[f"t{i}"] - sum(g[s] * n for s, n in r.reactants))
+        big.update("s3", 1.0)
+        self.assertEqual(big.recompute(), len(big.by_species[big.index["s3"]]))
+        
+        # 工作流中的监视器：以结果库初始化，新结果增量推入，定义文件修改后重新加载
+        rfile = TEST_ROOT / "reactions.txt"
+        rfile.write_text(text)
+        store = ResultsStore(str(TEST_ROOT / "rxn_results.db"), legacy_csv=None)
+        for mol, g in {"cat": 0.0, "PhBr": -1.0, "int1": -5.0, "ts1": 10.0, "int2": -8.0, "ts2": 5.0}.items():
+            store.upsert(mol, {"G_Final (kcal/mol)": g}, "fp")
+        rcsv, pcsv = TEST_ROOT / "reactions.csv", TEST_ROOT / "profiles.csv"
+        mon = ReactionMonitor(rfile, store, str(rcsv), str(pcsv))
+        self.assertEqual(mon.sync(), 3)
+        with open(rcsv, newline='') as f: rows = list(csv.DictReader(f))
+        self.assertEqual(rows[0]["dG (kcal/mol)"], "-3.00")
+        self.assertEqual(rows[2]["Missing"], "prod")
+        mon.update("prod", -20.0)
+        self.assertEqual(mon.sync(), 1)
+        with open(pcsv, newline='') as f: rows = list(csv.DictReader(f))
+        self.assertEqual(rows[0]["Energy Span (kcal/mol)"], "12.00")
+        
+        rfile.write_text("bad line\n")
+        os.utime(rfile, ns=(0, 10**9))
+        self.assertEqual(mon.sync(), 0)
+        self.assertIn("line 1", mon.error)
+        store.close()
+
+    def test_28_tui_virtual_tables(self):
+        """测试事件驱动的虚拟化表格：tracker 变化事件、紧凑索引上的筛选 / 排序、只渲染可见窗口"""
+        print("\n🧪 Test 28: Virtualized TUI Tables")
+        import asyncio
+        import threading
+        from src.tracker import StatusTracker
+        from src.tui import GibbsApp, TableModel, VirtualTable, Row, ERROR, RUNNING
+        
+        # 纯模型：筛选 / 排序 / 窗口
+        m = TableModel(sorts=("natural", "name", "G"))
+        m.update({f"m{i:03d}": Row((str(i),), ERROR if i % 10 == 0 else 0, g=-float(i)) for i in range(200)})
+        m.set_natural([f"m{i:03d}" for i in reversed(range(200))])
+        m.resize(5)
+        self.assertEqual(m.window_keys(), ["m199", "m198", "m197", "m196", "m195"])
+        m.move(7)
+        self.assertEqual((m.selected(), m.offset), ("m192", 3))
+        m.cycle_filter()
+        self.assertEqual(len(m.window_keys()), 5)
+        self.assertEqual(len(m.view), 20)
+        m.cycle_sort(); m.cycle_sort()     # -> G
+        self.assertEqual(m.window_keys()[0], "m190")
+        # 窗口外、不影响排序的变化不触发重绘
+        m.cycle_filter(); m.cycle_filter(); m.cycle_sort()     # all / natural
+        m.window_keys()
+        v = m.version
+        m.update({"m000": Row(("changed",), ERROR, g=0.0)})
+        self.assertEqual(m.version, v)
+        m.update({"m199": Row(("changed",))})
+        self.assertGreater(m.version, v)
+        
+        # tracker 的变化事件
+        tr = StatusTracker(str(TEST_ROOT / "tui_status.json"))
+        v0 = tr.version
+        with tr.batch():
+            for i in range(3000): tr.finish_task(f"mol{i:04d}", "opt", "DONE" if i % 7 else "ERROR", "" if i % 7 else "boom")
+            tr.finish_task("[Extra]job", "run", "DONE")
+        v1, changed = tr.changes_since(v0)
+        self.assertEqual(len(changed), 3001)
+        self.assertEqual(tr.changes_since(v1), (v1, set()))
+        v = tr.order_version
+        tr.set_order([f"mol{i:04d}" for i in range(3000)])
+        tr.set_order([f"mol{i:04d}" for i in range(3000)])
+        self.assertEqual(tr.order_version, v + 1)
+        
+        class NoJobs:
+            def stop_job(self, key): return False
+            def stop_mol_jobs(self, key): return 0
+            def stop_all_jobs(self, deliberate=True): pass
+        stop = threading.Event()
+        app = GibbsApp(stop.wait, tr, NoJobs(), stop)
+        built = []
+        orig = app.main_row
+        app.main_row = lambda mol, info: built.append(mol) or orig(mol, info)
+        
+        async def drive():
+            async with app.run_test(size=(100, 30)) as pilot:
+                await pilot.pause()
+                table = app.query_one("#main_table", VirtualTable)
+                self.assertEqual(len(table.model.rows), 3000)
+                self.assertEqual(len(app.sweep_model.rows), 1)
+                self.assertLess(table.model.height, 30)
+                built.clear()
+                tr.start_task("mol0005", "gas")
+                app.update_table()
+                self.assertEqual(built, ["mol0005"])
+                self.assertIn("RUNNING", table.model.rows["mol0005"].cells[2])
+                built.clear()
+                app.update_table()
+                self.assertEqual(built, [])
+                table.focus()
+                await pilot.press("f")
+                await pilot.pause()
+                self.assertEqual(len(table.model.view), len(range(0, 3000, 7)))
+                await pilot.press("down")
+                self.assertEqual(app._selected_row_key(), "mol0007")
+                stop.set()
+                await pilot.press("q")
+        asyncio.run(drive())
+
+    def test_29_versioned_tracker(self):
+        """测试 tracker 的版本号、写时复制快照、增量读取、变化通知与并发读写"""
+        print("\n🧪 Test 29: Versioned Thread-Safe Tracker")
+        import threading
+        from src.tracker import StatusTracker
+        
+        tr = StatusTracker(str(TEST_ROOT / "versioned_status.json"))
+        events = []
+        unsubscribe = tr.subscribe(lambda v, keys: events.append((v, sorted(keys))))
+        tr.start_task("a", "opt")
+        v1 = tr.version
+        self.assertEqual(events, [(v1, ["a"])])
+        
+        snap = tr.snapshot()
+        self.assertIs(tr.snapshot(), snap)
+        with tr.batch():
+            tr.finish_task("a", "opt", "DONE")
+            tr.finish_task("b", "opt", "ERROR", "boom")
+            tr.finish_task("b", "opt", "ERROR", "boom")     # 没有变化，不产生新版本
+        self.assertEqual(tr.version, v1 + 2)
+        self.assertEqual(events[-1], (v1 + 2, ["a", "b"]))
+        # 旧快照保持不变
+        self.assertEqual(snap.records["a"]["opt"]["status"], "RUNNING")
+        self.assertNotIn("b", snap.records)
+        with self.assertRaises(TypeError): snap.records["c"] = {}
+        self.assertEqual(tr.snapshot().records["a"]["opt"]["status"], "DONE")
+        self.assertEqual(tr.get("b", "opt")["error"], "boom")
+        
+        self.assertEqual(tr.changes_since(v1), (v1 + 2, {"a", "b"}))
+        self.assertEqual(tr.changes_since(v1 + 1), (v1 + 2, {"b"}))
+        tr.remove("a")
+        self.assertEqual(tr.changes_since(v1 + 2), (v1 + 3, {"a"}))
+        self.assertNotIn("a", tr.snapshot().records)
+        unsubscribe()
+        tr.set_result("b", -1.0)
+        self.assertEqual(len(events), 3)
+        
+        # 写线程不停修改，读线程遍历快照与增量，不应出现 "dictionary changed size during iteration"
+        errors, done = [], threading.Event()
+        def writer():
+            try:
+                for i in range(3000):
+                    tr.start_task(f"w{i % 500}", "opt")
+                    tr.finish_task(f"w{i % 500}", "opt", "DONE")
+                    if i % 7 == 0: tr.remove(f"w{(i * 3) % 500}")
+            except Exception as e: errors.append(e)
+            finally: done.set()
+        seen, total = 0, {}
+        t = threading.Thread(target=writer)
+        with tr.batch(): pass
+        tr.store.write = lambda changes, data: None      # 只测内存状态
+        t.start()
+        while not done.is_set():
+            try:
+                seen, keys = tr.changes_since(seen)
+                records = tr.snapshot().records
+                for k in keys: total[k] = records.get(k)
+                sum(len(r) for r in records.values())
+            except Exception as e: errors.append(e); break
+        t.join()
+        seen, keys = tr.changes_since(seen)
+        records = tr.snapshot().records
+        for k in keys: total[k] = records.get(k)
+        self.assertEqual(errors, [])
+        self.assertEqual({k: v for k, v in total.items() if v is not None and k.startswith("w")},
+                         {k: v for k, v in records.items() if k.startswith("w")})
+
 def import_subprocess():
     import subprocess
     return subprocess
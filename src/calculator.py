@@ -1,14 +1,43 @@
 # src/calculator.py
-from typing import Dict, Optional
-import pandas as pd
+from typing import Any, Dict, Optional
 from pathlib import Path
 from . import config
+from .parsers import ParsedOutput
+from .thermo import thermal_corrections
+from .results_store import ResultsStore
 
 class ThermodynamicsCalculator:
     """
     负责热力学公式计算及结果持久化
     """
     
+    @staticmethod
+    def collect_energies(opt_record: ParsedOutput, sub_records: Dict[str, ParsedOutput]) -> Dict[str, Optional[float]]:
+        """从 opt 与子任务的 ParsedOutput 记录中取出计算 G 所需的能量分量"""
+        energies: Dict[str, Optional[float]] = {
+            "thermal_corr": ThermodynamicsCalculator.thermal_corrections({"": opt_record})[""]}
+        for step, rec in sub_records.items():
+            energies[step] = rec.energy
+        return energies
+
+    @staticmethod
+    def thermal_corrections(opt_records: Dict[str, ParsedOutput]) -> Dict[str, Optional[float]]:
+        """
+        一批 opt 记录的吉布斯热校正 (Ha)。配置了 QRRHO 时由保存的频率整批重新计算，
+        记录里没有频率 / 热化学数据时回退到程序打印的值。
+        """
+        if not config.QRRHO: return {k: r.thermal_corr for k, r in opt_records.items()}
+        corr = thermal_corrections(opt_records, temperature=config.THERMO_TEMPERATURE,
+                                   pressure_atm=config.THERMO_PRESSURE_ATM,
+                                   method=config.QRRHO, cutoff=config.QRRHO_CUTOFF)
+        return {k: r.thermal_corr if corr[k] is None else corr[k] for k, r in opt_records.items()}
+
+    @staticmethod
+    def settings_tag() -> str:
+        """影响结果的热化学设置，拼进结果指纹：切换方法后已有结果自动重算"""
+        if not config.QRRHO: return ""
+        return f"|qrrho={config.QRRHO}:{config.QRRHO_CUTOFF}:{config.THERMO_TEMPERATURE}:{config.THERMO_PRESSURE_ATM}"
+
     @staticmethod
     def calculate_g(energies: Dict[str, Optional[float]], mol_name: str) -> Dict[str, float]:
         """计算 G 值"""
@@ -45,12 +74,9 @@ class ThermodynamicsCalculator:
         }
 
     @staticmethod
-    def update_csv(mol_name: str, energies: Dict[str, Optional[float]], results: Dict[str, float], filename: str = "results.csv"):
-        """将详细结果写入 CSV 文件"""
-        file_path = Path(filename)
-        
-        new_row = {
-            "Molecule": mol_name,
+    def build_row(energies: Dict[str, Optional[float]], results: Dict[str, float]) -> Dict[str, Any]:
+        """结果表中一个分子的一行（不含 Molecule 列）"""
+        return {
             "G_Final (kcal/mol)": results.get("G_Final (kcal)", 0.0),
             "E_SP (Ha)": energies.get("sp"),
             "E_Gas (Ha)": energies.get("gas"),
@@ -59,19 +85,13 @@ class ThermodynamicsCalculator:
             "dG_Solv (kcal/mol)": results.get("dG_solv (kcal)", 0.0),
             "G_Final (Ha)": results.get("G_Final (Ha)", 0.0)
         }
-        
-        new_df = pd.DataFrame([new_row])
-        
-        if file_path.exists():
-            try:
-                old_df = pd.read_csv(file_path)
-                old_df = old_df[old_df["Molecule"] != mol_name]
-                final_df = pd.concat([old_df, new_df], ignore_index=True)
-            except Exception:
-                final_df = new_df
-        else:
-            final_df = new_df
-            
-        cols = ["Molecule"] + [c for c in final_df.columns if c != "Molecule"]
-        final_df = final_df[cols]
-        final_df.to_csv(file_path, index=False, float_format="%.6f")
\ No newline at end of file
+
+    @staticmethod
+    def update_csv(mol_name: str, energies: Dict[str, Optional[float]], results: Dict[str, float], filename: str = "results.csv"):
+        """将详细结果写入 CSV 文件（兼容旧接口；批量场景请直接使用 ResultsStore）"""
+        store = ResultsStore(str(Path(filename).with_suffix(".db")), legacy_csv=filename)
+        try:
+            store.upsert(mol_name, ThermodynamicsCalculator.build_row(energies, results), "")
+            store.export_csv(filename)
+        finally:
+            store.close()
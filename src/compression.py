@@ -0,0 +1,108 @@
+import gzip
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from . import config
+from .parsers import is_compressed
+from .parsers.reader import zstandard
+from .summary import retarget_summary
+
+METHODS = {"gzip": ".gz", "zstd": ".zst"}
+DEFAULT_LEVEL = {"gzip": 6, "zstd": 10}
+
+
+def compress_file(src: Path, method: str = "gzip", level: Optional[int] = None) -> Path:
+    """把 src 流式压缩为 src.gz / src.zst (先写临时文件再改名，保留 mtime)；不删除 src"""
+    dst = src.with_name(src.name + METHODS[method])
+    tmp = dst.with_name(dst.name + ".tmp")
+    level = DEFAULT_LEVEL[method] if level is None else level
+    try:
+        with open(src, 'rb') as fin:
+            if method == "zstd":
+                with open(tmp, 'wb') as fout: zstandard.ZstdCompressor(level=level).copy_stream(fin, fout)
+            else:
+                with gzip.open(tmp, 'wb', compresslevel=level) as fout: shutil.copyfileobj(fin, fout, 1 << 20)
+        shutil.copystat(src, tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        try: tmp.unlink()
+        except OSError: pass
+        raise
+    return dst
+
+
+class OutputCompressor:
+    """
+    后台压缩已完成 (DONE) 的输出：压缩在工作线程中进行，原文件先保留；
+    drain() 在调用方线程中收尾：把解析缓存条目与摘要文件转到压缩文件 (之后照样命中、不必解压)，
+    再删除原文件。压缩期间原文件被删除或改写 (重新计算) 时丢弃压缩结果。
+    只压缩大于 min_bytes、且 delay 秒内没有被修改的文件 (刚结束的优化还要读坐标生成子任务)。
+    """
+    def __init__(self, method: Optional[str] = None, level: Optional[int] = None,
+                 min_bytes: Optional[int] = None, delay: Optional[float] = None,
+                 parse_cache=None, workers: int = 1):
+        method = method or config.COMPRESS_OUTPUTS or "gzip"
+        if method not in METHODS: raise ValueError(f"Unknown compression method: {method}")
+        if method == "zstd" and zstandard is None:
+            print("  ⚠️ Warning: zstandard is not installed, compressing outputs with gzip instead.")
+            method = "gzip"
+        self.method = method
+        self.level = config.COMPRESS_LEVEL if level is None else level
+        self.min_bytes = (config.COMPRESS_MIN_KB << 10) if min_bytes is None else min_bytes
+        self.delay = config.COMPRESS_DELAY if delay is None else delay
+        self.parse_cache = parse_cache
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="compress")
+        self.pending: Dict[str, Tuple[Future, Tuple[int, int]]] = {}  # 原文件 -> (future, 提交时的 (size, mtime_ns))
+        self._lock = threading.Lock()
+        # 累计量
+        self.files = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def submit(self, path: Path) -> bool:
+        """满足条件时排入后台压缩，返回是否排入"""
+        if is_compressed(path) or str(path) in self.pending: return False
+        try: st = path.stat()
+        except OSError: return False
+        if st.st_size < self.min_bytes or time.time() - st.st_mtime < self.delay: return False
+        with self._lock:
+            self.pending[str(path)] = (self.pool.submit(compress_file, path, self.method, self.level),
+                                       (st.st_size, st.st_mtime_ns))
+        return True
+
+    def drain(self) -> List[Tuple[Path, Path]]:
+        """收尾已完成的压缩，返回 [(原文件, 压缩文件)]"""
+        with self._lock:
+            done = [(k, v) for k, v in self.pending.items() if v[0].done()]
+            for k, _ in done: del self.pending[k]
+        finished = []
+        for key, (future, stamp) in done:
+            src = Path(key)
+            try: dst = future.result()
+            except Exception: continue
+            try: st = src.stat()
+            except OSError: st = None
+            if st is None or (st.st_size, st.st_mtime_ns) != stamp:
+                # 原文件已被删除 / 重新计算：压缩结果作废
+                try: dst.unlink()
+                except OSError: pass
+                continue
+            if self.parse_cache: self.parse_cache.rename(src, dst)
+            retarget_summary(src, dst)
+            src.unlink()
+            self.files += 1
+            self.bytes_in += stamp[0]
+            self.bytes_out += dst.stat().st_size
+            finished.append((src, dst))
+        return finished
+
+    def close(self):
+        """等待正在进行的压缩结束 (未开始的取消) 并收尾"""
+        with self._lock: futures = [f for f, _ in self.pending.values()]
+        for f in futures: f.cancel()
+        self.pool.shutdown(wait=True)
+        self.drain()
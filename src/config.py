@@ -25,6 +25,79 @@ COMMAND_MAP = {
     ".inp": "/usr/local/quantum/orca/orca {input} > {output}",
 }
 
+# 同时运行的任务槽位数 (1 = 传统阻塞式，一个算完再提交下一个)
+MAX_CONCURRENT = 1
+# 总核数预算 (None = 不限制，仅按槽位数控制)
+CORES_BUDGET = None
+
+# 任务执行后端："local" (本机子进程) 或 "slurm" (sbatch 提交，每个周期一次 squeue 批量查询状态)
+EXECUTOR = "local"
+# Slurm 命令 (可换成包装脚本或 mock_slurm.py)、额外的 #SBATCH 选项 (如 "--partition=cpu", "--time=48:00:00")
+SLURM_COMMANDS = {"sbatch": "sbatch", "squeue": "squeue", "sacct": "sacct", "scancel": "scancel"}
+SLURM_OPTIONS = []
+SLURM_POLL_INTERVAL = 30.0      # squeue 轮询间隔 (秒)
+SLURM_ACCOUNTING_RETRIES = 3    # 作业离开队列后 sacct 查不到记录时再等几个轮询周期，之后记为 UNKNOWN
+
+# 节点本地 scratch 暂存 (None = 关闭，直接在 data/<step> 中运行)：每个任务在 <SCRATCH_DIR>/gibbs_scratch/ 下的私有目录中运行，
+# 只把 SCRATCH_RETAIN 中的产物复制回共享目录。可以写环境变量 (在执行节点上展开)，如 "/dev/shm" 或 "$TMPDIR"
+SCRATCH_DIR = None
+SCRATCH_RETAIN = [".chk", ".fchk", ".gbw", ".hess"]
+SCRATCH_KEEP_FAILED = False     # 失败任务保留 scratch 目录排查
+SCRATCH_MAX_AGE_H = 24.0        # 启动时清理超过此时长的遗留目录
+SCRATCH_SAMPLE_INTERVAL = 10.0  # scratch 占用采样间隔 (秒)
+
+# 已完成 (DONE) 的输出在后台压缩 (None = 不压缩 / "gzip" / "zstd"，zstd 需要安装 zstandard，否则回退 gzip)
+# 解析器、状态扫描和 Sweeper 透明读取 .out.gz / .out.zst
+COMPRESS_OUTPUTS = None
+COMPRESS_LEVEL = None           # None = gzip 6 / zstd 10
+COMPRESS_MIN_KB = 64            # 小于此大小的输出不压缩
+COMPRESS_DELAY = 600.0          # 输出至少这么久 (秒) 没有修改才压缩，刚结束的优化还要读坐标生成子任务
+
+# 打包模式：同一分子的 gas/solv/sp 合并为一次运行 (Gaussian --Link1-- / ORCA $new_job)，
+# 小分子上省去重复的程序启动、积分准备和 scratch I/O；结束后合并输出按子任务切分回各步骤目录
+PACK_SUBJOBS = False
+
+# 优化任务 ERR_NC (未收敛) / Incomplete (被杀、超时) 时，从最后一个几何自动续算的次数上限
+# 默认 0 = 关闭 (失败的优化留给人工检查)，用 --max-restarts N 开启
+OPT_RESTART_MAX = 0
+
+# 内容寻址结果缓存：按 模板 + 电荷/多重度 + 规范化坐标 的哈希保存已完成的输出，相同输入不再重算
+RESULT_CACHE_DIR = ROOT_DIR / ".result_cache"
+RESULT_CACHE_MAX_MB = 2048      # 磁盘上限，超出按最近使用时间淘汰
+RESULT_CACHE_TOL = 1e-4         # 坐标取整精度 (Å)，差异小于此值视为同一结构
+
+# 结果库 (results.db) 的 CSV 导出：有新结果时最多每 RESULTS_EXPORT_INTERVAL 秒整表导出一次，退出时再补一次 (0 = 每轮都导出)
+RESULTS_CSV = "results.csv"
+RESULTS_EXPORT_INTERVAL = 300.0
+
+# 任务状态持久化后端："json" (task_status.json 整文件原子重写，兼容旧版)
+# "journal" (task_status.jsonl 追加日志 + 定期压缩) 或 "sqlite" (task_status.db, WAL 模式)
+TRACKER_BACKEND = "json"
+# 调度队列：main (主流程) 与 extra (extra_jobs) 按核数加权公平共享
+FAIR_SHARE = {"main": 3.0, "extra": 1.0}
+# 老化：排队每满 1 小时有效优先级 +PRIORITY_AGING，防止低优先级任务饿死
+PRIORITY_AGING = 1.0
+
+# 文件变化监视方式: "auto" (Linux 用 inotify，否则轮询) / "inotify" / "poll"
+WATCH_MODE = "auto"
+# 兜底全量扫描间隔 (秒)；NFS 等网络文件系统上 inotify 收不到其他节点的写入
+WATCH_RESCAN_INTERVAL = 60.0
+
+# 热校正：None = 直接采用程序打印的 "Thermal correction to Gibbs Free Energy" / "G-E(el)"；
+# "grimme" / "truhlar" (或 "rrho") = 用 opt 输出中保存的频率重新计算 quasi-RRHO 热校正，改方法不必重跑频率
+QRRHO = None
+QRRHO_CUTOFF = 100.0            # 低频截断 ν0 (cm^-1)
+THERMO_TEMPERATURE = 298.15     # K
+THERMO_PRESSURE_ATM = 1.0
+
+# 反应网络定义 (名称: 反应物 -> 产物 ; ts = 过渡态)，存在时工作流实时导出 reactions.csv / profiles.csv
+REACTIONS_FILE = ROOT_DIR / "reactions.txt"
+
+# --grid 的默认网格 (命令行 --temps / --pressures / --concs 可覆盖)
+GRID_TEMPERATURES = [298.15]
+GRID_PRESSURES_ATM = [1.0]
+GRID_CONCENTRATIONS_M = [1.0]
+
 # ================= 物理常数 =================
 HARTREE_TO_KCAL = 627.509474
 _DG_CONC_KCAL = 1.89 
@@ -0,0 +1,311 @@
+import getpass
+import json
+import os
+import shlex
+import signal
+import subprocess
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from . import config
+from .supervisor import ProcessSupervisor
+
+# Slurm 作业状态：仍在队列中的 / 非正常结束的 (其余视为 COMPLETED；查不到记账记录的为 UNKNOWN，见下)
+SLURM_ACTIVE = {"PENDING", "CONFIGURING", "RUNNING", "COMPLETING", "SUSPENDED", "REQUEUED",
+                "REQUEUE_HOLD", "REQUEUE_FED", "RESIZING", "SIGNALING", "STAGE_OUT", "STOPPED"}
+SLURM_FAILED = {"FAILED", "TIMEOUT", "CANCELLED", "OUT_OF_MEMORY", "NODE_FAIL", "PREEMPTED",
+                "BOOT_FAIL", "DEADLINE", "REVOKED", "UNKNOWN"}
+# 离开队列但多次查不到 sacct 记录 (记账关闭或滞后) 的作业：最终状态未知，只能以输出文件为准
+SLURM_UNKNOWN = "UNKNOWN"
+
+
+class Executor(ABC):
+    """
+    JobManager 的任务执行后端。start 提交命令并立即返回句柄，句柄接口与 ChildProcess 一致
+    (poll / wait / kill / add_done_callback)，另有 state (调度器中的状态，本地进程为 None)
+    和 failure (调度器判定的非正常结束状态，如 TIMEOUT)。
+    job 是任务元数据 (key / mol / step / job_file / outputs / cores)，批处理后端据此写作业脚本、接管旧作业。
+    """
+    name = ""
+
+    @abstractmethod
+    def start(self, cmd: str, work_dir: Path, on_exit: Optional[Callable] = None,
+              job: Optional[Dict[str, Any]] = None): pass
+
+    @abstractmethod
+    def cancel(self, handle) -> bool: pass
+
+    @abstractmethod
+    def every(self, fn: Callable[[], None]): pass
+
+    def recover(self) -> list:
+        """上次运行提交、仍需跟踪的作业句柄 (handle.meta 为提交时的 job)"""
+        return []
+
+    def close(self): pass
+
+
+class LocalExecutor(Executor):
+    """本机子进程：由 ProcessSupervisor 的事件循环启动与回收，每个任务一个进程组"""
+    name = "local"
+
+    def __init__(self, supervisor: Optional[ProcessSupervisor] = None):
+        self.supervisor = supervisor or ProcessSupervisor()
+
+    def start(self, cmd, work_dir, on_exit=None, job=None):
+        return self.supervisor.start(cmd, work_dir, on_exit=on_exit)
+
+    def cancel(self, handle) -> bool:
+        try:
+            # [核心修复] 使用 os.killpg 发送信号给进程组 ID (PGID)
+            # 这样 Shell 和 ORCA 都会收到信号并终止
+            os.killpg(os.getpgid(handle.pid), signal.SIGTERM)
+        except Exception:
+            # 如果 killpg 失败（比如进程已死），尝试用普通的 kill 兜底
+            try: handle.kill()
+            except Exception: pass
+        return True
+
+    def every(self, fn):
+        self.supervisor.every(fn)
+
+    def close(self):
+        self.supervisor.close()
+
+
+class SlurmJob:
+    """sbatch 提交的作业句柄；状态由 SlurmExecutor 的批量轮询更新，poll() 不做系统调用"""
+    def __init__(self, executor: "SlurmExecutor", job_id: str, meta: Dict[str, Any]):
+        self.executor = executor
+        self.job_id = job_id
+        self.meta = meta
+        self.state = "PENDING"
+        self.failure: Optional[str] = None
+        self.returncode: Optional[int] = None
+        self.unaccounted = 0        # 离开队列后连续查不到 sacct 记录的轮询次数
+        self._done = threading.Event()
+        self._callbacks: List[Callable[["SlurmJob"], None]] = []
+
+    @property
+    def pid(self) -> str:
+        return self.job_id
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        if not self._done.wait(timeout): raise subprocess.TimeoutExpired(self.job_id, timeout)
+        return self.returncode
+
+    def kill(self):
+        self.executor.cancel(self)
+
+    def add_done_callback(self, fn: Callable[["SlurmJob"], None]):
+        self._callbacks.append(fn)
+        if self._done.is_set(): fn(self)
+
+    def _finish(self, state: str, code: int):
+        self.state = state
+        self.failure = state if state in SLURM_FAILED else None
+        self.returncode = code if self.failure is None else (code or 1)
+        self._done.set()
+        for fn in self._callbacks:
+            try: fn(self)
+            except Exception: pass
+
+
+class SlurmExecutor(Executor):
+    """
+    通过 sbatch 提交，每个轮询周期只调用一次 squeue (当前用户的全部作业)，
+    从队列中消失的作业再用一次 sacct 取最终状态与退出码；sacct 没有记录时 (记账关闭或滞后)
+    再等 accounting_retries 个周期，仍然没有则以 UNKNOWN 结束，由输出文件判定 (输出不完整时记为失败)。
+    在途作业写入 state_file，main.py 重启后 recover() 重新接管。
+    """
+    name = "slurm"
+
+    def __init__(self, state_file: Optional[Path] = None, poll_interval: Optional[float] = None,
+                 commands: Optional[Dict[str, str]] = None, options: Optional[List[str]] = None,
+                 tick: float = 1.0, accounting_retries: Optional[int] = None):
+        self.state_file = Path(state_file or config.DATA_DIR / ".slurm_jobs.json")
+        self.poll_interval = config.SLURM_POLL_INTERVAL if poll_interval is None else poll_interval
+        self.commands = {**config.SLURM_COMMANDS, **(commands or {})}
+        self.options = list(config.SLURM_OPTIONS if options is None else options)
+        self.tick = tick
+        self.accounting_retries = config.SLURM_ACCOUNTING_RETRIES if accounting_retries is None else accounting_retries
+        self.jobs: Dict[str, SlurmJob] = {}
+        self.polls = 0              # squeue 调用次数
+        self.last_error = ""
+        self._tick_callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._poll_now = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    # ================= 命令行工具 =================
+    def _run(self, tool: str, *args: str, cwd: Optional[Path] = None) -> str:
+        cmd = shlex.split(self.commands[tool]) + list(args)
+        try:
+            return subprocess.run(cmd, cwd=str(cwd) if cwd else None, capture_output=True,
+                                  text=True, check=True, timeout=120).stdout
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"{tool} failed: {(e.stderr or '').strip() or e}") from None
+
+    def _script(self, cmd: str, work_dir: Path, meta: Dict[str, Any]) -> Path:
+        job_file = Path(meta.get("job_file") or work_dir / "job")
+        name = meta.get("key", job_file.stem).replace("::", "_").replace(" ", "_")
+        lines = ["#!/bin/bash",
+                 f"#SBATCH --job-name={name}",
+                 "#SBATCH --ntasks=1",
+                 f"#SBATCH --cpus-per-task={meta.get('cores', 1)}",
+                 f"#SBATCH --output={job_file.stem}.slurm.log",
+                 *(f"#SBATCH {o}" for o in self.options),
+                 f"cd {shlex.quote(str(work_dir))}",
+                 cmd]
+        script = work_dir / f"{job_file.stem}.sbatch"
+        script.write_text("\n".join(lines) + "\n", encoding='utf-8')
+        return script
+
+    # ================= 提交 / 取消 =================
+    def start(self, cmd, work_dir, on_exit=None, job=None):
+        meta = {k: (str(v) if isinstance(v, Path) else v) for k, v in (job or {}).items()}
+        if "outputs" in meta: meta["outputs"] = {k: str(v) for k, v in meta["outputs"].items()}
+        script = self._script(cmd, work_dir, meta)
+        out = self._run("sbatch", "--parsable", script.name, cwd=work_dir).strip()
+        job_id = out.split(";")[0].strip()  # --parsable: <id>[;<cluster>]
+        if not job_id: raise RuntimeError(f"sbatch returned no job id: {out!r}")
+        meta["submitted"] = time.time()
+        handle = SlurmJob(self, job_id, meta)
+        if on_exit: handle.add_done_callback(on_exit)
+        with self._lock:
+            self.jobs[job_id] = handle
+            self._save()
+        self._ensure_thread()
+        return handle
+
+    def cancel(self, handle) -> bool:
+        try: self._run("scancel", handle.job_id)
+        except Exception: return False
+        self._poll_now.set()
+        return True
+
+    def recover(self) -> List[SlurmJob]:
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f: saved = json.load(f)
+        except (OSError, ValueError):
+            return []
+        handles = []
+        with self._lock:
+            for job_id, meta in saved.items():
+                if job_id in self.jobs: continue
+                handle = SlurmJob(self, job_id, meta)
+                handle.state = "UNKNOWN"
+                self.jobs[job_id] = handle
+                handles.append(handle)
+        if handles:
+            self._poll_now.set()
+            self._ensure_thread()
+        return handles
+
+    # ================= 批量轮询 =================
+    def query(self) -> Dict[str, str]:
+        """一次 squeue：当前用户所有作业的 {作业号: 状态}"""
+        out = self._run("squeue", "-h", "-u", getpass.getuser(), "-o", "%i %T")
+        states = {}
+        for line in out.splitlines():
+            parts = line.split()
+            if len(parts) >= 2: states[parts[0]] = parts[1].upper()
+        return states
+
+    def accounting(self, job_ids: List[str]) -> Dict[str, tuple]:
+        """一次 sacct：已离开队列的作业的 {作业号: (最终状态, 退出码)}"""
+        try: out = self._run("sacct", "-n", "-P", "-X", "-o", "JobID,State,ExitCode", "-j", ",".join(job_ids))
+        except Exception: return {}
+        final = {}
+        for line in out.splitlines():
+            parts = line.strip().split("|")
+            if len(parts) < 3: continue
+            state = parts[1].split()[0].upper() if parts[1].strip() else "COMPLETED"
+            try: code = int(parts[2].split(":")[0])
+            except ValueError: code = 0
+            final[parts[0]] = (state, code)
+        return final
+
+    def refresh(self):
+        """轮询一次：更新在途作业状态，结束的作业触发回调"""
+        with self._lock: ids = list(self.jobs)
+        if not ids: return
+        states = self.query()
+        self.polls += 1
+        gone = [i for i in ids if states.get(i) not in SLURM_ACTIVE]
+        final = self.accounting(gone) if gone else {}
+        finished = []
+        with self._lock:
+            for job_id in ids:
+                handle = self.jobs.get(job_id)
+                if handle is None: continue
+                if job_id not in gone:
+                    handle.state = states[job_id]
+                    continue
+                if job_id in final:
+                    state, code = final[job_id]
+                elif job_id in states:
+                    state, code = states[job_id], 0     # squeue 仍列出的终态 (如 COMPLETED / FAILED)
+                else:
+                    handle.unaccounted += 1
+                    if handle.unaccounted <= self.accounting_retries: continue
+                    state, code = SLURM_UNKNOWN, 0
+                if state in SLURM_ACTIVE: continue  # sacct 比 squeue 新：作业其实还在
+                del self.jobs[job_id]
+                finished.append((handle, state, code))
+            if finished: self._save()
+        for handle, state, code in finished: handle._finish(state, code)
+
+    def _save(self):
+        tmp = self.state_file.with_name(self.state_file.name + ".tmp")
+        self.state_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({i: h.meta for i, h in self.jobs.items()}, f, indent=1)
+        os.replace(tmp, self.state_file)
+
+    # ================= 后台线程 =================
+    def _ensure_thread(self):
+        with self._lock:
+            if self.thread is not None: return
+            self.thread = threading.Thread(target=self._loop, name="slurm-poller", daemon=True)
+            self.thread.start()
+
+    def _loop(self):
+        last = float("-inf")
+        while not self._stop.is_set():
+            if self.jobs and (self._poll_now.is_set() or time.monotonic() - last >= self.poll_interval):
+                self._poll_now.clear()
+                try:
+                    self.refresh()
+                    self.last_error = ""
+                except Exception as e:
+                    # 控制节点暂时不可用：保留作业，下个周期重试
+                    self.last_error = str(e)
+                last = time.monotonic()
+            for fn in list(self._tick_callbacks):
+                try: fn()
+                except Exception: pass
+            self._stop.wait(min(self.tick, self.poll_interval))
+
+    def every(self, fn):
+        self._tick_callbacks.append(fn)
+
+    def close(self):
+        """停止轮询线程；作业留在队列中，下次启动时 recover() 接管"""
+        self._stop.set()
+        if self.thread: self.thread.join(timeout=2)
+
+
+EXECUTORS = {"local": LocalExecutor, "slurm": SlurmExecutor}
+
+
+def create_executor(name: str, **kwargs) -> Executor:
+    if name not in EXECUTORS:
+        raise ValueError(f"Unknown executor: {name} (choose from {', '.join(EXECUTORS)})")
+    return EXECUTORS[name](**kwargs)
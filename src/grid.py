@@ -0,0 +1,124 @@
+import csv
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from . import config
+from .parsers import ParsedOutput, find_output
+from .results_store import ResultsStore
+from .summary import load_record
+from .thermo import HARTREE_J_MOL, R, ThermoBatch, thermo_grid
+
+# 理想气体摩尔体积换算：c (mol/L) = P / (R T)，R 以 L atm / (K mol) 计
+R_L_ATM = 0.082057366080960
+
+
+def parse_axis(values: Iterable[str]) -> np.ndarray:
+    """命令行网格轴："298.15 310" 逐个取值，"200:400:21" 为 linspace(200, 400, 21)，可以混用"""
+    points: List[float] = []
+    for v in values:
+        if ":" in v:
+            start, stop, num = v.split(":")
+            points.extend(np.linspace(float(start), float(stop), int(num)).tolist())
+        else:
+            points.append(float(v))
+    return np.array(points, dtype=float)
+
+
+def conc_correction(temperatures: np.ndarray, pressures_atm: np.ndarray, concentrations_m: np.ndarray) -> np.ndarray:
+    """标准态换算 (P 的理想气体 -> c mol/L) ΔG = RT ln(c R T / P)，(T, P, C)，Hartree；298.15 K、1 atm -> 1 M 为 1.89 kcal/mol"""
+    t = temperatures[:, None, None]
+    ratio = concentrations_m[None, None, :] * R_L_ATM * t / pressures_atm[None, :, None]
+    return R * t * np.log(ratio) / HARTREE_J_MOL
+
+
+@dataclass
+class GridResult:
+    molecules: List[str]
+    temperatures: np.ndarray
+    pressures_atm: np.ndarray
+    concentrations_m: np.ndarray
+    g: np.ndarray           # (N, T, P, C) 最终自由能 (Ha)，缺少频率数据的分子整行为 NaN
+    g_corr: np.ndarray      # (N, T, P) 气相热校正 (Ha)
+    method: str
+
+
+def evaluate_grid(opt_records: Dict[str, ParsedOutput], energies: Dict[str, Dict[str, float]],
+                  temperatures: Sequence[float], pressures_atm: Sequence[float] = (1.0,),
+                  concentrations_m: Sequence[float] = (1.0,), method: str = "rrho",
+                  cutoff: float = 100.0) -> GridResult:
+    """
+    所有分子在 T × P × c 网格上的 G = E_sp + (E_solv - E_gas) + G_corr(T, P) + ΔG_conc(T, P, c)，一次广播求出。
+    热校正由保存的频率重算，不需要重跑任务；energies 为 {分子: {"sp", "gas", "solv"}}。
+    SPECIAL_CONC_CORR_HARTREE 中的分子 (如水) 在整个网格上保持原来的固定浓度校正。
+    压力只影响气相热校正 g_corr；换算到浓度 c 后与 ΔG_conc 中的 P 正好抵消，溶液相 G 与 P 无关。
+    """
+    t, p, c = (np.asarray(a, dtype=float).ravel() for a in (temperatures, pressures_atm, concentrations_m))
+    mols = [m for m in energies if m in opt_records]
+    batch = ThermoBatch.from_records({m: opt_records[m] for m in mols})
+    g_corr = np.full((len(mols), t.size, p.size), np.nan)
+    if len(batch):
+        index = {m: i for i, m in enumerate(mols)}
+        rows = [index[m] for m in batch.names]
+        g_corr[rows] = thermo_grid(batch, t, p, method=method, cutoff=cutoff)["g_corr"]
+
+    e = np.array([[energies[m][k] for k in ("sp", "gas", "solv")] for m in mols], dtype=float).reshape(-1, 3)
+    base = e[:, 0] + e[:, 2] - e[:, 1]
+    conc = np.broadcast_to(conc_correction(t, p, c), (len(mols), t.size, p.size, c.size)).copy()
+    for i, m in enumerate(mols):
+        special = config.SPECIAL_CONC_CORR_HARTREE.get(m.lower())
+        if special is not None: conc[i] = special
+    g = base[:, None, None, None] + g_corr[:, :, :, None] + conc
+    return GridResult(mols, t, p, c, g, g_corr, method)
+
+
+def write_grid(result: GridResult, out: Path) -> Tuple[Path, Path]:
+    """
+    写出 <out>.npz (全部数组，np.load 直接读取) 与 <out>.csv 透视表：
+    每行一个 (分子, P, c)，每列一个温度的 G (kcal/mol)。两个文件都原子替换。
+    """
+    npz, table = out.with_suffix(".npz"), out.with_suffix(".csv")
+    tmp = npz.with_name(npz.stem + ".tmp.npz")
+    # 不压缩：随机浮点数据压缩率很低，压缩反而占写盘时间的大头
+    np.savez(tmp, molecules=np.array(result.molecules), temperatures=result.temperatures,
+             pressures_atm=result.pressures_atm, concentrations_m=result.concentrations_m,
+             g_hartree=result.g, g_corr_hartree=result.g_corr, method=np.array(result.method))
+    os.replace(tmp, npz)
+
+    # (N, T, P, C) -> 每行 (分子, P, c) 的 T 个值；整行用一个格式串格式化，不逐个单元格调用 csv
+    nt = result.temperatures.size
+    kcal = np.moveaxis(result.g * config.HARTREE_TO_KCAL, 1, -1).reshape(-1, nt)
+    fmt, empty = ",".join(["%.6f"] * nt) + "\n", "," * (nt - 1) + "\n"
+    keys = [(mol, f"{p:g}", f"{c:g}") for mol in result.molecules
+            for p in result.pressures_atm for c in result.concentrations_m]
+    tmp = table.with_name(table.name + ".tmp")
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerow(["Molecule", "P (atm)", "c (M)", *(f"G {t:g}K (kcal/mol)" for t in result.temperatures)])
+        for (mol, p, c), row in zip(keys, kcal):
+            f.write(f"{_csv_field(mol)},{p},{c},")
+            f.write(empty if np.isnan(row[0]) else fmt % tuple(row.tolist()))
+    os.replace(tmp, table)
+    return npz, table
+
+
+def _csv_field(value: str) -> str:
+    """与 csv 模块相同的最小引号规则 (分子名一般不需要)"""
+    if not any(ch in value for ch in ',"\n'): return value
+    return '"' + value.replace('"', '""') + '"'
+
+
+def grid_from_results(store: ResultsStore, temperatures: Sequence[float], pressures_atm: Sequence[float],
+                      concentrations_m: Sequence[float], method: Optional[str] = None) -> GridResult:
+    """对结果库中已算出 G 的全部分子求网格：能量取自结果行，频率取自 opt 输出的摘要 (没有时解析一次)"""
+    energies, records = {}, {}
+    for row in store.rows():
+        mol = row["Molecule"]
+        e = {"sp": row.get("E_SP (Ha)"), "gas": row.get("E_Gas (Ha)"), "solv": row.get("E_Solv (Ha)")}
+        out = find_output(config.DIRS["opt"] / f"{mol}_opt")
+        if None in e.values() or out is None: continue
+        try: records[mol] = load_record(out)
+        except Exception: continue
+        energies[mol] = e
+    return evaluate_grid(records, energies, temperatures, pressures_atm, concentrations_m,
+                         method=method or config.QRRHO or "rrho", cutoff=config.QRRHO_CUTOFF)
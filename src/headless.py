@@ -0,0 +1,135 @@
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, TextIO, Tuple
+
+
+def log_line(event: str, stream: TextIO = None, **fields) -> str:
+    """结构化日志：一行 ts=... event=... key=value，值里有空格时加引号，便于 grep / awk"""
+    parts = [f"ts={time.strftime('%Y-%m-%dT%H:%M:%S')}", f"event={event}"]
+    for k, v in fields.items():
+        v = f"{v:.2f}" if isinstance(v, float) else str(v)
+        parts.append(f'{k}="{v}"' if (" " in v or not v) else f"{k}={v}")
+    line = " ".join(parts)
+    print(line, file=stream or sys.stdout, flush=True)
+    return line
+
+
+@dataclass
+class RunStats:
+    """本次运行的吞吐统计（由 JobManager 的 start / finish 事件累积）"""
+    started_at: float = field(default_factory=time.time)
+    submitted: int = 0
+    finished: int = 0
+    core_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    by_status: Counter = field(default_factory=Counter)
+    staged: Counter = field(default_factory=Counter)    # scratch 暂存：in / out 字节累计，scratch 为峰值
+    outcomes: Dict[Tuple[str, str], str] = field(default_factory=dict)  # (mol, step) -> 最后一次结果，重启成功即覆盖失败
+
+    def on_start(self, slot):
+        self.submitted += 1
+        self.wait_seconds += max(0.0, slot.start_time - slot.queued_at)
+
+    def on_finish(self, slot):
+        self.finished += 1
+        self.core_seconds += slot.cores * max(0.0, slot.end_time - slot.start_time)
+        self.by_status[slot.status] += 1
+        for st in slot.steps: self.outcomes[(slot.mol_name, st)] = slot.status
+        for k in ("in", "out"): self.staged[k] += slot.staged.get(k, 0)
+        self.staged["scratch"] = max(self.staged["scratch"], slot.staged.get("scratch", 0))
+
+    @property
+    def failures(self) -> Dict[str, int]:
+        final = Counter(self.outcomes.values())
+        return {st: n for st, n in sorted(final.items()) if st != "DONE"}
+
+    def summary(self, now: float = None) -> Dict[str, object]:
+        wall = max(1e-9, (now or time.time()) - self.started_at)
+        return {
+            "jobs": self.finished,
+            "done": self.by_status.get("DONE", 0),
+            "wall_hours": wall / 3600,
+            "jobs_per_hour": self.finished / (wall / 3600),
+            "core_hours": self.core_seconds / 3600,
+            "mean_queue_wait_s": self.wait_seconds / self.submitted if self.submitted else 0.0,
+            "failures": self.failures,
+            "staged_in_mb": self.staged["in"] / 2**20,
+            "staged_out_mb": self.staged["out"] / 2**20,
+            "scratch_peak_mb": self.staged["scratch"] / 2**20,
+        }
+
+
+class HeadlessRunner:
+    """
+    无界面运行：与 GibbsApp 接口相同 (workflow_func, tracker, job_manager, stop_event)，
+    但不启动 Textual，适合 nohup / systemd / 批处理作业。
+    工作流在后台线程运行，主线程负责信号处理和周期性进度日志；
+    队列清空后工作流退出，打印吞吐汇总，有失败任务时返回非零退出码。
+    """
+    def __init__(self, workflow_func, tracker, job_manager, stop_event,
+                 progress_interval: float = 60.0, stream: TextIO = None):
+        self.workflow_func = workflow_func
+        self.tracker = tracker
+        self.job_manager = job_manager
+        self.stop_event = stop_event
+        self.progress_interval = progress_interval
+        self.stream = stream or sys.stdout
+        self.stats = RunStats()
+        self.interrupted = False
+        job_manager.observers.append(self._on_job_event)
+
+    def _on_job_event(self, event: str, slot):
+        if event == "start":
+            self.stats.on_start(slot)
+            self.log("start", job=slot.key, cores=slot.cores,
+                     wait_s=max(0.0, slot.start_time - slot.queued_at))
+        else:
+            self.stats.on_finish(slot)
+            staged = {f"{k}_kb": v >> 10 for k, v in slot.staged.items()}
+            self.log("finish", job=slot.key, status=slot.status,
+                     elapsed_s=slot.end_time - slot.start_time, error=slot.error or "-", **staged)
+
+    def log(self, event: str, **fields):
+        log_line(event, self.stream, **fields)
+
+    def _on_signal(self, signum, _frame):
+        # 与 TUI 退出一致：停止主循环并终止所有运行中的任务
+        self.interrupted = True
+        self.log("signal", signal=signal.Signals(signum).name)
+        self.stop_event.set()
+        self.job_manager.stop_all_jobs(deliberate=False)
+
+    def run(self) -> int:
+        previous = {}
+        if threading.current_thread() is threading.main_thread():
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                previous[sig] = signal.signal(sig, self._on_signal)
+
+        self.log("begin", max_concurrent=self.job_manager.max_concurrent,
+                 cores_budget=self.job_manager.cores_budget or "-")
+        worker = threading.Thread(target=self.workflow_func, name="workflow", daemon=True)
+        worker.start()
+        try:
+            while worker.is_alive():
+                worker.join(timeout=self.progress_interval)
+                if worker.is_alive():
+                    stager = self.job_manager.stager
+                    self.log("progress", running=len(self.job_manager.slots), finished=self.stats.finished,
+                             failed=sum(self.stats.failures.values()), cores=self.job_manager.used_cores(),
+                             **({"scratch_mb": stager.usage() / 2**20} if stager else {}))
+        finally:
+            for sig, handler in previous.items(): signal.signal(sig, handler)
+
+        s = self.stats.summary()
+        self.log("summary", jobs=s["jobs"], done=s["done"], wall_h=f"{s['wall_hours']:.3f}",
+                 jobs_per_h=f"{s['jobs_per_hour']:.1f}", core_h=f"{s['core_hours']:.3f}",
+                 mean_wait_s=s["mean_queue_wait_s"],
+                 failures=",".join(f"{k}:{v}" for k, v in s["failures"].items()) or "-",
+                 **({"staged_in_mb": s["staged_in_mb"], "staged_out_mb": s["staged_out_mb"],
+                     "scratch_peak_mb": s["scratch_peak_mb"]} if self.job_manager.stager else {}))
+        if self.interrupted: return 130
+        return 1 if s["failures"] else 0
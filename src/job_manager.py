@@ -1,98 +1,354 @@
-import subprocess
+import re
+import threading
 import time
 import sys
-import os          # [新增] 需要 os 模块
-import signal      # [新增] 需要 signal 模块
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Dict, Callable
 from . import config
-from .parsers import get_parser
+from .parsers import parse_output, split_output, resolve_output, ParsedOutput
+from .parse_cache import ParseCache
+from .summary import read_summary, write_summary, is_terminal
+from .supervisor import ProcessSupervisor
+from .executors import Executor, LocalExecutor, SLURM_UNKNOWN
+from .staging import ScratchStager
+from .compression import OutputCompressor
+from .tracker import StatusTracker
+
+# 用户手动停止 (界面 s / x) 的任务留下 <mol>_<step>.stopped 标记：没有正常结束的不再自动重提或续算，
+# 删除标记即可重新运行；下一次提交同一任务时自动清除
+STOPPED_SUFFIX = ".stopped"
+
+
+def stop_marker(path: Path) -> Path:
+    """输入 / 输出 (含压缩版本) 对应的停止标记：同目录、同名去掉所有后缀"""
+    return path.with_name(path.name.split(".")[0] + STOPPED_SUFFIX)
+
+
+@dataclass
+class JobSlot:
+    """一个正在运行的任务槽位（本地为独立进程组，批处理后端为一个作业）"""
+    key: str
+    mol_name: str
+    step: str
+    job_file: Path
+    output_file: Path
+    proc: object            # 执行后端返回的句柄 (ChildProcess / SlurmJob)
+    cores: int
+    start_time: float
+    on_done: Optional[Callable[[bool], None]] = None
+    queued_at: float = 0.0      # 任务就绪时刻 (输入文件写好的时间，不早于本次运行开始)
+    end_time: float = 0.0
+    status: str = ""
+    error: str = ""
+    # 打包运行：一个进程依次算多个步骤，step -> 切分后的单步输出文件
+    outputs: Dict[str, Path] = field(default_factory=dict)
+    # scratch 暂存统计 (字节)：in 复制进去 / out 复制回来 / scratch 峰值占用；不暂存时为空
+    staged: Dict[str, int] = field(default_factory=dict)
+    stopped: bool = False       # 被用户手动停止
+
+    @property
+    def steps(self) -> List[str]:
+        return list(self.outputs) or [self.step]
+
+    @property
+    def markers(self) -> List[Path]:
+        """各步骤的停止标记 (打包运行按切分后的单步输出)"""
+        return [stop_marker(p) for p in (self.outputs.values() if self.outputs else [self.job_file])]
+
 
 class JobManager:
-    def __init__(self, tracker=None):
+    def __init__(self, tracker=None, max_concurrent: int = 1, cores_budget: Optional[int] = None,
+                 parse_cache: Optional[ParseCache] = None, supervisor: Optional[ProcessSupervisor] = None,
+                 executor: Optional[Executor] = None, stager: Optional[ScratchStager] = None,
+                 compressor: Optional[OutputCompressor] = None):
         self.tracker = tracker
+        self.parse_cache = parse_cache
         self.last_int = 0.0
-        self.current_proc = None 
+        self.max_concurrent = max(1, max_concurrent)
+        self.cores_budget = cores_budget
+        self.slots: Dict[str, JobSlot] = {}
+        # 执行后端：默认本机子进程 (由 asyncio 监管)；耗时显示走后端的定时器，与回收解耦
+        self.executor = executor or LocalExecutor(supervisor)
+        self.executor.every(self._refresh_elapsed)
+        self.stager = stager    # 节点本地 scratch 暂存 (None = 直接在输入文件所在目录运行)
+        self.compressor = compressor    # DONE 输出的后台压缩 (None = 不压缩)
+        self.on_exit: Optional[Callable[[], None]] = None  # 任意任务退出时调用 (供主循环立即唤醒)
+        # 观察者 fn(event, slot)，event 为 "start" / "finish"，在提交与结算的线程中调用
+        self.observers: List[Callable[[str, JobSlot], None]] = []
+        self.created_at = time.time()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def slot_key(mol_name: str, step: str) -> str:
+        return f"{mol_name}::{step}"
 
     def get_status_from_file(self, filepath: Path, is_opt: bool = False) -> tuple[str, str]:
-        if not filepath.exists(): return "MISSING", ""
+        filepath = resolve_output(filepath)
+        if not filepath.exists(): result = ("MISSING", "")
+        else:
+            try: result = self.get_record(filepath).status(is_opt)
+            except Exception as e: result = ("ERROR", str(e))
+        if result[0] != "DONE" and stop_marker(filepath).exists(): return "ERROR", "Stopped"
+        return result
+
+    def get_record(self, filepath: Path, with_coords: bool = False) -> ParsedOutput:
+        """
+        单次扫描解析输出文件为 ParsedOutput；文件未变化时直接取解析缓存。
+        缓存中不存坐标，需要坐标时读输出旁的摘要文件 (<name>.summary.json，含坐标与频率)，
+        摘要缺失或过期才重新解析；已结束任务解析后写出摘要。输出已被压缩时透明读取 .gz / .zst。
+        """
+        filepath = resolve_output(filepath)
+        if self.parse_cache and not with_coords:
+            cached = self.parse_cache.get(filepath)  # 缓存的解析失败会直接抛出
+            if cached is not None: return cached
+        record = read_summary(filepath)
+        if record is None:
+            try:
+                record = parse_output(filepath)
+            except Exception as e:
+                if self.parse_cache: self.parse_cache.put_error(filepath, str(e))
+                raise
+            if is_terminal(record):
+                try: write_summary(filepath, record)
+                except OSError: pass
+        if self.parse_cache: self.parse_cache.put(filepath, record)
+        return record
+
+    # ================= 资源核算 =================
+    @staticmethod
+    def job_cores(job_file: Path) -> int:
+        """从输入文件读取并行核数 (%nprocshared / %pal nprocs)，读不到按 1 核计"""
         try:
-            parser = get_parser(filepath)
-            if parser.is_failed(): return "ERROR", "Prog Error"
-            if not parser.is_finished(): return "ERROR", "Incomplete" 
-            if is_opt:
-                if not parser.is_converged(): return "ERR_NC", "Not Converged"
-                if parser.has_imaginary_freq(): return "ERR_IMG", "Imag Freq"
-                if parser.get_thermal_correction() is None:
-                    return "ERR_DATA", "No G Corr"
-            return "DONE", ""
-        except Exception as e: return "ERROR", str(e)
+            with open(job_file, 'r', encoding='utf-8', errors='ignore') as f:
+                text = f.read(4096)
+        except OSError:
+            return 1
+        m = re.search(r"%nproc(?:shared)?\s*=\s*(\d+)", text, re.IGNORECASE)
+        if not m: m = re.search(r"%pal\s+nprocs\s+(\d+)", text, re.IGNORECASE)
+        if not m: m = re.search(r"!.*\bPAL(\d+)\b", text, re.IGNORECASE)
+        return int(m.group(1)) if m else 1
 
-    def submit_and_wait(self, job_file: Path, mol_name: str, step: str, xyz_list: Optional[List[str]] = None) -> bool:
+    def used_cores(self) -> int:
+        return sum(s.cores for s in self.slots.values())
+
+    def has_capacity(self, cores: int = 1) -> bool:
+        if len(self.slots) >= self.max_concurrent: return False
+        if self.cores_budget is None or not self.slots: return True
+        return self.used_cores() + cores <= self.cores_budget
+
+    def compress_output(self, filepath: Path, status: str):
+        """状态为 DONE 的输出交给后台压缩 (未启用压缩时什么也不做)"""
+        if self.compressor and status == "DONE": self.compressor.submit(filepath)
+
+    def slot_for(self, mol_name: str, step: str) -> Optional[JobSlot]:
+        """运行该步骤的槽位 (包括覆盖该步骤的打包槽位)"""
+        slot = self.slots.get(self.slot_key(mol_name, step))
+        if slot is None:
+            slot = next((s for s in list(self.slots.values()) if s.mol_name == mol_name and step in s.outputs), None)
+        return slot
+
+    def is_running(self, mol_name: str, step: Optional[str] = None) -> bool:
+        if step is not None: return self.slot_for(mol_name, step) is not None
+        return any(s.mol_name == mol_name for s in self.slots.values())
+
+    # ================= 提交 / 回收 =================
+    def submit(self, job_file: Path, mol_name: str, step: str,
+               on_done: Optional[Callable[[bool], None]] = None,
+               outputs: Optional[Dict[str, Path]] = None) -> bool:
+        """
+        非阻塞提交：在新槽位中启动任务，成功启动返回 True。
+        outputs 非空表示打包运行：step 只是槽位名，Tracker 中记录的是 outputs 里的各步骤，
+        结束后合并输出按顺序切分到这些文件再分别结算。
+        """
+        steps = list(outputs) if outputs else [step]
         ext = job_file.suffix
         cmd_template = config.COMMAND_MAP.get(ext)
         if not cmd_template:
             if self.tracker: self.tracker.finish_task(mol_name, step, "ERROR", f"No cmd {ext}")
             return False
 
+        key = self.slot_key(mol_name, step)
+        if key in self.slots: return False
+
         output_file = job_file.with_suffix(".out")
         work_dir = job_file.parent.resolve()
-        input_name = job_file.name
-        output_name = output_file.name
-        
-        cmd = cmd_template.format(input=input_name, output=output_name)
-        
-        if self.tracker: 
-            self.tracker.start_task(mol_name, step)
-            self.tracker.set_running_msg(f"Running: {mol_name} [{step.upper()}] ... 0s")
+        staged = {}
+        if self.stager:
+            try: cmd, staged["in"] = self.stager.wrap(cmd_template, job_file, output_file)
+            except OSError as e:
+                if self.tracker: self.tracker.finish_task(mol_name, step, "ERROR", f"Staging failed: {e}")
+                return False
+        else:
+            cmd = cmd_template.format(input=job_file.name, output=output_file.name)
+
+        if self.tracker:
+            for st in steps: self.tracker.start_task(mol_name, st)
+            self.tracker.set_job_msg(key, f"{mol_name} [{step.upper()}] ... 0s")
 
+        cores = self.job_cores(job_file)
+        job = {"key": key, "mol": mol_name, "step": step, "job_file": job_file.resolve(),
+               "outputs": {st: p.resolve() for st, p in (outputs or {}).items()}, "cores": cores}
         try:
-            # [核心修复] preexec_fn=os.setsid 会将新进程放入一个新的进程组
-            # 这样我们在后面就可以通过 killpg 杀死整个组
-            self.current_proc = subprocess.Popen(
-                cmd, 
-                shell=True, 
-                stdout=subprocess.DEVNULL, 
-                stderr=subprocess.DEVNULL,
-                cwd=work_dir,
-                preexec_fn=os.setsid  # <--- 关键点：创建新进程组 (仅限 Linux/Mac)
-            )
-            
-            start_time = time.time()
-            
-            while self.current_proc.poll() is None:
-                elap = time.time() - start_time
-                from .tracker import StatusTracker
-                time_str = StatusTracker.format_duration(elap)
-                
-                msg = f"Running: {mol_name} [{step.upper()}] ... {time_str}"
-                
-                if self.tracker:
-                    self.tracker.set_running_msg(msg)
-                
-                time.sleep(0.5)
+            # [核心修复] 本地子进程以 setsid 放入新的进程组 (start_new_session)
+            # 每个槽位一个进程组，这样可以单独 killpg 某一个任务
+            proc = self.executor.start(cmd, work_dir, on_exit=self._on_child_exit, job=job)
+        except Exception as e:
+            if self.tracker:
+                self.tracker.clear_job_msg(key)
+                for st in steps: self.tracker.finish_task(mol_name, st, "ERROR", str(e))
+            return False
+
+        now = time.time()
+        try: queued_at = min(now, max(self.created_at, job_file.stat().st_mtime))
+        except OSError: queued_at = now
+        slot = JobSlot(key, mol_name, step, job_file, output_file, proc,
+                       cores, now, on_done, queued_at=queued_at, outputs=dict(outputs or {}), staged=staged)
+        for marker in slot.markers: marker.unlink(missing_ok=True)
+        self.slots[key] = slot
+        self._notify("start", slot)
+        return True
+
+    def _notify(self, event: str, slot: JobSlot):
+        for fn in self.observers:
+            try: fn(event, slot)
+            except Exception: pass
+
+    def reattach(self) -> int:
+        """接管上次运行提交、仍由执行后端跟踪的作业 (批处理后端；本地子进程不会留下)，返回接管数"""
+        n = 0
+        for proc in self.executor.recover():
+            m = proc.meta
+            job_file = Path(m["job_file"])
+            key = m.get("key") or self.slot_key(m["mol"], m["step"])
+            if key in self.slots: continue
+            submitted = m.get("submitted", time.time())
+            slot = JobSlot(key, m["mol"], m["step"], job_file, job_file.with_suffix(".out"), proc,
+                           m.get("cores", 1), submitted, queued_at=submitted,
+                           outputs={st: Path(p) for st, p in (m.get("outputs") or {}).items()})
+            proc.add_done_callback(self._on_child_exit)
+            self.slots[key] = slot
+            if self.tracker:
+                for st in slot.steps:
+                    # 上次运行已记为 RUNNING 的保留原开始时间
+                    if self.tracker.get(slot.mol_name, st).get("status") != "RUNNING":
+                        self.tracker.start_task(slot.mol_name, st)
+            self._notify("start", slot)
+            n += 1
+        return n
+
+    def _on_child_exit(self, _proc):
+        """后端线程中调用：只负责唤醒，结算仍在调用 poll() 的线程中进行"""
+        if self.on_exit:
+            try: self.on_exit()
+            except Exception: pass
+
+    def _refresh_elapsed(self):
+        """定时器回调：刷新运行中任务的耗时显示"""
+        if not self.tracker: return
+        with self._lock:
+            for key, slot in list(self.slots.items()):
+                if slot.proc.poll() is not None: continue
+                elap = StatusTracker.format_duration(time.time() - slot.start_time)
+                # 批处理作业还在排队时显示调度器状态 (PENDING 等)
+                state = getattr(slot.proc, "state", None)
+                tag = f" {state}" if state and state != "RUNNING" else ""
+                self.tracker.set_job_msg(key, f"{slot.mol_name} [{slot.step.upper()}]{tag} ... {elap}")
 
+    def poll(self) -> List[JobSlot]:
+        """回收已退出的槽位并结算状态 (退出状态由事件循环给出，这里不做系统调用)"""
+        if self.compressor: self.compressor.drain()
+        finished = []
+        with self._lock:
+            for key, slot in list(self.slots.items()):
+                if slot.proc.poll() is None: continue
+                del self.slots[key]
+                slot.end_time = time.time()
+                if self.tracker: self.tracker.clear_job_msg(key)
+                finished.append(slot)
+        for slot in finished:
+            if self.stager: slot.staged.update(self.stager.collect(slot.job_file))
+            status, err = self._settle(slot)
+            slot.status, slot.error = status, err
+            self._notify("finish", slot)
+            if slot.on_done:
+                try: slot.on_done(status == "DONE")
+                except Exception: pass
+        return finished
+
+    def _settle(self, slot: JobSlot) -> tuple[str, str]:
+        """把退出的槽位结算到 Tracker，返回整个槽位的 (状态, 错误)"""
+        if not slot.outputs:
+            status, err = self._scheduler_status(slot, *self.get_status_from_file(slot.output_file, is_opt=(slot.step == "opt")))
+            if self.tracker: self.tracker.finish_task(slot.mol_name, slot.step, status, err)
+            return status, err
+        # 打包运行：先切分合并输出，再逐步结算；没有对应片段的步骤 (程序中途退出) 回到 MISSING
+        try: split_output(slot.output_file, list(slot.outputs.values()))
+        except Exception: pass
+        result = ("DONE", "")
+        for st, out in slot.outputs.items():
+            status, err = self._scheduler_status(slot, *self.get_status_from_file(out))
+            if self.tracker: self.tracker.finish_task(slot.mol_name, st, status, err)
+            if status != "DONE" and result[0] == "DONE": result = (status, err or st)
+        return result
+
+    @staticmethod
+    def _scheduler_status(slot: JobSlot, status: str, err: str) -> tuple[str, str]:
+        """
+        输出文件优先 (被 TIMEOUT 杀掉的优化仍是 Incomplete，可以续算)；
+        调度器判定失败 (TIMEOUT / OUT_OF_MEMORY / NODE_FAIL 等) 且没有输出时记为 ERROR。
+        最终状态未知 (查不到记账记录) 时输出缺失或不完整同样记为 ERROR，不当作可续算的中断
+        """
+        failure = getattr(slot.proc, "failure", None)
+        if failure and status == "MISSING": return "ERROR", f"Slurm {failure}"
+        if failure == SLURM_UNKNOWN and (status, err) == ("ERROR", "Incomplete"): return "ERROR", f"Slurm {failure}"
+        return status, err
+
+    def submit_and_wait(self, job_file: Path, mol_name: str, step: str, xyz_list: Optional[List[str]] = None) -> bool:
+        """阻塞式提交（兼容旧流程与 Sweeper）：直接等待子进程退出，不再轮询"""
+        if not self.submit(job_file, mol_name, step): return False
+        key = self.slot_key(mol_name, step)
+        result = {}
+        slot = self.slots[key]
+        slot.on_done = lambda ok: result.setdefault("ok", ok)
+        try:
+            slot.proc.wait()
+            self.poll()
         except Exception as e:
+            self.stop_job(key)
             if self.tracker: self.tracker.finish_task(mol_name, step, "ERROR", str(e))
-            self.stop_current_job() # 发生异常时确保彻底清理
             return False
-        finally:
-            self.current_proc = None
+        return result.get("ok", False)
 
-        status, err = self.get_status_from_file(output_file, is_opt=(step=="opt"))
-        if self.tracker: self.tracker.finish_task(mol_name, step, status, err)
-        return status == "DONE"
+    def close(self):
+        """停止执行后端的后台线程（不会终止仍在运行的任务），等待进行中的压缩完成"""
+        self.executor.close()
+        if self.compressor: self.compressor.close()
+
+    # ================= 停止 =================
+    def stop_job(self, key: str, deliberate: bool = True) -> bool:
+        """
+        强制停止某一个槽位的任务（本地连同子进程一起杀掉，批处理后端 scancel）。
+        deliberate=True (界面 s / x) 时写停止标记，任务不会被自动重提或续算；
+        退出程序时的停止传 False，下次启动照常续算被打断的任务。
+        """
+        slot = self.slots.get(key)
+        if not slot: return False
+        if deliberate:
+            slot.stopped = True
+            for marker in slot.markers:
+                try: marker.touch()
+                except OSError: pass
+        self.executor.cancel(slot.proc)
+        return True
+
+    def stop_mol_jobs(self, mol_name: str, deliberate: bool = True) -> int:
+        keys = [k for k, s in self.slots.items() if s.mol_name == mol_name]
+        return sum(self.stop_job(k, deliberate) for k in keys)
+
+    def stop_all_jobs(self, deliberate: bool = True) -> int:
+        return sum(self.stop_job(k, deliberate) for k in list(self.slots))
 
     def stop_current_job(self):
-        """强制停止当前任务（连同子进程一起杀掉）"""
-        if self.current_proc:
-            try:
-                # [核心修复] 使用 os.killpg 发送信号给进程组 ID (PGID)
-                # 这样 Shell 和 ORCA 都会收到信号并终止
-                os.killpg(os.getpgid(self.current_proc.pid), signal.SIGTERM)
-            except Exception:
-                # 如果 killpg 失败（比如进程已死），尝试用普通的 kill 兜底
-                try:
-                    self.current_proc.kill()
-                except:
-                    pass
\ No newline at end of file
+        """强制停止当前所有任务（兼容旧接口）"""
+        self.stop_all_jobs()
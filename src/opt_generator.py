@@ -1,64 +1,46 @@
 # src/opt_generator.py
-import re
 from pathlib import Path
-from typing import Tuple
+from typing import Optional, Tuple
 from . import config
+from .result_cache import ResultCache
+from .templates import find_template, load_template
+from .xyz_stream import first_frame
 
 class OptGenerator:
     """
     专门负责：从 XYZ 文件生成 Optimization 输入文件
     """
-    def __init__(self):
+    def __init__(self, cache: Optional[ResultCache] = None):
         self.template_dir = config.TEMPLATE_DIR
+        self.cache = cache
         if not self.template_dir.exists():
             raise FileNotFoundError(f"Template dir not found: {self.template_dir}")
 
     def _parse_xyz(self, xyz_path: Path) -> Tuple[int, int, str]:
-        """解析 XYZ 获取电荷、多重度、坐标"""
-        with open(xyz_path, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        if len(lines) < 3:
+        """解析 XYZ 获取电荷、多重度、坐标 (多帧文件只取第一帧，逐行流式读取)"""
+        frame = first_frame(xyz_path)
+        if not frame.coords:
             raise ValueError(f"XYZ file {xyz_path.name} is too short.")
 
         # Line 2: Charge = X Multiplicity = Y
-        comment_line = lines[1]
-        cm_match = re.search(r"Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)", comment_line, re.IGNORECASE)
-        if not cm_match:
-            cm_match = re.search(r"Charge\s*=\s*(-?\d+).*?Mult.*?\=\s*(\d+)", comment_line, re.IGNORECASE)
-        
-        if not cm_match:
+        cm = frame.charge_mult
+        if cm is None:
             raise ValueError(f"Could not parse Charge/Mult from line 2 of {xyz_path.name}")
-            
-        charge = int(cm_match.group(1))
-        mult = int(cm_match.group(2))
-
-        # Line 3+: Coords
-        # 修复：使用 strip() 去除首尾空白，并只添加一个换行符，防止多余空行
-        coords_raw = "".join([line for line in lines[2:] if line.strip()])
-        coords = coords_raw.strip()
-        
-        return charge, mult, coords
+        return cm[0], cm[1], frame.coords
 
     def generate(self, xyz_path: Path) -> Path:
         """
         主入口：XYZ -> Opt Input
+        有结果缓存且命中时，同时把缓存的输出恢复到输入旁边 (调用方据此跳过提交)
         """
         base_name = xyz_path.stem
         charge, mult, coords = self._parse_xyz(xyz_path)
         
-        # 1. 寻找 opt 模板 (.gjf 或 .inp)
-        template_path = None
-        ext = None
-        for e in config.VALID_EXTENSIONS:
-            p = self.template_dir / f"opt{e}"
-            if p.exists():
-                template_path = p
-                ext = e
-                break
-        
+        # 1. 寻找 opt 模板 (.gjf 或 .inp)，编译结果按 mtime 缓存，批量生成时不再重复读盘
+        template_path, ext = find_template("opt", self.template_dir)
         if not template_path:
             raise FileNotFoundError("Missing 'opt.gjf' or 'opt.inp' in templates/")
+        template = load_template(template_path)
 
         # 2. 准备输出
         output_dir = config.DIRS["opt"]
@@ -68,15 +50,8 @@ class OptGenerator:
         output_file = output_dir / f"{new_filename}{ext}"
         
         # 3. 替换内容
-        with open(template_path, 'r', encoding='utf-8') as t:
-            content = t.read()
-            
-        new_content = content.replace("[NAME]", new_filename)
-        new_content = new_content.replace("[Charge]", str(charge))
-        new_content = new_content.replace("[Multiplicity]", str(mult))
-        new_content = new_content.replace("[GEOMETRY]", coords)
-        
         with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(new_content)
-            
+            f.write(template.render(new_filename, charge, mult, coords))
+
+        if self.cache: self.cache.lookup(template.text, charge, mult, coords, output_file.with_suffix(".out"))
         return output_file
\ No newline at end of file
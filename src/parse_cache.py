@@ -0,0 +1,96 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, Any, Optional, List
+from .parsers import ParsedOutput
+
+class ParseCache:
+    """
+    输出文件解析结果缓存：以 (path, size, mtime_ns, inode) 为键，
+    只有新增或发生变化的文件才需要重新解析。结果持久化到磁盘，重启后复用。
+    缓存的是 ParsedOutput 记录（不含坐标，坐标只在生成子任务时按需重新解析）；
+    解析失败也会被缓存，文件不变就不再重复尝试。
+    """
+    VERSION = 4
+
+    def __init__(self, cache_file: str = "parse_cache.json"):
+        self.cache_file = Path(cache_file)
+        self.entries: Dict[str, Dict[str, Any]] = self._load()
+        self.dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.cache_file.exists(): return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f: raw = json.load(f)
+        except (json.JSONDecodeError, OSError): return {}
+        if raw.get("version") != self.VERSION: return {}
+        entries = {}
+        for path, e in raw.get("entries", {}).items():
+            rec = e.get("record")
+            entries[path] = {"stat": e["stat"], "error": e.get("error", ""),
+                             "record": ParsedOutput.from_dict(rec) if rec else None}
+        return entries
+
+    def save(self):
+        """仅在有变化时写盘；先写临时文件再 os.replace，保证原子性"""
+        if not self.dirty: return
+        out = {path: {"stat": e["stat"], "error": e["error"],
+                      "record": e["record"].to_dict() if e["record"] else None}
+               for path, e in self.entries.items()}
+        tmp = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.VERSION, "entries": out}, f, ensure_ascii=False)
+        os.replace(tmp, self.cache_file)
+        self.dirty = False
+
+    @staticmethod
+    def stat_key(filepath: Path) -> Optional[List[int]]:
+        try: st = filepath.stat()
+        except OSError: return None
+        return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+    def get(self, filepath: Path) -> Optional[ParsedOutput]:
+        """命中返回记录；缓存的是解析失败时抛出 ValueError；未命中/已失效返回 None"""
+        key = str(filepath)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry["stat"] != self.stat_key(filepath):
+            # 文件被修改或删除，缓存失效
+            del self.entries[key]
+            self.dirty = True
+            self.misses += 1
+            return None
+        self.hits += 1
+        if entry["record"] is None: raise ValueError(entry["error"])
+        return entry["record"]
+
+    def put(self, filepath: Path, record: ParsedOutput):
+        self._store(filepath, {"record": record.without_coordinates(), "error": ""})
+
+    def put_error(self, filepath: Path, error: str):
+        self._store(filepath, {"record": None, "error": error})
+
+    def _store(self, filepath: Path, entry: Dict[str, Any]):
+        stat = self.stat_key(filepath)
+        if stat is None: return
+        entry["stat"] = stat
+        self.entries[str(filepath)] = entry
+        self.dirty = True
+
+    def rename(self, old: Path, new: Path):
+        """文件换了路径但内容不变 (例如被压缩)：条目转到新路径并更新 stat，不必重新解析"""
+        entry = self.entries.pop(str(old), None)
+        if entry is None: return
+        self.dirty = True
+        stat = self.stat_key(new)
+        if stat is None or entry["stat"] != self.stat_key(old): return  # 条目已过期
+        entry["stat"] = stat
+        self.entries[str(new)] = entry
+        self.dirty = True
+
+    def invalidate(self, filepath: Path):
+        if self.entries.pop(str(filepath), None) is not None: self.dirty = True
@@ -1,25 +1,49 @@
+import os
 from pathlib import Path
-from .base import BaseParser
+from typing import List
+from .base import BaseParser, ParsedOutput
 from .gaussian import GaussianParser
 from .orca import OrcaParser
+from .reader import COMPRESSED_SUFFIXES, is_compressed, open_output, resolve_output, find_output
 
 AVAILABLE_PARSERS = [GaussianParser, OrcaParser]
 
 def get_parser(filepath: Path) -> BaseParser:
-    """自动识别并返回 Parser 实例"""
+    """自动识别并返回 Parser 实例 (x.out 已被压缩时透明读取 x.out.gz / x.out.zst)"""
+    filepath = resolve_output(filepath)
     if not filepath.exists():
         raise FileNotFoundError(f"File not found: {filepath}")
 
-    # 读取头部 3000 字符进行识别
+    # 读取头部 3000 字节进行识别 (压缩文件只解压开头)
+    with open_output(filepath) as f:
+        raw = f.read(3000)
     try:
-        with open(filepath, 'r', encoding='utf-8') as f:
-            header = f.read(3000)
+        header = raw.decode('utf-8')
     except UnicodeDecodeError:
-        with open(filepath, 'r', encoding='latin-1') as f:
-            header = f.read(3000)
+        header = raw.decode('latin-1')
 
     for parser_cls in AVAILABLE_PARSERS:
         if parser_cls.detect(header):
             return parser_cls(filepath)
 
-    raise ValueError(f"Unsupported file format: {filepath.name}")
\ No newline at end of file
+    raise ValueError(f"Unsupported file format: {filepath.name}")
+
+def parse_output(filepath: Path) -> ParsedOutput:
+    """单次扫描解析输出文件，返回不可变的 ParsedOutput 记录"""
+    with get_parser(filepath) as parser:
+        return parser.record
+
+def split_output(filepath: Path, targets: List[Path]) -> List[Path]:
+    """
+    把打包运行 (--Link1-- / $new_job) 的合并输出按子任务切开，依次写入 targets
+    (每个文件都是普通的单任务输出，下游照常解析)；返回实际写出的文件。
+    """
+    with get_parser(filepath) as parser:
+        pieces = parser.split_jobs()
+    written = []
+    for target, piece in zip(targets, pieces):
+        tmp = target.with_name(target.name + ".tmp")
+        tmp.write_bytes(piece)
+        os.replace(tmp, target)
+        written.append(target)
+    return written
@@ -1,40 +1,121 @@
 from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict, replace
 from pathlib import Path
-from typing import Tuple, Optional # [修改] 引入 Optional
+from typing import Tuple, Optional, Dict, Any, List # [修改] 引入 Optional
+from .reader import OutputReader
+
+@dataclass(frozen=True)
+class ParsedOutput:
+    """
+    一个输出文件的全部结构化信息，由解析器单次扫描生成，不可变。
+    下游 (JobManager / SubGenerator / ThermodynamicsCalculator) 只消费这条记录。
+    """
+    __slots__ = ("program", "finished", "failed", "converged", "imaginary",
+                 "charge", "mult", "coordinates", "energy", "thermal_corr", "frequencies",
+                 "mass", "rot_constants", "symmetry")
+    program: str
+    finished: bool
+    failed: bool
+    converged: bool
+    imaginary: bool
+    charge: int
+    mult: int
+    coordinates: Optional[str]      # 最终几何 (元素 x y z)，找不到为 None
+    energy: Optional[float]         # 最后一次电子能量 (Ha)
+    thermal_corr: Optional[float]   # 吉布斯自由能热校正 (Ha)
+    frequencies: Optional[Tuple[float, ...]]    # 振动频率 (cm^-1，虚频为负)，没有频率计算为 None
+    # 热化学部分 (用于不重跑频率计算的 quasi-RRHO 校正)，没有频率计算为 None
+    mass: Optional[float]                       # 分子质量 (amu)
+    rot_constants: Optional[Tuple[float, ...]]  # 转动常数 (GHz)，线型分子 1 个，原子 0 个
+    symmetry: Optional[int]                     # 转动对称数
+
+    def status(self, is_opt: bool = False) -> Tuple[str, str]:
+        """按工作流规则给出 (状态码, 错误信息)"""
+        if self.failed: return "ERROR", "Prog Error"
+        if not self.finished: return "ERROR", "Incomplete"
+        if is_opt:
+            if not self.converged: return "ERR_NC", "Not Converged"
+            if self.imaginary: return "ERR_IMG", "Imag Freq"
+            if self.thermal_corr is None: return "ERR_DATA", "No G Corr"
+        return "DONE", ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "ParsedOutput":
+        d = {k: d.get(k) for k in cls.__slots__}
+        for k in ("frequencies", "rot_constants"):
+            if d[k] is not None: d[k] = tuple(d[k])  # JSON 中是列表
+        return cls(**d)
+
+    def without_coordinates(self) -> "ParsedOutput":
+        return replace(self, coordinates=None)
+
 
 class BaseParser(ABC):
+    # 切分打包输出时，补在缺少程序标识的片段前面，保证片段能被 detect 识别
+    BANNER = b""
+
     def __init__(self, filepath: Path):
         self.filepath = filepath
-        # 使用 errors='ignore' 防止读取二进制乱码导致崩溃
-        with open(filepath, 'r', encoding='latin-1', errors='ignore') as f: 
-            self.content = f.read()
+        # [修改] 不再整体读入内存：mmap 映射文件，按需从尾部向前查找
+        self.reader = OutputReader(filepath)
+        self._content: Optional[str] = None
+        self._record: Optional[ParsedOutput] = None
+
+    @property
+    def content(self) -> str:
+        """整份文本（惰性加载，仅供兼容；内置解析方法都不再使用它）"""
+        if self._content is None:
+            self._content = self.reader.text()
+        return self._content
+
+    @property
+    def record(self) -> ParsedOutput:
+        """单次扫描的解析结果（首次访问时解析，之后复用）"""
+        if self._record is None:
+            self._record = self.parse()
+        return self._record
+
+    def close(self):
+        self.reader.close()
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
 
     @classmethod
     @abstractmethod
     def detect(cls, content: str) -> bool: pass
-    
+
     @abstractmethod
-    def is_finished(self) -> bool: pass
+    def parse(self) -> ParsedOutput: pass
+
+    def split_jobs(self) -> List[bytes]:
+        """把一次运行多个子任务的合并输出按子任务切开 (默认整份文件就是一个任务)"""
+        return [self.reader.buf[:]]
+
+    def _with_banner(self, piece: bytes) -> bytes:
+        if self.detect(piece[:3000].decode('latin-1')): return piece
+        return self.BANNER + piece
+
+    # --- 兼容旧接口：全部由同一条 record 提供，不再各自扫描 ---
+    def is_finished(self) -> bool: return self.record.finished
     
-    @abstractmethod
-    def is_failed(self) -> bool: pass
+    def is_failed(self) -> bool: return self.record.failed
     
-    @abstractmethod
-    def is_converged(self) -> bool: pass
+    def is_converged(self) -> bool: return self.record.converged
     
-    @abstractmethod
-    def has_imaginary_freq(self) -> bool: pass
+    def has_imaginary_freq(self) -> bool: return self.record.imaginary
     
-    @abstractmethod
-    def get_charge_mult(self) -> Tuple[int, int]: pass
+    def get_charge_mult(self) -> Tuple[int, int]: return self.record.charge, self.record.mult
     
-    @abstractmethod
-    def get_coordinates(self) -> str: pass
+    def get_coordinates(self) -> str:
+        if self.record.coordinates is None: raise ValueError("No coordinates found")
+        return self.record.coordinates
     
     # [修改] 返回类型改为 Optional[float]，允许返回 None
-    @abstractmethod
-    def get_electronic_energy(self) -> Optional[float]: pass
+    def get_electronic_energy(self) -> Optional[float]: return self.record.energy
     
     # [修改] 返回类型改为 Optional[float]
-    @abstractmethod
-    def get_thermal_correction(self) -> Optional[float]: pass
\ No newline at end of file
+    def get_thermal_correction(self) -> Optional[float]: return self.record.thermal_corr
\ No newline at end of file
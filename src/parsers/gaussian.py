@@ -1,56 +1,127 @@
 import re
-from typing import Optional
-from .base import BaseParser
+from typing import List, Optional, Tuple
+from .base import BaseParser, ParsedOutput
+
+# 预编译的 bytes 正则，直接作用于 mmap
+_FREQ_RE = re.compile(rb"Frequencies\s*--(?!-)\s*(.*)")  # 不含 freq=HPModes 的 "Frequencies ---" 重复块
+_CHARGE_RE = re.compile(rb"Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)")
+_SCF_RE = re.compile(r"SCF Done:.*=\s*(-?\d+\.\d+)")
+_GCORR_RE = re.compile(r"Thermal correction to Gibbs Free Energy=\s*(-?\d+\.\d+)")
+
+# 单次反向扫描所关心的全部标记行
+_NORMAL = b"Normal termination"
+_ERROR = b"Error termination"
+_SEVERE = b"severe error"
+_STATIONARY = b"Stationary point found"
+_HARMONIC = b"Harmonic frequencies"
+_STD_ORIENT = b"Standard orientation"
+_INP_ORIENT = b"Input orientation"
+_SCF = b"SCF Done:"
+_GCORR = b"Thermal correction to Gibbs Free Energy="
+_ZPE = b"Zero-point correction"
+_NUM_RE = re.compile(rb"-?\d+\.\d+")
+# 热化学部分 (频率块之后、Zero-point correction 之前)
+_MASS_RE = re.compile(rb"Molecular mass:\s*(\d+\.\d+)")
+_SYMNUM_RE = re.compile(rb"Rotational symmetry number\s*(\d+)")
+_ROT_RE = re.compile(rb"Rotational constants? \(GHZ\):(.*)")
+# 以 "\n" 开头的正则可以走字面量快速查找，比裸的 | 组合快约 5 倍 (允许 "-- Stationary" 这类前缀)；
+# 终止标记不在这里扫，直接在尾部窗口里 rfind
+_MARKER_RE = re.compile(rb"\n[ \t-]*(" + b"|".join(re.escape(m) for m in (
+    _STATIONARY, _HARMONIC, _STD_ORIENT, _INP_ORIENT, _SCF, _GCORR)) + rb")")
+
+# --Link1-- 串联的每个子任务都以终止行结束
+_TERM_RE = re.compile(rb"(?:Normal|Error) termination")
+
+_ELEMENTS = {1:'H', 6:'C', 7:'N', 8:'O', 9:'F', 15:'P', 16:'S', 17:'Cl', 92:'U'}
 
 class GaussianParser(BaseParser):
+    BANNER = b" Entering Gaussian System\n"
+
     @classmethod
     def detect(cls, content: str) -> bool:
         # [核心修复] 同时兼容两种常见的 Gaussian 头部标识
         # 这里的修复解决了 "Unsupported file format" 问题
         return "Gaussian, Inc." in content or "Entering Gaussian System" in content
-    
-    def is_finished(self): return "Normal termination" in self.content
-    
-    def is_failed(self): 
-        return "Error termination" in self.content or "severe error" in self.content
-    
-    def is_converged(self): return "Stationary point found" in self.content
-    
-    def has_imaginary_freq(self):
-        parts = self.content.split("Harmonic frequencies")
-        if len(parts) < 2: return False
-        match = re.search(r"Frequencies\s*--\s*(.*)", parts[-1])
-        if match:
-            return any(float(x) < -0.1 for x in match.group(1).split())
-        return False
-
-    def get_charge_mult(self):
-        m = re.search(r"Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)", self.content)
-        return (int(m.group(1)), int(m.group(2))) if m else (0, 1)
-
-    def get_coordinates(self):
-        idx = self.content.rfind("Standard orientation")
-        if idx == -1: idx = self.content.rfind("Input orientation")
-        if idx == -1: raise ValueError("No coordinates found")
-        
-        lines = self.content[idx:].split('\n')
+
+    def parse(self) -> ParsedOutput:
+        """
+        先在尾部窗口判定终止状态，再单次反向扫描收集所有标记行，
+        最后只解码命中的那几行/几个块。
+        任务没有正常结束时，不再往前找收敛/频率/热校正标记。
+        """
+        r = self.reader
+        finished = r.tail_contains(_NORMAL)
+        failed = r.tail_contains(_ERROR) or r.tail_contains(_SEVERE)
+
+        def done(hits, lo):
+            need = [_SCF, _STD_ORIENT if _STD_ORIENT in hits or _INP_ORIENT not in hits else _INP_ORIENT]
+            if finished: need += [_STATIONARY, _HARMONIC, _GCORR]
+            return all(k in hits for k in need)
+
+        hits = r.scan_last(_MARKER_RE, done)
+        cm = r.search_first(_CHARGE_RE)
+        freqs, mass, rot, sym = self._thermo(hits.get(_HARMONIC))
+        return ParsedOutput(
+            program="gaussian",
+            finished=finished,
+            failed=failed,
+            converged=_STATIONARY in hits,
+            imaginary=any(f < -0.1 for f in freqs or ()),
+            charge=int(cm.group(1)) if cm else 0,
+            mult=int(cm.group(2)) if cm else 1,
+            coordinates=self._orientation(hits.get(_STD_ORIENT, hits.get(_INP_ORIENT))),
+            energy=self._value(hits.get(_SCF), _SCF_RE),
+            thermal_corr=self._value(hits.get(_GCORR), _GCORR_RE),
+            frequencies=freqs,
+            mass=mass,
+            rot_constants=rot,
+            symmetry=sym,
+        )
+
+    def split_jobs(self) -> List[bytes]:
+        """按终止行切开 --Link1-- 输出；最后一个未结束的子任务 (运行中断) 作为不完整片段保留"""
+        buf, size = self.reader.buf, self.reader.size
+        pieces, pos = [], 0
+        for m in _TERM_RE.finditer(buf):
+            nl = buf.find(b"\n", m.end())
+            end = size if nl == -1 else nl + 1
+            pieces.append(self._with_banner(buf[pos:end]))
+            pos = end
+        if buf[pos:size].strip(): pieces.append(self._with_banner(buf[pos:size]))
+        return pieces
+
+    def _value(self, offset: Optional[int], pattern) -> Optional[float]:
+        if offset is None: return None
+        m = pattern.search(self.reader.line_at(offset))
+        return float(m.group(1)) if m else None
+
+    def _thermo(self, offset: Optional[int]) -> Tuple[Optional[Tuple[float, ...]], Optional[float],
+                                                     Optional[Tuple[float, ...]], Optional[int]]:
+        """最后一个频率块中的全部频率，以及其后热化学部分的分子质量、转动常数、转动对称数"""
+        if offset is None: return None, None, None, None
+        r = self.reader
+        end = r.find(_ZPE, offset)
+        end = r.size if end == -1 else end
+        freqs = []
+        for m in _FREQ_RE.finditer(r.buf, offset, end):
+            freqs.extend(float(x) for x in _NUM_RE.findall(m.group(1)))
+        mass, sym, rot = (r.search_first(p, offset, end) for p in (_MASS_RE, _SYMNUM_RE, _ROT_RE))
+        return (tuple(freqs), float(mass.group(1)) if mass else None,
+                tuple(v for v in map(float, _NUM_RE.findall(rot.group(1))) if v > 0) if rot else (),
+                int(sym.group(1)) if sym else 1)
+
+    def _orientation(self, offset: Optional[int]) -> Optional[str]:
+        if offset is None: return None
         coords, dash = [], 0
-        table = {1:'H', 6:'C', 7:'N', 8:'O', 9:'F', 15:'P', 16:'S', 17:'Cl', 92:'U'}
-        
-        for line in lines:
-            if "--------" in line: dash += 1; continue
-            if dash == 2:
-                p = line.split()
-                if len(p) >= 6:
-                    sym = table.get(int(p[1]), "X")
-                    coords.append(f"{sym:<4} {p[3]:>12} {p[4]:>12} {p[5]:>12}")
-            if dash >= 3: break
-        return "\n".join(coords)
-
-    def get_electronic_energy(self) -> Optional[float]:
-        m = re.findall(r"SCF Done:.*=\s*(-?\d+\.\d+)", self.content)
-        return float(m[-1]) if m else None
-
-    def get_thermal_correction(self) -> Optional[float]:
-        m = re.search(r"Thermal correction to Gibbs Free Energy=\s*(-?\d+\.\d+)", self.content)
-        return float(m.group(1)) if m else None
\ No newline at end of file
+        try:
+            for line in self.reader.lines_from(offset):
+                if "--------" in line: dash += 1; continue
+                if dash == 2:
+                    p = line.split()
+                    if len(p) >= 6:
+                        sym = _ELEMENTS.get(int(p[1]), "X")
+                        coords.append(f"{sym:<4} {p[3]:>12} {p[4]:>12} {p[5]:>12}")
+                if dash >= 3: break
+        except ValueError:
+            return None
+        return "\n".join(coords)
\ No newline at end of file
@@ -1,48 +1,137 @@
 import re
-from typing import Optional
-from .base import BaseParser
+from typing import List, Optional, Tuple
+from .base import BaseParser, ParsedOutput
+
+# 预编译的 bytes 正则，直接作用于 mmap
+_FREQ_RE = re.compile(rb":\s+(-?\d+\.\d+)\s+cm\*\*-1")
+_XYZ_CM_RE = re.compile(rb"\*\s+xyz\s+(-?\d+)\s+(\d+)")
+_TOTAL_CM_RE = re.compile(rb"Total Charge\s+Charge\s+\.+\s+(-?\d+).*?Mult\s+\.+\s+(\d+)", re.S)
+_ENERGY_RE = re.compile(r"FINAL SINGLE POINT ENERGY\s+(-?\d+\.\d+)")
+_GCORR_RE = re.compile(r"G-E\(el\)\s+.*?(-?\d+\.\d+)\s+Eh")
+# 热化学部分 (频率块之后、G-E(el) 之前)；ORCA 的转动常数以 cm^-1 给出
+_MASS_RE = re.compile(rb"Total Mass\s*\.+\s*(\d+\.\d+)")
+_SYMNUM_RE = re.compile(rb"Symmetry Number:\s*(\d+)")
+_ROT_RE = re.compile(rb"Rotational constants in cm-1:(.*)")
+_NUM_RE = re.compile(rb"-?\d+\.\d+")
+_CM1_TO_GHZ = 29.9792458
+
+# 单次反向扫描所关心的全部标记行
+_NORMAL = b"ORCA TERMINATED NORMALLY"
+_ERROR = b"ORCA finished by error"
+_FATAL = b"FATAL ERROR"
+_CONVERGED = b"THE OPTIMIZATION HAS CONVERGED"
+_VIB = b"VIBRATIONAL FREQUENCIES"
+_FINAL_EVAL = b"FINAL ENERGY EVALUATION AT THE STATIONARY POINT"
+_CART = b"CARTESIAN COORDINATES (ANGSTROEM)"
+_ENERGY = b"FINAL SINGLE POINT ENERGY"
+_GCORR = b"G-E(el)"
+# 以 "\n" 开头的正则可以走字面量快速查找 (ORCA 的标记行前可能有 *** 装饰)；
+# 终止标记不在这里扫，直接在尾部窗口里 rfind
+_MARKER_RE = re.compile(rb"\n[ \t*]*(" + b"|".join(re.escape(m) for m in (
+    _CONVERGED, _VIB, _FINAL_EVAL, _CART, _ENERGY, _GCORR)) + rb")")
+
+# $new_job 多任务输入中，第 2 个及之后的子任务以 "JOB NUMBER n" 横幅开头
+_JOB_RE = re.compile(rb"\n[ \t*]*JOB NUMBER\s+\d+")
 
 class OrcaParser(BaseParser):
+    BANNER = b"* O   R   C   A *\n"
+
     @classmethod
     def detect(cls, content: str) -> bool: # [修改] 参数名改为 content
         return "* O   R   C   A *" in content
-    
-    def is_finished(self): return "ORCA TERMINATED NORMALLY" in self.content
-    
-    def is_failed(self):
-        return "ORCA finished by error" in self.content or "FATAL ERROR" in self.content
-
-    def is_converged(self): return "THE OPTIMIZATION HAS CONVERGED" in self.content
-    
-    def has_imaginary_freq(self):
-        if "VIBRATIONAL FREQUENCIES" not in self.content: return False
-        blk = self.content.split("VIBRATIONAL FREQUENCIES")[-1]
-        freqs = re.findall(r":\s+(-?\d+\.\d+)\s+cm\*\*-1", blk)
-        return any(float(f) < -0.1 for f in freqs)
-
-    def get_charge_mult(self):
-        m = re.search(r"\*\s+xyz\s+(-?\d+)\s+(\d+)", self.content)
-        if not m: m = re.search(r"Total Charge\s+Charge\s+\.+\s+(-?\d+).*?Mult\s+\.+\s+(\d+)", self.content, re.S)
-        return (int(m.group(1)), int(m.group(2))) if m else (0, 1)
-
-    def get_coordinates(self):
-        marker = "FINAL ENERGY EVALUATION AT THE STATIONARY POINT"
-        cnt = self.content.split(marker)[-1] if marker in self.content else self.content
-        if "CARTESIAN COORDINATES (ANGSTROEM)" not in cnt: raise ValueError("No coords")
-        
-        lines = cnt.split("CARTESIAN COORDINATES (ANGSTROEM)")[1].strip().split('\n')
+
+    def parse(self) -> ParsedOutput:
+        """
+        先在尾部窗口判定终止状态，再单次反向扫描收集所有标记行，
+        最后只解码命中的那几行/几个块。
+        任务没有正常结束时，不再往前找收敛/频率/热校正标记。
+        """
+        r = self.reader
+        finished = r.tail_contains(_NORMAL)
+        failed = r.tail_contains(_ERROR) or r.tail_contains(_FATAL)
+
+        def done(hits, lo):
+            need = [_ENERGY, _CART]
+            if finished: need += [_CONVERGED, _VIB, _GCORR]
+            return all(k in hits for k in need)
+
+        hits = r.scan_last(_MARKER_RE, done)
+        cm = r.search_first(_XYZ_CM_RE)
+        if not cm: cm = r.search_first(_TOTAL_CM_RE)
+
+        # 有收敛标记时取其后的第一个坐标块，否则取最后一个坐标块
+        coord_idx = hits.get(_CART)
+        if _FINAL_EVAL in hits:
+            idx = r.find(_CART, hits[_FINAL_EVAL])
+            coord_idx = idx if idx != -1 else None
+        freqs = self._frequencies(hits.get(_VIB))
+        mass, rot, sym = self._rotor(hits.get(_VIB))
+
+        return ParsedOutput(
+            program="orca",
+            finished=finished,
+            failed=failed,
+            converged=_CONVERGED in hits,
+            imaginary=any(f < -0.1 for f in freqs or ()),
+            charge=int(cm.group(1)) if cm else 0,
+            mult=int(cm.group(2)) if cm else 1,
+            coordinates=self._cartesian(coord_idx),
+            energy=self._value(hits.get(_ENERGY), _ENERGY_RE),
+            thermal_corr=self._value(hits.get(_GCORR), _GCORR_RE),
+            frequencies=freqs,
+            mass=mass,
+            rot_constants=rot,
+            symmetry=sym,
+        )
+
+    def split_jobs(self) -> List[bytes]:
+        """
+        按 JOB NUMBER 横幅切开 $new_job 输出。ORCA 只在整个运行末尾打印终止行，
+        而某个子任务出错会中止整个运行，所以后面还有子任务开始时，前面的片段补上正常终止行。
+        """
+        buf, size = self.reader.buf, self.reader.size
+        starts = [0] + [m.start() + 1 for m in _JOB_RE.finditer(buf)] + [size]
+        pieces = []
+        for i, (lo, hi) in enumerate(zip(starts, starts[1:])):
+            piece = self._with_banner(buf[lo:hi])
+            if hi < size: piece += b"\n" + _NORMAL + b"\n"
+            pieces.append(piece)
+        return pieces
+
+    def _value(self, offset: Optional[int], pattern) -> Optional[float]:
+        if offset is None: return None
+        m = pattern.search(self.reader.line_at(offset))
+        return float(m.group(1)) if m else None
+
+    def _frequencies(self, offset: Optional[int]) -> Optional[Tuple[float, ...]]:
+        """振动频率：频率块到 NORMAL MODES 为止，去掉平动/转动的 0.00 模式"""
+        if offset is None: return None
+        end = self.reader.find(b"NORMAL MODES", offset)
+        freqs = _FREQ_RE.findall(self.reader.buf, offset, self.reader.size if end == -1 else end)
+        return tuple(v for v in map(float, freqs) if v != 0.0)
+
+    def _rotor(self, offset: Optional[int]) -> Tuple[Optional[float], Optional[Tuple[float, ...]], Optional[int]]:
+        """频率块之后热化学部分的分子质量、转动常数 (换算为 GHz，去掉线型分子的 0) 和转动对称数"""
+        if offset is None: return None, None, None
+        r = self.reader
+        end = r.find(_GCORR, offset)
+        end = r.size if end == -1 else end
+        mass, sym, rot = (r.search_first(p, offset, end) for p in (_MASS_RE, _SYMNUM_RE, _ROT_RE))
+        rot = tuple(v * _CM1_TO_GHZ for v in map(float, _NUM_RE.findall(rot.group(1))) if v > 0) if rot else ()
+        return float(mass.group(1)) if mass else None, rot, int(sym.group(1)) if sym else 1
+
+    def _cartesian(self, offset: Optional[int]) -> Optional[str]:
+        if offset is None: return None
+        lines = self.reader.lines_from(offset)
+        next(lines)  # 跳过标题行
         coords = []
         for line in lines:
-            if not line.strip() or ("-------" in line and coords): break
-            if "-------" in line: continue
+            if not line.strip():
+                if coords: break
+                continue
+            if "-------" in line:
+                if coords: break
+                continue
             p = line.split()
             if len(p) >= 4: coords.append(f"{p[0]:<4} {p[1]:>12} {p[2]:>12} {p[3]:>12}")
-        return "\n".join(coords)
-
-    def get_electronic_energy(self) -> Optional[float]:
-        m = re.search(r"FINAL SINGLE POINT ENERGY\s+(-?\d+\.\d+)", self.content)
-        return float(m.group(1)) if m else None
-
-    def get_thermal_correction(self) -> Optional[float]:
-        m = re.search(r"G-E\(el\)\s+.*?(-?\d+\.\d+)\s+Eh", self.content)
-        return float(m.group(1)) if m else None
\ No newline at end of file
+        return "\n".join(coords)
\ No newline at end of file
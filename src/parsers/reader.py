@@ -0,0 +1,155 @@
+import gzip
+import mmap
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Callable, Dict, Iterator, Match, Optional, Pattern, Union
+
+try:
+    import zstandard
+except ImportError:  # 可选依赖：没有时只支持 .gz
+    zstandard = None
+
+# 压缩后的输出：<name>.out.gz / <name>.out.zst
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+
+
+def is_compressed(filepath: Path) -> bool:
+    return filepath.suffix in COMPRESSED_SUFFIXES
+
+
+def open_output(filepath: Path) -> BinaryIO:
+    """以二进制流打开输出文件，.gz / .zst 边读边解压"""
+    if filepath.suffix == ".gz": return gzip.open(filepath, 'rb')
+    if filepath.suffix == ".zst":
+        if zstandard is None: raise ImportError(f"zstandard is required to read {filepath.name}")
+        return zstandard.ZstdDecompressor().stream_reader(open(filepath, 'rb'), closefd=True)
+    return open(filepath, 'rb')
+
+
+def resolve_output(filepath: Path) -> Path:
+    """filepath 不存在时改用它的压缩版本 (x.out -> x.out.gz / x.out.zst)，都没有时原样返回"""
+    if is_compressed(filepath) or filepath.exists(): return filepath
+    for suffix in COMPRESSED_SUFFIXES:
+        p = filepath.with_name(filepath.name + suffix)
+        if p.exists(): return p
+    return filepath
+
+
+def find_output(base: Path) -> Optional[Path]:
+    """<base>.out / <base>.log (含压缩版本) 中第一个存在的文件"""
+    for ext in (".out", ".log"):
+        p = resolve_output(base.with_name(base.name + ext))
+        if p.exists(): return p
+    return None
+
+
+class OutputReader:
+    """
+    输出文件的只读 mmap 视图。
+    所有查找都直接作用在映射上（不复制整份文本），并优先从 EOF 向前搜索：
+    终止标记、最后一次 SCF、最后一个坐标块和频率块都在文件尾部附近，
+    因此内存占用有界，解析耗时基本与文件大小无关。
+    """
+    WINDOW = 1 << 18        # 反向正则搜索的窗口大小 (256KB)
+    OVERLAP = 4096          # 窗口重叠，防止匹配被窗口边界截断
+    TAIL = 1 << 18          # 终止标记只在最后 256KB 内查找
+
+    def __init__(self, filepath: Path):
+        self.filepath = filepath
+        # 压缩文件不能从尾部随机访问：流式解压到匿名临时文件再映射，内存占用同样有界
+        with (self._spill(filepath) if is_compressed(filepath) else open(filepath, 'rb')) as f:
+            self.size = os.fstat(f.fileno()).st_size
+            # 空文件无法 mmap，用空 bytes 代替（接口一致）
+            self.buf: Union[mmap.mmap, bytes] = (
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.size else b"")
+
+    @staticmethod
+    def _spill(filepath: Path) -> BinaryIO:
+        tmp = tempfile.TemporaryFile()
+        try:
+            with open_output(filepath) as src: shutil.copyfileobj(src, tmp, 1 << 20)
+            tmp.flush()
+        except BaseException:
+            tmp.close()
+            raise
+        return tmp
+
+    def close(self):
+        if isinstance(self.buf, mmap.mmap): self.buf.close()
+        self.buf = b""
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+    # ---------- 字面量查找 (C 层实现，不复制) ----------
+    def find(self, needle: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        return self.buf.find(needle, start, self.size if end is None else end)
+
+    def rfind(self, needle: bytes, start: int = 0, end: Optional[int] = None) -> int:
+        return self.buf.rfind(needle, start, self.size if end is None else end)
+
+    def tail_contains(self, needle: bytes) -> bool:
+        """仅在文件尾部窗口中查找（用于终止标记）"""
+        return self.rfind(needle, max(0, self.size - self.TAIL)) != -1
+
+    # ---------- 正则查找 ----------
+    def search_first(self, pattern: Pattern[bytes], start: int = 0,
+                     end: Optional[int] = None) -> Optional[Match[bytes]]:
+        return pattern.search(self.buf, start, self.size if end is None else end)
+
+    def search_last(self, pattern: Pattern[bytes], start: int = 0) -> Optional[Match[bytes]]:
+        """从 EOF 向前逐窗口搜索，返回文件中最后一个匹配"""
+        hi = self.size
+        while hi > start:
+            lo = max(start, hi - self.WINDOW)
+            last = None
+            for last in pattern.finditer(self.buf, lo, min(self.size, hi + self.OVERLAP)):
+                pass
+            if last is not None: return last
+            hi = lo
+        return None
+
+    def scan_last(self, pattern: Pattern[bytes],
+                  is_done: Callable[[Dict[bytes, int], int], bool]) -> Dict[bytes, int]:
+        """
+        单次反向扫描：从 EOF 向前逐窗口匹配标记正则（字面量的 | 组合，
+        若带捕获组则以第一个组作为标记），记录每个标记最后一次出现的偏移。
+        每扫完一个窗口调用 is_done(hits, lo)，返回 True 即提前结束，
+        因此需要的标记都在尾部时只会读最后几个窗口。
+        """
+        hits: Dict[bytes, int] = {}
+        grp = 1 if pattern.groups else 0
+        hi = self.size
+        while hi > 0:
+            lo = max(0, hi - self.WINDOW)
+            for m in pattern.finditer(self.buf, lo, min(self.size, hi + self.OVERLAP)):
+                key = m.group(grp)
+                if hits.get(key, -1) < m.start(grp): hits[key] = m.start(grp)
+            if is_done(hits, lo): break
+            hi = lo
+        return hits
+
+    # ---------- 文本访问 ----------
+    def line_at(self, offset: int) -> str:
+        """返回包含 offset 的整行"""
+        start = self.buf.rfind(b"\n", 0, offset) + 1
+        end = self.buf.find(b"\n", offset)
+        return self.buf[start:self.size if end == -1 else end].decode('latin-1').rstrip("\r")
+
+    def lines_from(self, offset: int, max_lines: Optional[int] = None) -> Iterator[str]:
+        """从 offset 开始逐行产出解码后的文本（按需读取，不加载整个文件）"""
+        pos, n = offset, 0
+        while pos < self.size and (max_lines is None or n < max_lines):
+            nl = self.buf.find(b"\n", pos)
+            end = self.size if nl == -1 else nl
+            yield self.buf[pos:end].decode('latin-1').rstrip("\r")
+            pos, n = end + 1, n + 1
+
+    def head(self, n: int = 3000) -> str:
+        return self.buf[:n].decode('latin-1')
+
+    def text(self) -> str:
+        """整份文本（仅为兼容旧代码，会把整个文件读入内存）"""
+        return self.buf[:].decode('latin-1', errors='ignore')
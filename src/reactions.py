@@ -0,0 +1,233 @@
+import csv
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+
+# 一项化学计量："2 PhBr" / "2*PhBr" / "PhBr"
+_TERM_RE = re.compile(r"^(?:(\d+(?:\.\d+)?)\s*\*?\s+|(\d+(?:\.\d+)?)\*)?(\S+)$")
+
+Terms = Tuple[Tuple[str, float], ...]
+
+
+@dataclass(frozen=True)
+class Reaction:
+    name: str
+    reactants: Terms
+    products: Terms
+    ts: Terms           # 过渡态 (可带旁观物种，如 "ts1 + PhBr")，没有时为空，ΔG‡ 为 NaN
+
+    @property
+    def species(self) -> Set[str]:
+        return {s for s, _ in self.reactants + self.products + self.ts}
+
+
+def _terms(text: str, lineno: int) -> Terms:
+    terms = []
+    for part in re.split(r"\s\+\s", text.strip()):
+        m = _TERM_RE.match(part.strip())
+        if not m: raise ValueError(f"line {lineno}: bad term '{part.strip()}'")
+        terms.append((m.group(3), float(m.group(1) or m.group(2) or 1)))
+    return tuple(terms)
+
+
+def parse_reactions(text: str) -> Tuple[List[Reaction], Dict[str, List[str]]]:
+    """
+    反应定义文件，每行一条 (# 开头为注释)：
+        名称: 反应物 -> 产物 [; ts = 过渡态]       例：ox: cat + 2 PhBr -> int1 ; ts = ts1
+        profile 名称: 反应1 反应2 ...              按顺序组成的能量剖面 / 催化循环 (计算能量跨度)
+    物种名即分子名 (与结果库一致)，"+" 两侧需要空格。格式错误抛 ValueError (带行号)。
+    """
+    reactions, profiles, names = [], {}, set()
+    for lineno, raw in enumerate(text.splitlines(), 1):
+        line = raw.split("#", 1)[0].strip()
+        if not line: continue
+        head, sep, body = line.partition(":")
+        if not sep: raise ValueError(f"line {lineno}: expected 'name: ...'")
+        head = head.strip()
+        if head.startswith("profile "):
+            profiles[head[len("profile "):].strip()] = body.split()
+            continue
+        if head in names: raise ValueError(f"line {lineno}: duplicate reaction '{head}'")
+        body, _, ts = body.partition(";")
+        lhs, arrow, rhs = body.partition("->")
+        if not arrow: raise ValueError(f"line {lineno}: expected 'reactants -> products'")
+        ts = ts.strip()
+        if ts:
+            key, eq, ts = ts.partition("=")
+            if not eq or key.strip() != "ts": raise ValueError(f"line {lineno}: expected 'ts = ...'")
+        names.add(head)
+        reactions.append(Reaction(head, _terms(lhs, lineno), _terms(rhs, lineno), _terms(ts, lineno) if ts else ()))
+    for name, steps in profiles.items():
+        missing = [s for s in steps if s not in names]
+        if missing: raise ValueError(f"profile '{name}': unknown reactions {', '.join(missing)}")
+    return reactions, profiles
+
+
+class ReactionNetwork:
+    """
+    反应网络 ΔG / ΔG‡ 引擎。物种按名称建内存索引，自由能存为一个向量 g；
+    每条反应展开为 (反应, 物种, 系数) 三元组 (ΔG: 产物 +、反应物 -；ΔG‡: 过渡态 +、反应物 -)，
+    一次 bincount 即求出全部反应。update() 只把涉及该物种的反应标记为脏，
+    recompute() 只重算脏反应以及包含它们的能量剖面。缺少的物种使 ΔG 为 NaN。
+    """
+    def __init__(self, reactions: List[Reaction], profiles: Optional[Dict[str, List[str]]] = None):
+        self.reactions = reactions
+        self.profiles = profiles or {}
+        self.rxn_index = {r.name: i for i, r in enumerate(reactions)}
+        self.index: Dict[str, int] = {}
+        for r in reactions:
+            for s in sorted(r.species): self.index.setdefault(s, len(self.index))
+        self.g = np.full(len(self.index), np.nan)
+
+        self._dg = self._coo((i, r.products, r.reactants) for i, r in enumerate(reactions))
+        self._ts = self._coo((i, r.ts, r.reactants) for i, r in enumerate(reactions) if r.ts)
+        self.has_ts = np.array([bool(r.ts) for r in reactions], dtype=bool)
+        self.by_species: Dict[int, List[int]] = {}
+        for i, r in enumerate(reactions):
+            for s in r.species: self.by_species.setdefault(self.index[s], []).append(i)
+        self.profile_steps = {name: np.array([self.rxn_index[s] for s in steps], dtype=np.int64)
+                              for name, steps in self.profiles.items()}
+
+        n = len(reactions)
+        self.dg = np.full(n, np.nan)
+        self.barrier = np.full(n, np.nan)
+        self.spans: Dict[str, Dict[str, object]] = {}
+        self.dirty: Set[int] = set(range(n))
+        self.changed = True
+
+    @classmethod
+    def from_file(cls, path: Path) -> "ReactionNetwork":
+        return cls(*parse_reactions(Path(path).read_text(encoding="utf-8")))
+
+    def _coo(self, rows: Iterable[Tuple[int, Terms, Terms]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        rxn, sp, coef = [], [], []
+        for i, plus, minus in rows:
+            for terms, sign in ((plus, 1.0), (minus, -1.0)):
+                for s, n in terms:
+                    rxn.append(i); sp.append(self.index[s]); coef.append(sign * n)
+        return np.array(rxn, dtype=np.int64), np.array(sp, dtype=np.int64), np.array(coef, dtype=float)
+
+    # ================= 输入 =================
+    def update(self, species: str, g: Optional[float]) -> bool:
+        """某个分子有了新的 G (kcal/mol)；不在网络中或值没变时返回 False"""
+        i = self.index.get(species)
+        if i is None: return False
+        value = np.nan if g is None else float(g)
+        if self.g[i] == value or (np.isnan(value) and np.isnan(self.g[i])): return False
+        self.g[i] = value
+        self.dirty.update(self.by_species.get(i, ()))
+        return True
+
+    def update_many(self, values: Dict[str, Optional[float]]) -> int:
+        return sum(self.update(s, g) for s, g in values.items())
+
+    # ================= 计算 =================
+    def _sum(self, coo, rows: np.ndarray) -> np.ndarray:
+        """rows 中各反应的 Σ 系数 × G (长度为反应总数，其余位置为 0)"""
+        rxn, sp, coef = coo
+        sel = np.isin(rxn, rows) if rows.size < len(self.reactions) else slice(None)
+        return np.bincount(rxn[sel], weights=coef[sel] * self.g[sp[sel]], minlength=len(self.reactions))
+
+    def recompute(self) -> int:
+        """重算脏反应 (一次向量化求和) 及受影响的剖面，返回重算的反应数"""
+        if not self.dirty: return 0
+        rows = np.fromiter(self.dirty, dtype=np.int64, count=len(self.dirty))
+        self.dirty.clear()
+        self.dg[rows] = self._sum(self._dg, rows)[rows]
+        barrier = self._sum(self._ts, rows)[rows]
+        self.barrier[rows] = np.where(self.has_ts[rows], barrier, np.nan)
+        touched = set(rows.tolist())
+        for name, steps in self.profile_steps.items():
+            if name not in self.spans or touched.intersection(steps.tolist()):
+                self.spans[name] = self.energy_span(steps)
+        self.changed = True
+        return rows.size
+
+    def energy_span(self, steps: np.ndarray) -> Dict[str, object]:
+        """
+        能量跨度模型 (Kozuch-Shaik)：剖面各中间体 I_i、过渡态 T_j (相对起点)，
+        δE = max(T_j - I_i + (ΔG_r 若 i > j))，同时给出决速中间体 / 过渡态所在的步骤。
+        没有过渡态的步骤以两端较高者作为过渡态能量；任一中间体或已定义的过渡态缺少 G 时跨度为 NaN。
+        """
+        dg, barrier = self.dg[steps], self.barrier[steps]
+        levels = np.concatenate([[0.0], np.cumsum(dg)])
+        inter = levels[:-1]
+        # 只有未定义过渡态的步骤才用两端较高者；定义了但还没算出的过渡态保持 NaN，跨度为 NaN
+        ts = np.where(self.has_ts[steps], inter + barrier, np.maximum(inter, levels[1:]))
+        total = levels[-1]
+        if not steps.size or np.isnan(levels).any() or np.isnan(ts).any():
+            return {"span": np.nan, "tdi": "", "tdts": "", "dG_r": total, "levels": levels, "ts": ts}
+        # 过渡态在中间体之前 (j < i) 时属于下一圈循环，加上反应自由能
+        order = np.arange(steps.size)
+        span = ts[None, :] - inter[:, None] + np.where(order[:, None] > order[None, :], total, 0.0)
+        i, j = np.unravel_index(np.argmax(span), span.shape)
+        return {"span": float(span[i, j]), "tdi": self.reactions[steps[i]].name, "tdts": self.reactions[steps[j]].name,
+                "dG_r": float(total), "levels": levels, "ts": ts}
+
+    # ================= 输出 =================
+    def missing(self, i: int) -> List[str]:
+        return sorted(s for s in self.reactions[i].species if np.isnan(self.g[self.index[s]]))
+
+    def export(self, reactions_csv: Path, profiles_csv: Optional[Path] = None):
+        """导出 reactions.csv (每条反应的 ΔG / ΔG‡ 与缺少的物种) 与 profiles.csv (能量跨度与各能级)，原子替换"""
+        def fmt(v): return "" if np.isnan(v) else f"{v:.2f}"
+        rows = [[r.name, fmt(self.dg[i]), fmt(self.barrier[i]), " ".join(self.missing(i))]
+                for i, r in enumerate(self.reactions)]
+        _write_csv(Path(reactions_csv), ["Reaction", "dG (kcal/mol)", "dG_TS (kcal/mol)", "Missing"], rows)
+        if profiles_csv is not None and self.profiles:
+            rows = [[name, fmt(s["span"]), s["tdi"], s["tdts"], fmt(s["dG_r"]),
+                     " ".join(f"{fmt(a)}/{fmt(b)}" for a, b in zip(s["levels"], s["ts"]))]
+                    for name, s in self.spans.items()]
+            _write_csv(Path(profiles_csv), ["Profile", "Energy Span (kcal/mol)", "TDI (before step)", "TDTS (step)",
+                                            "dG_r (kcal/mol)", "Levels (I/TS per step)"], rows)
+        self.changed = False
+
+
+def _write_csv(target: Path, header: List[str], rows: List[List[str]]):
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    os.replace(tmp, target)
+
+
+class ReactionMonitor:
+    """
+    工作流中的反应网络：定义文件修改后重新加载 (以结果库中已有的 G 初始化)，
+    新算出的分子经 update() 推入，每轮派发后 sync() 只重算受影响的反应并在有变化时导出。
+    定义文件不存在时什么都不做。
+    """
+    def __init__(self, path: Path, results, reactions_csv: str = "reactions.csv", profiles_csv: str = "profiles.csv"):
+        self.path = Path(path)
+        self.results = results
+        self.reactions_csv, self.profiles_csv = Path(reactions_csv), Path(profiles_csv)
+        self.network: Optional[ReactionNetwork] = None
+        self.error = ""
+        self._mtime: Optional[int] = None
+
+    def _reload(self):
+        try: mtime = self.path.stat().st_mtime_ns
+        except OSError: mtime = None
+        if mtime == self._mtime: return
+        self._mtime, self.network, self.error = mtime, None, ""
+        if mtime is None: return
+        try: self.network = ReactionNetwork.from_file(self.path)
+        except (OSError, ValueError) as e:
+            self.error = f"{self.path.name}: {e}"
+            return
+        self.network.update_many({r["Molecule"]: r.get("G_Final (kcal/mol)") for r in self.results.rows()})
+
+    def update(self, mol: str, g: Optional[float]):
+        if self.network is not None: self.network.update(mol, g)
+
+    def sync(self) -> int:
+        """返回本次重算的反应数"""
+        self._reload()
+        if self.network is None: return 0
+        n = self.network.recompute()
+        if self.network.changed: self.network.export(self.reactions_csv, self.profiles_csv)
+        return n
@@ -0,0 +1,101 @@
+import re
+from pathlib import Path
+from typing import Optional
+from . import config
+from .job_manager import stop_marker
+
+# 可以从最后一个几何接着算的失败：优化步数用完 / 被杀或超时 (用户手动停止的记为 Stopped，不在此列)
+RESTARTABLE = {("ERR_NC", None), ("ERROR", "Incomplete")}
+
+_G_CHK_RE = re.compile(r"^\s*%chk\s*=\s*(\S+)", re.IGNORECASE | re.MULTILINE)
+_G_CM_RE = re.compile(r"^\s*-?\d+\s+\d+\s*$")
+# 元素 [冻结标记] x y z
+_G_ATOM_RE = re.compile(r"^\s*[A-Za-z]{1,2}\d*(\(.*?\))?(\s+-?\d+)?(\s+-?\d+\.?\d*){3}\s*$")
+_O_XYZ_RE = re.compile(r"^\s*\*\s*xyz\s+-?\d+\s+\d+\s*$", re.IGNORECASE)
+
+
+def is_restartable(status: str, error: str = "") -> bool:
+    return (status, None) in RESTARTABLE or (status, error) in RESTARTABLE
+
+
+class OptRestarter:
+    """
+    优化任务的断点续算：从上一次输出的最后一个几何重新生成输入，
+    有 .chk / .gbw 时复用其中的波函数作为初猜。
+    每次续算前把旧的输入 / 输出改名为 <mol>_opt.r<N>.* 保留，
+    续算次数就是磁盘上已归档的份数，重启工作流后也不会重置。
+    """
+    def __init__(self, job_manager, max_attempts: int = config.OPT_RESTART_MAX):
+        self.mgr = job_manager
+        self.max_attempts = max_attempts
+
+    @staticmethod
+    def _path(mol: str, suffix: str) -> Path:
+        return config.DIRS["opt"] / f"{mol}_opt{suffix}"
+
+    def attempts(self, mol: str) -> int:
+        """已归档的失败尝试次数"""
+        n = 0
+        while any(self._path(mol, f".r{n + 1}{e}").exists() for e in (".out", ".log")): n += 1
+        return n
+
+    def can_restart(self, mol: str) -> bool:
+        """失败可续算、未被用户手动停止、且没有用完次数"""
+        if stop_marker(self._path(mol, "")).exists(): return False
+        rec = self.mgr.tracker.get(mol, "opt") if self.mgr.tracker else {}
+        if not is_restartable(rec.get("status", ""), rec.get("error", "")): return False
+        return self.attempts(mol) < self.max_attempts
+
+    def prepare(self, mol: str) -> Optional[Path]:
+        """归档上一次尝试并写出续算输入；找不到上一次的输入或输出时返回 None"""
+        job_in = next((p for p in (self._path(mol, e) for e in config.VALID_EXTENSIONS) if p.exists()), None)
+        out = next((p for p in (self._path(mol, e) for e in (".out", ".log")) if p.exists()), None)
+        if job_in is None or out is None: return None
+
+        try: coords = self.mgr.get_record(out, with_coords=True).coordinates
+        except Exception: coords = None
+        text = job_in.read_text(encoding='utf-8', errors='ignore')
+
+        n = self.attempts(mol) + 1
+        out.rename(self._path(mol, f".r{n}{out.suffix}"))
+        job_in.rename(self._path(mol, f".r{n}{job_in.suffix}"))
+        if job_in.suffix == ".inp":
+            text = self._orca(text, coords, mol, n)
+        else:
+            text = self._gaussian(text, coords, job_in.parent)
+        job_in.write_text(text, encoding='utf-8')
+        return job_in
+
+    @staticmethod
+    def _gaussian(text: str, coords: Optional[str], work_dir: Path) -> str:
+        lines = text.splitlines()
+        if coords:
+            # 电荷/多重度行之后到空行为止的原子行换成新几何 (保留 ModRedundant 等后续段落)
+            start = next((i for i, l in enumerate(lines) if _G_CM_RE.match(l)), None)
+            if start is not None:
+                end = start + 1
+                while end < len(lines) and _G_ATOM_RE.match(lines[end]): end += 1
+                lines[start + 1:end] = coords.splitlines()
+        chk = _G_CHK_RE.search(text)
+        if chk and (work_dir / chk.group(1)).exists():
+            route = next((i for i, l in enumerate(lines) if l.lstrip().startswith("#")), None)
+            if route is not None and "guess" not in lines[route].lower():
+                lines[route] += " Guess=Read"
+        return "\n".join(lines) + "\n"
+
+    def _orca(self, text: str, coords: Optional[str], mol: str, n: int) -> str:
+        lines = text.splitlines()
+        if coords:
+            start = next((i for i, l in enumerate(lines) if _O_XYZ_RE.match(l)), None)
+            if start is not None:
+                end = next((i for i in range(start + 1, len(lines)) if lines[i].strip() == "*"), None)
+                if end is not None: lines[start + 1:end] = coords.splitlines()
+        # ORCA 不能从自己将要写的 .gbw 读初猜，先改名成归档名再 MORead (替换上一次续算加的那两行)
+        gbw = self._path(mol, ".gbw")
+        if gbw.exists():
+            archived = self._path(mol, f".r{n}.gbw")
+            gbw.rename(archived)
+            lines = [l for l in lines if l.strip().lower() != "! moread" and not l.lstrip().lower().startswith("%moinp")]
+            first = next((i for i, l in enumerate(lines) if l.lstrip().startswith("!")), 0)
+            lines[first + 1:first + 1] = ["! MORead", f'%moinp "{archived.name}"']
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+from . import config
+
+_ATOM_RE = re.compile(r"^\s*([A-Za-z]{1,2})\S*\s+(-?\d+\.?\d*(?:[eE][-+]?\d+)?)\s+(-?\d+\.?\d*(?:[eE][-+]?\d+)?)"
+                      r"\s+(-?\d+\.?\d*(?:[eE][-+]?\d+)?)\s*$")
+
+
+# 与输出同名、一并缓存和恢复的产物：Gaussian 检查点 / ORCA 波函数 (续算、后续步骤可能读取)
+ARTIFACT_SUFFIXES = (".chk", ".gbw")
+# 读取模板之外的文件 (旧检查点 / 波函数) 的输入：结果不只由哈希的内容决定，不缓存
+_READS_EXTERNAL_RE = re.compile(r"%oldchk|%moinp|\bmoread\b|\bguess\s*=\s*\(?\s*read|\bgeom\s*=\s*\(?\s*(?:all)?check",
+                                re.IGNORECASE)
+_CHK_RE = re.compile(r"^\s*%chk\s*=\s*(\S+)", re.IGNORECASE | re.MULTILINE)
+
+
+def cacheable(template: str) -> bool:
+    """模板的结果能否缓存：不读外部文件，且检查点 (若有) 写到与输出同名的 [NAME].chk，能随输出一起恢复"""
+    if _READS_EXTERNAL_RE.search(template): return False
+    return all(m.group(1) == "[NAME].chk" for m in _CHK_RE.finditer(template))
+
+
+def canonical_coords(coords: str, tol: float = 1e-4) -> str:
+    """坐标规范化：元素符号统一大小写，坐标按 tol 取整 (消除格式差异与 -0.0)"""
+    digits = max(0, -int(f"{tol:e}".split("e")[1]))
+    out = []
+    for line in coords.splitlines():
+        m = _ATOM_RE.match(line)
+        if not m:
+            if line.strip(): out.append(" ".join(line.split()))
+            continue
+        xyz = [round(float(v) / tol) * tol + 0.0 for v in m.group(2, 3, 4)]
+        out.append(m.group(1).capitalize() + "".join(f" {v:.{digits}f}" for v in xyz))
+    return "\n".join(out)
+
+
+def input_key(template: str, charge: int, mult: int, coords: str, tol: float = 1e-4) -> str:
+    """输入内容的哈希：模板原文 + 电荷/多重度 + 规范化坐标 (与分子名无关)"""
+    h = hashlib.sha256()
+    for part in (template, f"{charge} {mult}", canonical_coords(coords, tol)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class ResultCache:
+    """
+    内容寻址的结果缓存：已完成任务的输出文件按输入哈希保存在 root/<前两位>/<哈希>.out，
+    同名的 .chk / .gbw 一并保存为 <哈希>.chk / .gbw；同一结构换了名字或清理后重新加入时直接取回，不再重算。
+    生成器渲染输入时查缓存 (lookup)，未命中则登记期望的输出路径，任务成功结束后入库 (commit)；
+    登记表保存在 root/pending.json，工作流重启或接管批处理作业后结束的任务同样能入库。
+    读取外部检查点 / 波函数的模板 (见 cacheable) 不参与缓存。
+    磁盘占用超过 max_bytes 时按最近使用时间 (条目 mtime，命中时刷新) 淘汰。
+    """
+    def __init__(self, root: Path = None, max_bytes: Optional[int] = None, tol: float = None):
+        self.root = Path(root or config.RESULT_CACHE_DIR)
+        self.max_bytes = config.RESULT_CACHE_MAX_MB << 20 if max_bytes is None else max_bytes
+        self.tol = config.RESULT_CACHE_TOL if tol is None else tol
+        self.pending_file = self.root / "pending.json"
+        self.pending: Dict[str, str] = self._load_pending()   # 期望的输出路径 -> 输入哈希
+        self.hits = 0
+        self.index: Dict[str, List[float]] = self._scan()  # 哈希 -> [大小, 最近使用时间]
+        self.total = sum(size for size, _ in self.index.values())
+
+    def _scan(self) -> Dict[str, List[float]]:
+        index = {}
+        if not self.root.exists(): return index
+        for sub in os.scandir(self.root):
+            if not sub.is_dir(): continue
+            for e in os.scandir(sub.path):
+                key, ext = os.path.splitext(e.name)
+                if ext != ".out" and ext not in ARTIFACT_SUFFIXES: continue
+                st = e.stat()
+                entry = index.setdefault(key, [0, 0.0])
+                entry[0] += st.st_size
+                if ext == ".out": entry[1] = st.st_mtime
+        return index
+
+    def _load_pending(self) -> Dict[str, str]:
+        try:
+            with open(self.pending_file, 'r', encoding='utf-8') as f: return dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return {}
+
+    def _save_pending(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.pending_file.with_name(self.pending_file.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f: json.dump(self.pending, f)
+        os.replace(tmp, self.pending_file)
+
+    def _path(self, key: str, suffix: str = ".out") -> Path:
+        return self.root / key[:2] / f"{key}{suffix}"
+
+    def key(self, template: str, charge: int, mult: int, coords: str) -> str:
+        return input_key(template, charge, mult, coords, self.tol)
+
+    def restore(self, key: str, target: Path) -> bool:
+        """命中时把缓存的输出复制到 target 并返回 True"""
+        if key not in self.index: return False
+        src = self._path(key)
+        try:
+            # 产物先于输出恢复：输出出现时 (扫描据此判定 DONE) 检查点已经就位
+            for suffix in ARTIFACT_SUFFIXES:
+                if self._path(key, suffix).exists(): _copy(self._path(key, suffix), target.with_suffix(suffix))
+            _copy(src, target)
+            now = time.time()
+            os.utime(src, (now, now))
+        except OSError:
+            # 条目被外部删除：从索引中去掉
+            self.total -= self.index.pop(key)[0]
+            return False
+        self.index[key][1] = now
+        self.hits += 1
+        return True
+
+    def lookup(self, template: str, charge: int, mult: int, coords: str, target: Path) -> bool:
+        """查缓存：命中则恢复输出到 target；未命中则登记 target，任务成功后再 commit"""
+        if not cacheable(template): return False
+        key = self.key(template, charge, mult, coords)
+        if self.restore(key, target): return True
+        if self.pending.get(str(target)) != key:
+            self.pending[str(target)] = key
+            self._save_pending()
+        return False
+
+    def commit(self, output: Path) -> bool:
+        """任务成功结束：把输出 (及同名的 .chk / .gbw) 按登记的哈希存入缓存"""
+        key = self.pending.pop(str(output), None)
+        if key is None: return False
+        self._save_pending()
+        if not output.exists(): return False
+        dst = self._path(key)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        size = 0
+        for suffix in ARTIFACT_SUFFIXES:
+            artifact = output.with_suffix(suffix)
+            if artifact.exists():
+                _copy(artifact, self._path(key, suffix))
+                size += self._path(key, suffix).stat().st_size
+        _copy(output, dst)
+        size += dst.stat().st_size
+        if key in self.index: self.total -= self.index[key][0]
+        self.index[key] = [size, time.time()]
+        self.total += size
+        self.evict()
+        return True
+
+    def evict(self):
+        """超出容量时按最近使用时间淘汰，一次降到上限的 90%，避免每次入库都排序"""
+        if self.total <= self.max_bytes: return
+        target = self.max_bytes * 0.9
+        for key, (size, _) in sorted(self.index.items(), key=lambda kv: kv[1][1]):
+            if self.total <= target: break
+            for suffix in (".out", *ARTIFACT_SUFFIXES):
+                try: self._path(key, suffix).unlink()
+                except OSError: pass
+            del self.index[key]
+            self.total -= size
+
+
+def _copy(src: Path, dst: Path):
+    """复制到临时文件再原子替换"""
+    tmp = dst.with_name(dst.name + ".tmp")
+    shutil.copyfile(src, tmp)
+    os.replace(tmp, dst)
@@ -0,0 +1,115 @@
+import csv
+import json
+import os
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# results.csv 的列顺序（与旧版 update_csv 输出一致）
+COLUMNS = ["Molecule", "G_Final (kcal/mol)", "E_SP (Ha)", "E_Gas (Ha)", "E_Solv (Ha)",
+           "Thermal_Corr (Ha)", "dG_Solv (kcal/mol)", "G_Final (Ha)"]
+
+
+class ResultsStore:
+    """
+    以分子名为主键的结果库 (SQLite, WAL 模式)：
+    每个分子完成时只 upsert 一行，不再读入-过滤-拼接-重写整张表。
+    每行同时保存输入指纹 (各输出文件的 stat)，指纹未变时可以跳过重新解析与计算。
+    CSV / DataFrame 按需导出；pandas 仅在 to_dataframe() 中延迟导入。
+    """
+    def __init__(self, db_file: str = "results.db", legacy_csv: Optional[str] = "results.csv"):
+        self.path = Path(db_file)
+        fresh = not self.path.exists()
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS results ("
+                          "seq INTEGER PRIMARY KEY AUTOINCREMENT, molecule TEXT UNIQUE NOT NULL, "
+                          "fingerprint TEXT NOT NULL, row TEXT NOT NULL)")
+        self.conn.commit()
+        self.dirty = False
+        # 首次使用时导入旧版 results.csv，已有结果不丢失
+        if fresh and legacy_csv and Path(legacy_csv).exists(): self._import_csv(Path(legacy_csv))
+
+    def _import_csv(self, csv_file: Path):
+        try:
+            with open(csv_file, 'r', encoding='utf-8', newline='') as f:
+                rows = [r for r in csv.DictReader(f) if r.get("Molecule")]
+        except (OSError, csv.Error):
+            return
+        for r in rows:
+            self.upsert(r["Molecule"], {k: _to_float(v) for k, v in r.items() if k != "Molecule"}, "")
+
+    # ================= 读写 =================
+    def get(self, mol_name: str) -> Optional[Dict[str, Any]]:
+        cur = self.conn.execute("SELECT row FROM results WHERE molecule = ?", (mol_name,))
+        hit = cur.fetchone()
+        return json.loads(hit[0]) if hit else None
+
+    def is_current(self, mol_name: str, fingerprint: str) -> bool:
+        """该分子的结果是否由当前这组输出文件算出"""
+        cur = self.conn.execute("SELECT fingerprint FROM results WHERE molecule = ?", (mol_name,))
+        hit = cur.fetchone()
+        return bool(hit) and bool(fingerprint) and hit[0] == fingerprint
+
+    def upsert(self, mol_name: str, row: Dict[str, Any], fingerprint: str):
+        """插入或覆盖一个分子的结果 (O(1))；重算的分子保持原来的行序"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO results (molecule, fingerprint, row) VALUES (?, ?, ?) "
+                "ON CONFLICT(molecule) DO UPDATE SET fingerprint = excluded.fingerprint, row = excluded.row",
+                (mol_name, fingerprint, json.dumps(row)))
+        self.dirty = True
+
+    def remove(self, mol_name: str):
+        with self.conn:
+            if self.conn.execute("DELETE FROM results WHERE molecule = ?", (mol_name,)).rowcount:
+                self.dirty = True
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return [{"Molecule": mol, **json.loads(row)}
+                for mol, row in self.conn.execute("SELECT molecule, row FROM results ORDER BY seq")]
+
+    # ================= 导出 =================
+    def export_csv(self, filename: str = "results.csv"):
+        """导出为 CSV（原子替换），格式与旧版 results.csv 相同"""
+        target = Path(filename)
+        tmp = target.with_name(target.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for r in self.rows():
+                writer.writerow([r["Molecule"]] + [_fmt(r.get(c)) for c in COLUMNS[1:]])
+        os.replace(tmp, target)
+        self.dirty = False
+
+    def to_dataframe(self):
+        """需要安装 pandas (可选依赖)"""
+        try:
+            import pandas as pd
+        except ImportError as e:
+            raise ImportError("pandas is required for to_dataframe(); use export_csv() instead") from e
+        return pd.DataFrame(self.rows(), columns=COLUMNS)
+
+    def close(self):
+        self.conn.close()
+
+
+def _fmt(v: Any) -> str:
+    if v is None: return ""
+    return f"{v:.6f}" if isinstance(v, float) else str(v)
+
+
+def _to_float(v: Optional[str]) -> Optional[float]:
+    try: return float(v)
+    except (TypeError, ValueError): return None
+
+
+def fingerprint(files: List[Path]) -> str:
+    """一组输入文件的指纹 (路径, 大小, mtime_ns, inode)；任一文件变化或缺失都会改变指纹"""
+    parts = []
+    for f in files:
+        try: st = os.stat(f)
+        except OSError: return ""
+        parts.append(f"{f}:{st.st_size}:{st.st_mtime_ns}:{st.st_ino}")
+    return "|".join(parts)
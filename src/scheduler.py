@@ -0,0 +1,137 @@
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from .work_queue import QueueEntry, WorkQueue
+
+# 每个分子的任务图：opt → {gas, solv, sp} → calc
+# calc 不是外部任务，而是在主循环里直接计算 G 的节点
+GRAPH: Dict[str, Tuple[str, ...]] = {
+    "opt": (),
+    "gas": ("opt",),
+    "solv": ("opt",),
+    "sp": ("opt",),
+    "calc": ("gas", "solv", "sp"),
+}
+JOB_STEPS = [s for s in GRAPH if s != "calc"]
+SUB_STEPS = [s for s, deps in GRAPH.items() if deps == ("opt",)]
+# 尚未开始的状态：没有输出文件 / 刚建档
+NOT_STARTED = {"MISSING", "PENDING"}
+
+
+def _ancestors(step: str) -> List[str]:
+    seen: List[str] = []
+    for dep in GRAPH[step]:
+        for a in _ancestors(dep) + [dep]:
+            if a not in seen: seen.append(a)
+    return seen
+
+ANCESTORS = {step: _ancestors(step) for step in GRAPH}
+
+
+class DagScheduler:
+    """
+    就绪队列调度：节点的所有祖先都是 DONE、自身尚未开始时即为就绪。
+    节点状态直接取自 Tracker（扫描和 JobManager 结算都会更新它），
+    refresh(mols) 只重新评估有变化的分子，把就绪的任务节点增量地放进 WorkQueue；
+    dispatch() 按优先级 / 公平共享从队列取任务填满空闲槽位。
+    同一分子的 gas/solv/sp 可以并行；calc 不占槽位，在三个父节点完成后立即执行。
+    其他任务类 (如 extra_jobs) 通过 add_class 注册启动函数，共用同一个队列。
+    """
+    def __init__(self, tracker, job_manager,
+                 launch: Callable[[str, str], bool], calc: Callable[[str], None],
+                 queue: Optional[WorkQueue] = None, priority: Callable[[str], int] = lambda mol: 0,
+                 retry: Callable[[str, str], bool] = lambda mol, step: False):
+        self.tracker = tracker
+        self.mgr = job_manager
+        self.calc = calc      # calc(mol)
+        self.queue = queue if queue is not None else WorkQueue()
+        self.priority = priority  # priority(mol)，结果按分子缓存，invalidate 时重新读取
+        self.retry = retry        # retry(mol, step)：失败的节点是否可以重新提交 (如优化续算)
+        self.launchers: Dict[str, Callable[[QueueEntry], bool]] = {"main": lambda e: launch(*e.key)}
+        self.priorities: Dict[str, int] = {}
+        self.settled = set()  # calc 已执行且之后文件没有变化的分子
+        self.known: set = set()
+
+    def add_class(self, cls: str, launcher: Callable[[QueueEntry], bool]):
+        self.launchers[cls] = launcher
+
+    def state(self, mol: str, step: str) -> str:
+        if self.mgr.is_running(mol, step): return "RUNNING"
+        return self.tracker.get(mol, step).get("status", "MISSING")
+
+    def invalidate(self, mols: Optional[Iterable[str]] = None):
+        """分子的文件有变化 (None = 全部)：下次依赖满足时重新触发 calc，并重新读取优先级"""
+        if mols is None:
+            self.settled.clear()
+            self.priorities.clear()
+        else:
+            mols = set(mols)
+            self.settled.difference_update(mols)
+            for mol in mols: self.priorities.pop(mol, None)
+
+    def startable(self, mol: str, step: str) -> bool:
+        """尚未开始，或失败但允许重试"""
+        st = self.state(mol, step)
+        return st in NOT_STARTED or (st not in ("RUNNING", "DONE") and self.retry(mol, step))
+
+    def is_ready(self, mol: str, step: str) -> bool:
+        if step == "calc" and mol in self.settled: return False
+        if any(self.state(mol, a) != "DONE" for a in ANCESTORS[step]): return False
+        return step == "calc" or self.startable(mol, step)
+
+    def ready(self, mols: Iterable[str]) -> Iterator[Tuple[str, str]]:
+        """按分子顺序产出所有就绪节点 (mol, step)"""
+        for mol in mols:
+            for step in GRAPH:
+                if self.is_ready(mol, step): yield mol, step
+
+    def refresh(self, mols: Iterable[str], prune: bool = False):
+        """
+        重新评估这些分子：就绪的任务节点入队、不再就绪的出队，就绪的 calc 直接执行。
+        prune=True 表示 mols 是完整的分子列表，不在其中的分子 (xyz 已删除) 全部出队。
+        """
+        mols = list(mols)
+        if prune:
+            gone = self.known - set(mols)
+            for mol in gone:
+                for step in JOB_STEPS: self.queue.discard((mol, step))
+            self.known = set(mols)
+        else:
+            self.known.update(mols)
+        for mol in mols:
+            for step in JOB_STEPS:
+                if self.is_ready(mol, step):
+                    if mol not in self.priorities: self.priorities[mol] = self.priority(mol)
+                    self.queue.push("main", (mol, step), self.priorities[mol])
+                else:
+                    self.queue.discard((mol, step))
+            if self.is_ready(mol, "calc"):
+                self.calc(mol)
+                self.settled.add(mol)
+
+    def _fits(self, e: QueueEntry) -> bool:
+        # 主流程任务的输入可能尚未生成，核数在 launch 时才知道，这里按 1 核预判
+        cores = self.mgr.job_cores(e.payload) if e.payload else 1
+        return self.mgr.has_capacity(cores)
+
+    def dispatch(self, mols: Optional[Iterable[str]] = None, stop: Optional[Callable[[], bool]] = None) -> bool:
+        """(可选先 refresh mols) 从队列取任务填满空闲槽位；有任务提交时返回 True"""
+        if mols is not None: self.refresh(mols)
+        act = False
+        while len(self.mgr.slots) < self.mgr.max_concurrent and not (stop and stop()):
+            e = self.queue.pop_next(self._fits)
+            if e is None: break
+            if self.launchers[e.cls](e):
+                act = True
+                slot = self.mgr.slot_for(*e.key)
+                self.queue.charge(e.cls, slot.cores if slot else 1)
+                # 打包运行一次覆盖同一分子的多个步骤，这些步骤不再排队
+                if slot and slot.outputs:
+                    for step in slot.outputs: self.queue.discard((slot.mol_name, step))
+            elif e.cls == "main" and self.state(*e.key) == "DONE":
+                # 没有启动进程就已完成 (例如命中结果缓存)：立即推进后继节点
+                act = True
+                self.refresh([e.key[0]])
+            elif self.startable(*e.key):
+                # 没有报错只是资源不够 (例如核数预算)：放回队列，保留原入队时间，下次再试
+                self.queue.push(e.cls, e.key, e.priority, e.payload, enqueued_at=e.enqueued_at)
+                break
+        return act
@@ -0,0 +1,126 @@
+import os
+import shlex
+import shutil
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+from . import config
+
+# 在执行节点上运行的包装脚本 (POSIX sh)：{占位符} 由 wrap() 填入
+_WRAPPER = """\
+mkdir -p "{root}" && d=$(mktemp -d "{root}/{stem}.XXXXXX") || exit 1
+echo 0 > "$d/.peak"
+finish() {{
+  kill "$sampler" 2>/dev/null
+  out=0
+  for f in "$d"/{stem}*; do
+    case "$f" in {patterns}) [ "$f" -nt "$d/.staged" ] && cp -p "$f" {work}/ && out=$((out + $(wc -c < "$f")));; esac
+  done
+  k=$(du -sk "$d" | cut -f1); p=$(cat "$d/.peak")
+  echo "$(( k > p ? k : p )) $out" > {stats}
+  [ "$1" -ne 0 ] && [ {keep} = 1 ] || rm -rf "$d"
+  exit "$1"
+}}
+trap 'finish 143' TERM INT
+( while sleep {interval}; do k=$(du -sk "$d" 2>/dev/null | cut -f1); [ "${{k:-0}}" -gt "$(cat "$d/.peak")" ] && echo "$k" > "$d/.peak"; done ) &
+sampler=$!
+cp -p {files} "$d"/ && touch "$d/.staged" && cd "$d" || finish 1
+export GAUSS_SCRDIR="$d"
+{cmd}
+finish $?"""
+
+
+class ScratchStager:
+    """
+    节点本地 scratch 暂存：每个任务在 root/gibbs_scratch/<输入名>.XXXXXX 私有目录中运行。
+    目录由包装脚本在执行节点上创建 (本地子进程与 Slurm 作业通用，root 可以写 $TMPDIR 等环境变量)。
+    输入和上一次留下的波函数 (.chk / .gbw，续算要用) 复制进去；输出 (.out) 直接写回共享目录，
+    可以实时查看进度，被杀后也能续算。结束 (或被 TERM) 时只把 retain 中声明、且本次有更新的产物复制回来，
+    其余临时文件 (.rwf / .tmp / .densities ...) 随目录删除；keep_failed 时失败任务的目录保留排查，
+    超过 max_age_h 后由 prune() 清理。
+    """
+    SUBDIR = "gibbs_scratch"   # root 可能是 /dev/shm 这类公共目录，只在这个子目录里建 / 删
+
+    def __init__(self, root: Optional[str] = None, retain: Optional[List[str]] = None,
+                 keep_failed: Optional[bool] = None, max_age_h: Optional[float] = None,
+                 sample_interval: Optional[float] = None):
+        self.root = f"{str(root or config.SCRATCH_DIR).rstrip('/')}/{self.SUBDIR}"
+        self.retain = list(config.SCRATCH_RETAIN if retain is None else retain)
+        self.keep_failed = config.SCRATCH_KEEP_FAILED if keep_failed is None else keep_failed
+        self.max_age_h = config.SCRATCH_MAX_AGE_H if max_age_h is None else max_age_h
+        self.sample_interval = config.SCRATCH_SAMPLE_INTERVAL if sample_interval is None else sample_interval
+        # 本次运行的累计量 (字节)
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.peak_scratch = 0
+
+    @staticmethod
+    def stats_file(job_file: Path) -> Path:
+        return job_file.parent / f".{job_file.stem}.stage"
+
+    def stage_files(self, job_file: Path) -> List[Path]:
+        """需要复制到 scratch 的文件：输入 + 同名前缀的波函数 (如 <mol>_opt.chk、<mol>_opt.r1.gbw)"""
+        files = [job_file]
+        for p in sorted(job_file.parent.glob(f"{job_file.stem}*")):
+            if p.suffix in self.retain and p.is_file(): files.append(p)
+        return files
+
+    def wrap(self, cmd_template: str, job_file: Path, output_file: Path) -> Tuple[str, int]:
+        """生成在 scratch 中运行 cmd_template 的 shell 命令，返回 (命令, 复制进去的字节数)"""
+        work = job_file.parent.resolve()
+        files = self.stage_files(job_file)
+        size = sum(p.stat().st_size for p in files)
+        cmd = cmd_template.format(input=shlex.quote(job_file.name),
+                                  output=shlex.quote(str(output_file.resolve())))
+        script = _WRAPPER.format(
+            root=self.root.replace('"', '\\"'), stem=job_file.stem, work=shlex.quote(str(work)),
+            patterns="|".join(f"*{s}" for s in self.retain) or "''",
+            stats=shlex.quote(str(self.stats_file(job_file.resolve()))),
+            keep=int(bool(self.keep_failed)), interval=f"{self.sample_interval:g}",
+            files=" ".join(shlex.quote(str(p.resolve())) for p in files), cmd=cmd)
+        self.bytes_in += size
+        return script, size
+
+    def collect(self, job_file: Path) -> Dict[str, int]:
+        """读取包装脚本留下的统计 (scratch 峰值、复制回来的字节数)，累加到本次运行的总量"""
+        stats = self.stats_file(job_file)
+        try:
+            kb, out = (int(v) for v in stats.read_text().split()[:2])
+            stats.unlink()
+        except (OSError, ValueError):
+            return {}
+        self.bytes_out += out
+        self.peak_scratch = max(self.peak_scratch, kb * 1024)
+        return {"out": out, "scratch": kb * 1024}
+
+    def local_root(self) -> Optional[Path]:
+        """root 在本机上可解析时返回路径 (Slurm 的 $TMPDIR 等只在执行节点上存在)"""
+        root = os.path.expandvars(self.root)
+        return Path(root) if "$" not in root and os.path.isdir(root) else None
+
+    def usage(self) -> int:
+        """本机 scratch 中任务目录的当前总占用 (字节)"""
+        root = self.local_root()
+        if root is None: return 0
+        total = 0
+        for dirpath, _, names in os.walk(root):
+            for n in names:
+                try: total += os.lstat(os.path.join(dirpath, n)).st_size
+                except OSError: pass
+        return total
+
+    def prune(self, active: Iterable[str] = ()) -> int:
+        """删除本机 scratch 中超过 max_age_h 的任务目录 (保留的失败现场、被 SIGKILL 后遗留的)，返回删除数"""
+        root = self.local_root()
+        if root is None: return 0
+        cutoff = time.time() - self.max_age_h * 3600
+        active, n = set(active), 0
+        for p in root.iterdir():
+            if not p.is_dir() or p.name.rsplit(".", 1)[0] in active: continue
+            try:
+                if p.stat().st_mtime > cutoff: continue
+            except OSError:
+                continue
+            shutil.rmtree(p, ignore_errors=True)
+            n += 1
+        return n
@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+class StateStore(ABC):
+    """
+    StatusTracker 的持久化后端。
+    Tracker 按分子粒度记录脏键，批量调用 write(changes, data)：
+    changes 里 value 为 None 表示删除该键，data 是完整的当前状态（仅整文件后端需要）。
+    """
+    @abstractmethod
+    def load(self) -> Dict[str, Any]: pass
+
+    @abstractmethod
+    def write(self, changes: Dict[str, Optional[Any]], data: Dict[str, Any]): pass
+
+    def close(self): pass
+
+
+def _fsync_replace(tmp: Path, target: Path):
+    """已写好的临时文件落盘后原子替换目标文件"""
+    with open(tmp, 'rb+') as f: os.fsync(f.fileno())
+    os.replace(tmp, target)
+
+
+def _quarantine(path: Path):
+    """损坏的状态文件改名保留，不再静默丢弃"""
+    bad = path.with_name(f"{path.name}.corrupt-{int(time.time())}")
+    os.replace(path, bad)
+    print(f"  ⚠️ Warning: {path.name} is corrupt, moved to {bad.name}")
+
+
+class JsonFileStore(StateStore):
+    """兼容旧格式的 task_status.json：每次批量写入都整文件重写，但改为原子替换"""
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    def load(self) -> Dict[str, Any]:
+        if not self.path.exists(): return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f: return json.load(f)
+        except json.JSONDecodeError:
+            _quarantine(self.path)
+            return {}
+
+    def write(self, changes, data):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        _fsync_replace(tmp, self.path)
+
+
+class JournalStore(StateStore):
+    """
+    追加式 JSONL 日志：每行 {"k": 键, "v": 记录}（v 为 null 表示删除），
+    每次状态变化只追加一行 (O(1) I/O)。日志行数超过存活键的若干倍时压缩为快照。
+    崩溃时最多丢失最后一行不完整的记录，加载时会被跳过。
+    """
+    def __init__(self, path: Path, compact_factor: int = 4, min_compact: int = 1000):
+        self.path = Path(path)
+        self.compact_factor = compact_factor
+        self.min_compact = min_compact
+        self.lines = 0
+        self._fh = None
+
+    def load(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {}
+        if not self.path.exists(): return data
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try: entry = json.loads(line)
+                except json.JSONDecodeError: continue  # 崩溃时写了一半的行
+                self.lines += 1
+                if entry.get("v") is None: data.pop(entry.get("k"), None)
+                else: data[entry["k"]] = entry["v"]
+        if self.lines > max(self.min_compact, self.compact_factor * len(data)):
+            self.compact(data)
+        return data
+
+    def write(self, changes, data):
+        if self._fh is None: self._fh = open(self.path, 'a', encoding='utf-8')
+        self._fh.write("".join(json.dumps({"k": k, "v": v}, ensure_ascii=False) + "\n"
+                               for k, v in changes.items()))
+        self._fh.flush()
+        os.fsync(self._fh.fileno())
+        self.lines += len(changes)
+        if self.lines > max(self.min_compact, self.compact_factor * len(data)):
+            self.compact(data)
+
+    def compact(self, data: Dict[str, Any]):
+        """把当前状态重写为一行一键的快照，原子替换旧日志"""
+        self.close()
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            for k, v in data.items():
+                f.write(json.dumps({"k": k, "v": v}, ensure_ascii=False) + "\n")
+        _fsync_replace(tmp, self.path)
+        self.lines = len(data)
+
+    def close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+
+class SQLiteStore(StateStore):
+    """SQLite (WAL 模式)：每个分子一行，批量变化在一个事务里 upsert"""
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.conn.commit()
+
+    def load(self) -> Dict[str, Any]:
+        return {k: json.loads(v) for k, v in self.conn.execute("SELECT key, value FROM state")}
+
+    def write(self, changes, data):
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO state (key, value) VALUES (?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+                [(k, json.dumps(v, ensure_ascii=False)) for k, v in changes.items() if v is not None])
+            self.conn.executemany("DELETE FROM state WHERE key = ?",
+                                  [(k,) for k, v in changes.items() if v is None])
+
+    def close(self):
+        self.conn.close()
+
+
+BACKENDS = {"json": (JsonFileStore, ".json"), "journal": (JournalStore, ".jsonl"), "sqlite": (SQLiteStore, ".db")}
+
+def open_store(backend: str, path: Path) -> StateStore:
+    """按名称创建后端；文件后缀随后端变化 (task_status.json / .jsonl / .db)"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown state backend: {backend} (choose from {', '.join(BACKENDS)})")
+    cls, suffix = BACKENDS[backend]
+    return cls(Path(path).with_suffix(suffix))
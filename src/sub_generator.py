@@ -1,34 +1,58 @@
 # src/sub_generator.py
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple
 from . import config
+from .parsers import ParsedOutput
+from .result_cache import ResultCache
+from .templates import find_template, load_template
+
+# 打包模式下各程序串联子任务的分隔行
+PACK_SEPARATORS = {".gjf": "\n--Link1--\n", ".inp": "\n$new_job\n"}
+
+
+def pack_dir() -> Path:
+    """打包输入 / 合并输出所在目录"""
+    return config.DATA_DIR / "pack"
+
 
 class SubGenerator:
     """
     专门负责：基于优化结果，批量生成子任务 (Gas, Solv, SP)
     """
-    def __init__(self):
+    def __init__(self, cache: Optional[ResultCache] = None):
         self.template_dir = config.TEMPLATE_DIR
+        self.cache = cache
+
+    def generate_from_record(self, base_name: str, record: ParsedOutput,
+                             tasks: Optional[List[str]] = None, packed: bool = False) -> List[Path]:
+        """基于优化任务的 ParsedOutput 记录生成子任务"""
+        if record.coordinates is None:
+            raise ValueError("No coordinates found")
+        return self.generate_all(base_name, record.charge, record.mult, record.coordinates, tasks, packed)
 
-    def generate_all(self, base_name: str, charge: int, mult: int, coords: str) -> List[Path]:
+    def _find_template(self, task: str) -> Tuple[Optional[Path], Optional[str]]:
+        return find_template(task, self.template_dir)
+
+    def generate_all(self, base_name: str, charge: int, mult: int, coords: str,
+                     tasks: Optional[List[str]] = None, packed: bool = False) -> List[Path]:
         """
-        主入口：生成 gas, solv, sp 三个输入文件
+        主入口：生成 gas, solv, sp 三个输入文件 (tasks 可只生成其中一部分)
+        packed=True 时改为生成一个串联全部子任务的输入 (见 generate_packed)，
+        模板不属于同一程序时退回逐个生成。
+        有结果缓存时，命中的子任务同时恢复输出文件 (调用方据此跳过提交)。
         返回生成的文件路径列表
         """
+        if packed:
+            job = self.generate_packed(base_name, charge, mult, coords, tasks)
+            if job is not None: return [job[0]]
+
         generated_files = []
-        tasks = ["gas", "solv", "sp"]
-        
+        tasks = tasks or ["gas", "solv", "sp"]
+
         for task in tasks:
             # 1. 找对应模板
-            template_path = None
-            ext = None
-            for e in config.VALID_EXTENSIONS:
-                p = self.template_dir / f"{task}{e}"
-                if p.exists():
-                    template_path = p
-                    ext = e
-                    break
-            
+            template_path, ext = self._find_template(task)
+
             # 如果某个模板不存在(比如不想算solv)，记录警告但不中断其他
             if not template_path:
                 print(f"  ⚠️ Warning: Template for '{task}' not found. Skipping.")
@@ -37,22 +61,46 @@ class SubGenerator:
             # 2. 准备输出
             output_dir = config.DIRS[task]
             output_dir.mkdir(parents=True, exist_ok=True)
-            
+
             new_filename = f"{base_name}_{task}"
             output_file = output_dir / f"{new_filename}{ext}"
-            
-            # 3. 替换内容
-            with open(template_path, 'r', encoding='utf-8') as t:
-                content = t.read()
-            
-            new_content = content.replace("[NAME]", new_filename)
-            new_content = new_content.replace("[Charge]", str(charge))
-            new_content = new_content.replace("[Multiplicity]", str(mult))
-            new_content = new_content.replace("[GEOMETRY]", coords)
-            
+
+            # 3. 替换内容 (模板编译一次，按 mtime 缓存)
+            template = load_template(template_path)
             with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(new_content)
-            
+                f.write(template.render(new_filename, charge, mult, coords))
+            if self.cache: self.cache.lookup(template.text, charge, mult, coords, output_file.with_suffix(".out"))
+
             generated_files.append(output_file)
-            
-        return generated_files
\ No newline at end of file
+
+        return generated_files
+
+    def generate_packed(self, base_name: str, charge: int, mult: int, coords: str,
+                        tasks: Optional[List[str]] = None) -> Optional[Tuple[Path, List[str]]]:
+        """
+        打包模式：把子任务串联成一个输入 (Gaussian --Link1-- / ORCA $new_job)，
+        一个分子只启动一次程序。返回 (输入文件, 按顺序包含的子任务)；
+        缺模板的子任务跳过，模板不属于同一程序或一个都不需要运行时返回 None。
+        """
+        found = [(t, *self._find_template(t)) for t in tasks or ["gas", "solv", "sp"]]
+        found = [(t, p, e) for t, p, e in found if p is not None]
+        exts = {e for _, _, e in found}
+        if len(exts) != 1: return None
+        ext = exts.pop()
+
+        # 命中结果缓存的子任务直接恢复输出，不再打包
+        templates = {t: load_template(p) for t, p, _ in found}
+        if self.cache:
+            found = [(t, p, e) for t, p, e in found if not self.cache.lookup(
+                templates[t].text, charge, mult, coords, config.DIRS[t] / f"{base_name}_{t}.out")]
+            if not found: return None
+
+        blocks = [templates[t].render(f"{base_name}_{t}", charge, mult, coords).strip("\n") for t, _, _ in found]
+        # Gaussian 每个子任务的输入必须以空行结束
+        sep = ("\n" if ext == ".gjf" else "") + PACK_SEPARATORS[ext]
+        out_dir = pack_dir()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        output_file = out_dir / f"{base_name}_pack{ext}"
+        with open(output_file, 'w', encoding='utf-8') as f:
+            f.write(sep.join(blocks) + "\n\n")
+        return output_file, [t for t, _, _ in found]
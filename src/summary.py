@@ -0,0 +1,103 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+from .parsers import ParsedOutput, parse_output, is_compressed
+
+# 摘要格式版本：ParsedOutput 字段变化时递增，旧摘要自动视为过期
+SUMMARY_VERSION = 2
+SUMMARY_SUFFIX = ".summary.json"
+
+
+def summary_path(output: Path) -> Path:
+    """x.out / x.log / x.out.gz -> x.summary.json (与输出同目录)"""
+    if is_compressed(output): output = output.with_suffix("")
+    return output.with_suffix(SUMMARY_SUFFIX)
+
+
+def _stamp(output: Path) -> Optional[List[int]]:
+    try: st = output.stat()
+    except OSError: return None
+    return [st.st_size, st.st_mtime_ns]
+
+
+def write_summary(output: Path, record: ParsedOutput) -> Optional[Path]:
+    """
+    把已结束任务的完整解析记录 (含坐标与频率) 原子写到摘要文件，
+    同时记下输出文件的 (大小, mtime)；输出被改写后摘要自动失效。
+    """
+    stamp = _stamp(output)
+    if stamp is None: return None
+    target = summary_path(output)
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({"version": SUMMARY_VERSION, "source": output.name, "stat": stamp,
+                   "record": record.to_dict()}, f, ensure_ascii=False)
+    os.replace(tmp, target)
+    return target
+
+
+def read_summary(output: Path) -> Optional[ParsedOutput]:
+    """摘要存在、版本一致且与输出文件匹配时返回记录，否则返回 None (调用方回退到解析)"""
+    try:
+        with open(summary_path(output), 'r', encoding='utf-8') as f: raw = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if raw.get("version") != SUMMARY_VERSION or raw.get("source") != output.name: return None
+    if raw.get("stat") != _stamp(output): return None
+    try: return ParsedOutput.from_dict(raw["record"])
+    except (KeyError, TypeError): return None
+
+
+def retarget_summary(old: Path, new: Path) -> bool:
+    """输出换了文件但内容不变 (例如被压缩)：摘要改为指向新文件"""
+    record = read_summary(old)
+    if record is None: return False
+    return write_summary(new, record) is not None
+
+
+def is_terminal(record: ParsedOutput) -> bool:
+    """只为已经结束 (正常或报错) 的输出写摘要；运行中的输出还会继续变化"""
+    return record.finished or record.failed
+
+
+def load_record(output: Path) -> ParsedOutput:
+    """优先读摘要；没有或已过期时解析输出，已结束的顺便写出摘要"""
+    record = read_summary(output)
+    if record is not None: return record
+    record = parse_output(output)
+    if is_terminal(record): write_summary(output, record)
+    return record
+
+
+def _rebuild_one(output: str, force: bool) -> str:
+    path = Path(output)
+    if not force and read_summary(path) is not None: return "fresh"
+    try: record = parse_output(path)
+    except Exception: return "failed"
+    if not is_terminal(record): return "skipped"
+    return "written" if write_summary(path, record) else "failed"
+
+
+def find_outputs(dirs: Iterable[Path]) -> List[Path]:
+    """目录 (递归) 中的全部输出文件：*.out / *.log 及其压缩版本 (含续算归档，不含 Slurm 日志)"""
+    outputs = []
+    for d in dirs:
+        if not d.exists(): continue
+        for p in d.rglob("*"):
+            name = p.name[:-len(p.suffix)] if is_compressed(p) else p.name
+            if p.is_file() and name.endswith((".out", ".log")) and not name.endswith(".slurm.log"):
+                outputs.append(p)
+    return sorted(outputs)
+
+
+def rebuild_summaries(dirs: Iterable[Path], workers: Optional[int] = None, force: bool = False) -> Dict[str, int]:
+    """为已有目录树并行 (多进程) 重建摘要；返回 {written / fresh / skipped / failed: 数量}"""
+    outputs = [str(p) for p in find_outputs(dirs)]
+    counts = {"written": 0, "fresh": 0, "skipped": 0, "failed": 0}
+    if not outputs: return counts
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for result in pool.map(_rebuild_one, outputs, [force] * len(outputs), chunksize=16):
+            counts[result] += 1
+    return counts
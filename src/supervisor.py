@@ -0,0 +1,124 @@
+import asyncio
+import concurrent.futures
+import os
+import signal
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+
+class ChildProcess:
+    """
+    ProcessSupervisor 启动的子进程句柄。
+    接口与 subprocess.Popen 常用部分一致 (pid / poll / wait / kill)，
+    退出码来自事件循环中的 await proc.wait()，poll() 不做任何系统调用。
+    """
+    def __init__(self, pid: int, exit_future: "concurrent.futures.Future[int]"):
+        self.pid = pid
+        self.exit_future = exit_future
+
+    @property
+    def returncode(self) -> Optional[int]:
+        if not self.exit_future.done(): return None
+        try: return self.exit_future.result()
+        except Exception: return -1
+
+    def poll(self) -> Optional[int]:
+        return self.returncode
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        try: self.exit_future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            raise subprocess.TimeoutExpired(str(self.pid), timeout)
+        return self.returncode
+
+    def kill(self):
+        try: os.kill(self.pid, signal.SIGKILL)
+        except ProcessLookupError: pass
+
+    def add_done_callback(self, fn: Callable[["ChildProcess"], None]):
+        self.exit_future.add_done_callback(lambda _f: fn(self))
+
+
+class ProcessSupervisor:
+    """
+    在后台线程里运行一个 asyncio 事件循环，负责启动并等待子进程退出：
+    * 子进程退出由事件循环的 child watcher 直接通知 (Python 3.12+ 为 pidfd)，
+      不再每 0.5 秒轮询一次；
+    * 耗时显示等周期性刷新由独立的定时器 (every) 驱动，与进程回收互不影响；
+    * 每个任务通过 start_new_session (setsid) 运行在独立进程组中，可以 killpg。
+    协程接口 spawn / run 可供并发调度器直接 await；start 供普通线程调用。
+    """
+    def __init__(self, tick: float = 1.0):
+        self.tick = tick
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._tick_callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    # ================= 事件循环 =================
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self.loop is None:
+                loop = asyncio.new_event_loop()
+                ready = threading.Event()
+
+                def _run():
+                    asyncio.set_event_loop(loop)
+                    loop.call_soon(ready.set)
+                    loop.create_task(self._ticker())
+                    loop.run_forever()
+                    # close() 之后：取消定时器等残留任务并关闭循环
+                    pending = asyncio.all_tasks(loop)
+                    for t in pending: t.cancel()
+                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+                    loop.close()
+
+                self.thread = threading.Thread(target=_run, name="process-supervisor", daemon=True)
+                self.thread.start()
+                ready.wait()
+                self.loop = loop
+            return self.loop
+
+    async def _ticker(self):
+        while True:
+            await asyncio.sleep(self.tick)
+            for fn in list(self._tick_callbacks):
+                try: fn()
+                except Exception: pass
+
+    def every(self, fn: Callable[[], None]):
+        """注册定时回调，在事件循环线程中每 tick 秒调用一次"""
+        self._tick_callbacks.append(fn)
+
+    def close(self):
+        with self._lock:
+            loop, self.loop = self.loop, None
+        if loop is None: return
+        loop.call_soon_threadsafe(loop.stop)
+        if self.thread: self.thread.join(timeout=2)
+
+    # ================= 协程接口 =================
+    @staticmethod
+    async def spawn(cmd: str, cwd: Path) -> asyncio.subprocess.Process:
+        # start_new_session=True 等价于 preexec_fn=os.setsid：新进程组，可整体 killpg
+        return await asyncio.create_subprocess_shell(
+            cmd, cwd=str(cwd),
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True)
+
+    async def run(self, cmd: str, cwd: Path) -> int:
+        """启动并等待结束，返回退出码"""
+        proc = await self.spawn(cmd, cwd)
+        return await proc.wait()
+
+    # ================= 线程接口 =================
+    def start(self, cmd: str, cwd: Path,
+              on_exit: Optional[Callable[[ChildProcess], None]] = None) -> ChildProcess:
+        """在事件循环中启动子进程并立即返回句柄；启动失败时在调用线程中抛出异常"""
+        loop = self._ensure_loop()
+        proc = asyncio.run_coroutine_threadsafe(self.spawn(cmd, cwd), loop).result()
+        child = ChildProcess(proc.pid, asyncio.run_coroutine_threadsafe(proc.wait(), loop))
+        if on_exit: child.add_done_callback(on_exit)
+        return child
@@ -1,6 +1,8 @@
 from pathlib import Path
+from typing import Dict, Tuple
 from . import config
 from .job_manager import JobManager
+from .parsers import find_output
 
 class TaskSweeper:
     """
@@ -9,26 +11,27 @@ class TaskSweeper:
     def __init__(self, manager: JobManager):
         self.manager = manager
         self.root_dir = config.SWEEPER_DIR
+        # 最近一次 scan 发现的待运行任务 (mol_name, step) -> 输入文件，供调度队列增量同步
+        self.pending: Dict[Tuple[str, str], Path] = {}
 
     def purge_ghost_jobs(self):
         """清理 Tracker 中有记录但实际文件已不存在的 Extra 任务"""
         tracker = self.manager.tracker
         if not tracker: return
 
-        extra_keys = [k for k in tracker.data.keys() if k.startswith("[Extra]")]
+        extra_keys = [k for k in tracker.snapshot().records if k.startswith("[Extra]")]
         keys_to_remove = []
         for key in extra_keys:
             stem = key.replace("[Extra]", "")
             has_input = any((self.root_dir / f"{stem}{ext}").exists() for ext in config.VALID_EXTENSIONS)
-            has_output = any((self.root_dir / f"{stem}{ext}").exists() for ext in [".out", ".log"])
+            has_output = find_output(self.root_dir / stem) is not None
             
             if not has_input and not has_output:
                 keys_to_remove.append(key)
         
         if keys_to_remove:
-            for k in keys_to_remove:
-                if k in tracker.data: del tracker.data[k]
-            tracker.save_data()
+            with tracker.batch():
+                for k in keys_to_remove: tracker.remove(k)
 
     def scan(self):
         """扫描所有 Extra 任务并更新状态到 Tracker"""
@@ -37,6 +40,7 @@ class TaskSweeper:
         if not tracker: return
 
         self.purge_ghost_jobs()
+        self.pending = {}
         if not self.root_dir.exists(): return
 
         all_jobs = list(self.root_dir.rglob("*.gjf")) + list(self.root_dir.rglob("*.inp"))
@@ -47,45 +51,20 @@ class TaskSweeper:
 
             mol_name = f"[Extra]{job.stem}"
             step_name = job.parent.name if job.parent != self.root_dir else "root"
+            if self.manager.is_running(mol_name, step_name): continue
             
-            # 检查输出文件
-            out_file = job.with_suffix(".out")
-            if not out_file.exists():
-                out_file = job.with_suffix(".log")
+            # 检查输出文件 (.out / .log，含压缩版本)
+            out_file = find_output(job.with_suffix("")) or job.with_suffix(".out")
             
             # 获取状态
             status, err = self.manager.get_status_from_file(out_file)
+            self.manager.compress_output(out_file, status)
             
             # 更新 Tracker (使用已确认非 None 的 tracker 变量)
             tracker.finish_task(mol_name, step_name, status, err)
+            if status == "MISSING": self.pending[(mol_name, step_name)] = job
 
-    def run(self) -> bool:
-        """
-        寻找并执行一个新任务。
-        """
-        self.purge_ghost_jobs()
-
-        if not self.root_dir.exists(): return False
-
-        all_jobs = list(self.root_dir.rglob("*.gjf")) + list(self.root_dir.rglob("*.inp"))
-        all_jobs.sort(key=lambda x: x.stat().st_mtime, reverse=False)
-
-        if not all_jobs: return False
-
-        IGNORE_KEYWORDS = [".scfgrad", ".ctx", ".tmp", ".opt"] 
-
-        for job in all_jobs:
-            if any(k in job.name for k in IGNORE_KEYWORDS): continue
-
-            mol_name = f"[Extra]{job.stem}"
-            step_name = job.parent.name if job.parent != self.root_dir else "root"
-
-            out_file = job.with_suffix(".out")
-            status, _ = self.manager.get_status_from_file(out_file)
-
-            if status == "MISSING":
-                # print(f"\n🧹 Sweeper found new job: {job.name}") 
-                success = self.manager.submit_and_wait(job, mol_name, step_name)
-                return True
-            
-        return False
\ No newline at end of file
+    def launch(self, job: Path, mol_name: str, step_name: str) -> bool:
+        """非阻塞启动单个任务 (由调度队列调用)"""
+        if not self.manager.has_capacity(self.manager.job_cores(job)): return False
+        return self.manager.submit(job, mol_name, step_name)
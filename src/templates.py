@@ -0,0 +1,50 @@
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from . import config
+
+_PLACEHOLDER_RE = re.compile(r"\[(NAME|Charge|Multiplicity|GEOMETRY)\]")
+
+
+class Template:
+    """编译后的输入模板：按占位符预先切分，渲染时只做一次拼接"""
+    __slots__ = ("text", "parts")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.parts = _PLACEHOLDER_RE.split(text)  # 偶数位是原文，奇数位是占位符名
+
+    def render(self, name: str, charge: int, mult: int, coords: str) -> str:
+        values = {"NAME": name, "Charge": str(charge), "Multiplicity": str(mult), "GEOMETRY": coords}
+        parts = list(self.parts)
+        parts[1::2] = [values[k] for k in parts[1::2]]
+        return "".join(parts)
+
+
+_CACHE: Dict[str, Tuple[Tuple[int, int], Template]] = {}
+_LOCK = threading.Lock()
+
+
+def load_template(path: Path) -> Template:
+    """读取并编译模板，按 (mtime_ns, size) 缓存；模板被修改后下次调用自动重新编译"""
+    st = path.stat()
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = str(path)
+    with _LOCK:
+        hit = _CACHE.get(key)
+        if hit is not None and hit[0] == stamp: return hit[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        tpl = Template(f.read())
+    with _LOCK:
+        _CACHE[key] = (stamp, tpl)
+    return tpl
+
+
+def find_template(task: str, template_dir: Optional[Path] = None) -> Tuple[Optional[Path], Optional[str]]:
+    """按 VALID_EXTENSIONS 顺序查找 <task>.gjf / <task>.inp，返回 (路径, 扩展名)"""
+    template_dir = template_dir or config.TEMPLATE_DIR
+    for e in config.VALID_EXTENSIONS:
+        p = template_dir / f"{task}{e}"
+        if p.exists(): return p, e
+    return None, None
@@ -1,39 +1,162 @@
-import json
+import threading
 import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Any, List
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional, Set, Tuple
+from . import config
+from .storage import open_store
+
+@dataclass(frozen=True)
+class Snapshot:
+    """某个版本的只读状态：records 为 {分子: 记录}，记录按写时复制，持有期间不会再被修改"""
+    version: int
+    records: Mapping[str, Mapping[str, Any]]
+    order: Tuple[str, ...]
+    order_version: int
+
 
 class StatusTracker:
-    def __init__(self, log_file: str = "task_status.json"):
-        self.log_file = Path(log_file)
+    """
+    任务状态表。写入 (工作流线程) 在锁内进行，每次修改替换整条分子记录 (写时复制)，
+    并把全局版本号加一、记下该分子最后变化的版本；读者 (界面、导出、监控) 无需加锁即可
+    读取单条记录，遍历用 snapshot()，增量消费用 changes_since(version) 或 subscribe()。
+    """
+    def __init__(self, log_file: str = "task_status.json", backend: Optional[str] = None):
+        self.store = open_store(backend or config.TRACKER_BACKEND, Path(log_file))
+        self.log_file = self.store.path
         self.data = self._load_data()
+        self._dirty: set = set()   # 待写盘的分子键
+        self._batch_depth = 0
         self.current_msg = "Initializing..."
+        self.job_msgs: Dict[str, str] = {}  # 每个运行中槽位一条消息
         self.xyz_order = [] 
+        self.order_version = 0
+        # 版本：每条记录最后变化的版本，按变化先后排列 (删除的分子保留为墓碑，值为 None)
+        self._lock = threading.RLock()
+        self.version = 0
+        self._versions: "OrderedDict[str, int]" = OrderedDict()
+        self._pending: Set[str] = set()     # 尚未通知订阅者的分子键 (批次结束时一并通知)
+        self._subscribers: List[Callable[[int, Set[str]], None]] = []
+        self._snapshot: Optional[Snapshot] = None
 
     def _load_data(self) -> Dict[str, Any]:
-        if self.log_file.exists():
-            try:
-                with open(self.log_file, 'r', encoding='utf-8') as f: return json.load(f)
-            except json.JSONDecodeError: return {}
-        return {}
+        return self.store.load()
 
     def save_data(self):
-        with open(self.log_file, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, indent=4, ensure_ascii=False)
+        """把所有脏记录交给后端写盘 (同一批次内多次修改同一分子只写一次)，然后通知订阅者"""
+        with self._lock:
+            if self._dirty:
+                changes = {k: self.data.get(k) for k in self._dirty}
+                self._dirty.clear()
+                self.store.write(changes, self.data)
+            keys, self._pending = self._pending, set()
+            version, subscribers = self.version, list(self._subscribers)
+        if keys:
+            for callback in subscribers: callback(version, keys)
+
+    def _commit(self, mol_name: str, record: Optional[Dict[str, Any]]):
+        """发布分子的新记录 (None = 删除)；调用方持有锁。不在批次中时立即写盘"""
+        if record is None: self.data.pop(mol_name, None)
+        else: self.data[mol_name] = record
+        self.version += 1
+        self._versions[mol_name] = self.version
+        self._versions.move_to_end(mol_name)
+        self._dirty.add(mol_name)
+        self._pending.add(mol_name)
+        if self._batch_depth == 0: self.save_data()
+
+    def _edit(self, mol_name: str, step: Optional[str] = None):
+        """写时复制：返回 (分子记录副本, 步骤记录副本, 步骤是否新建)；副本提交前旧记录保持不变"""
+        record = dict(self.data.get(mol_name, {}))
+        if step is None: return record, None, False
+        created = step not in record
+        info = {"status": "PENDING", "start_time": None, "duration_str": "", "error": ""} if created else dict(record[step])
+        record[step] = info
+        return record, info, created
+
+    # ================= 读者接口 =================
+    def get(self, mol_name: str, step: Optional[str] = None) -> Mapping[str, Any]:
+        """单条记录 (不加锁；记录按写时复制，不会读到修改了一半的状态)"""
+        record = self.data.get(mol_name, {})
+        return record.get(step, {}) if step is not None else record
+
+    def snapshot(self) -> Snapshot:
+        """当前状态的只读快照；同一版本重复调用返回同一个对象"""
+        with self._lock:
+            snap = self._snapshot
+            if snap is None or snap.version != self.version or snap.order_version != self.order_version:
+                snap = Snapshot(self.version, MappingProxyType(dict(self.data)), tuple(self.xyz_order), self.order_version)
+                self._snapshot = snap
+            return snap
+
+    def changes_since(self, version: int) -> Tuple[int, Set[str]]:
+        """(当前版本, 版本 > version 以来变化过的分子键)；只遍历变化过的记录"""
+        with self._lock:
+            keys = set()
+            for key in reversed(self._versions):
+                if self._versions[key] <= version: break
+                keys.add(key)
+            return self.version, keys
+
+    def subscribe(self, callback: Callable[[int, Set[str]], None]) -> Callable[[], None]:
+        """
+        变化通知：每次写盘 (批次结束或单次修改) 后以 (版本, 变化的分子键) 调用 callback，
+        在写入线程中执行，应尽快返回。返回取消订阅的函数。
+        """
+        with self._lock: self._subscribers.append(callback)
+        def unsubscribe():
+            with self._lock:
+                if callback in self._subscribers: self._subscribers.remove(callback)
+        return unsubscribe
+
+    @contextmanager
+    def batch(self):
+        """批量模式：块内的所有修改合并，在退出时一次性写盘"""
+        with self._lock: self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self._batch_depth -= 1
+                flush = self._batch_depth == 0
+            if flush: self.save_data()
+
+    def close(self):
+        self.save_data()
+        self.store.close()
 
     def set_running_msg(self, msg: str):
         self.current_msg = msg
 
+    def set_job_msg(self, key: str, msg: str):
+        self.job_msgs[key] = msg
+
+    def clear_job_msg(self, key: str):
+        self.job_msgs.pop(key, None)
+
+    def status_line(self) -> str:
+        """状态栏文本：有任务在跑时列出所有 RUNNING 槽位，否则显示全局消息"""
+        msgs = list(self.job_msgs.values())
+        if not msgs: return self.current_msg
+        return f"Running ({len(msgs)}): " + " | ".join(msgs)
+
     def set_order(self, order_list: List[str]):
-        self.xyz_order = order_list
+        with self._lock:
+            if order_list == self.xyz_order: return
+            self.xyz_order = list(order_list)
+            self.order_version += 1
 
     def start_task(self, mol_name: str, step: str):
-        self._ensure_record(mol_name, step)
-        self.data[mol_name][step]["status"] = "RUNNING"
-        self.data[mol_name][step]["start_time"] = time.time()
-        # 任务重新开始时，也可以选择清空错误信息
-        self.data[mol_name][step]["error"] = "" 
-        self.save_data()
+        with self._lock:
+            record, info, _ = self._edit(mol_name, step)
+            info["status"] = "RUNNING"
+            info["start_time"] = time.time()
+            # 任务重新开始时，也可以选择清空错误信息
+            info["error"] = "" 
+            self._commit(mol_name, record)
 
     @staticmethod
     def format_duration(seconds: float) -> str:
@@ -45,42 +168,48 @@ class StatusTracker:
         return f"{s}s"
 
     def finish_task(self, mol_name: str, step: str, status: str, error_msg: str = ""):
-        self._ensure_record(mol_name, step)
-        record = self.data[mol_name][step]
-        
-        old_status = record.get("status", "PENDING")
-        
-        # 仅当任务“真正”刚跑完时（RUNNING -> DONE/ERROR），才结算时间
-        if old_status == "RUNNING" and status != "RUNNING":
-            start_t = record.get("start_time")
-            if start_t:
-                duration = time.time() - start_t
-                record["duration_str"] = self.format_duration(duration)
-        
-        record["status"] = status
-        
-        # --- 修复：无条件更新 error 字段 ---
-        # 这样当任务成功(error_msg为空)时，旧的报错信息会被清除
-        record["error"] = error_msg 
-        
-        self.save_data()
+        with self._lock:
+            current = self.get(mol_name, step)
+            # 状态与报错都没变就不产生写入 (每轮全量扫描绝大多数都是这种情况)
+            if current and current.get("status", "PENDING") == status and current.get("error") == error_msg: return
+            record, info, _ = self._edit(mol_name, step)
+            old_status = info.get("status", "PENDING")
+            
+            # 仅当任务“真正”刚跑完时（RUNNING -> DONE/ERROR），才结算时间
+            if old_status == "RUNNING" and status != "RUNNING":
+                start_t = info.get("start_time")
+                if start_t:
+                    duration = time.time() - start_t
+                    info["duration_str"] = self.format_duration(duration)
+            
+            info["status"] = status
+            
+            # --- 修复：无条件更新 error 字段 ---
+            # 这样当任务成功(error_msg为空)时，旧的报错信息会被清除
+            info["error"] = error_msg 
+            
+            self._commit(mol_name, record)
 
     def set_result(self, mol_name: str, g_val: float):
-        if mol_name not in self.data: self.data[mol_name] = {}
-        self.data[mol_name]["result_g"] = g_val
-        self.save_data()
+        with self._lock:
+            if self.get(mol_name).get("result_g") == g_val and mol_name in self.data: return
+            record, _, _ = self._edit(mol_name)
+            record["result_g"] = g_val
+            self._commit(mol_name, record)
         
     def mark_xyz_missing(self, mol_name: str):
-        if mol_name not in self.data: self.data[mol_name] = {}
-        self.data[mol_name]["xyz_missing"] = True
-        self.save_data()
+        with self._lock:
+            record, _, _ = self._edit(mol_name)
+            record["xyz_missing"] = True
+            self._commit(mol_name, record)
 
     def mark_xyz_found(self, mol_name: str):
-        if mol_name in self.data and self.data[mol_name].get("xyz_missing"):
-            self.data[mol_name]["xyz_missing"] = False
-            self.save_data()
-
-    def _ensure_record(self, mol_name, step):
-        if mol_name not in self.data: self.data[mol_name] = {}
-        if step not in self.data[mol_name]:
-            self.data[mol_name][step] = {"status": "PENDING", "start_time": None, "duration_str": "", "error": ""}
\ No newline at end of file
+        with self._lock:
+            if not self.get(mol_name).get("xyz_missing"): return
+            record, _, _ = self._edit(mol_name)
+            record["xyz_missing"] = False
+            self._commit(mol_name, record)
+
+    def remove(self, mol_name: str):
+        with self._lock:
+            if mol_name in self.data: self._commit(mol_name, None)
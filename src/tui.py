@@ -1,18 +1,187 @@
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+from rich.table import Table
 from textual.app import App, ComposeResult
-from textual.widgets import Header, Footer, DataTable, Static, Label
-from textual.containers import Container
+from textual.binding import Binding
+from textual.widget import Widget
+from textual.widgets import Header, Footer, Static, Label
 from textual import work
-from typing import List
-import threading
+from .tracker import Snapshot
 
-class GibbsApp(App):
-    """一个现代化的 Btop 风格终端界面"""
-    
-    CSS = """
-    DataTable {
+# 行状态标志 (筛选用)
+RUNNING, ERROR = 1, 2
+FILTERS = ("all", "errors", "running")
+
+
+@dataclass(frozen=True)
+class Row:
+    cells: Tuple[str, ...]
+    flags: int = 0
+    g: Optional[float] = None       # 主表按 G 排序
+    status: str = ""                # 清扫表按状态排序
+
+
+def _status_flags(st: str) -> int:
+    if st == "RUNNING": return RUNNING
+    if st.startswith("ERR") or st == "ERROR": return ERROR
+    return 0
+
+
+class TableModel:
+    """
+    表格的紧凑索引：每个行键一条已格式化的 Row。
+    只有变化的行被重新格式化；筛选 / 排序只在这个索引上做，并且只在成员、
+    排序字段或状态标志真的变化时才重建视图；界面只渲染视图中的可见窗口。
+    """
+    SORTS: Dict[str, Callable[[str, Row], object]] = {
+        "name": lambda k, r: k,
+        "G": lambda k, r: (r.g is None, r.g or 0.0),
+        "status": lambda k, r: (-r.flags, r.status, k),
+    }
+
+    def __init__(self, sorts: Iterable[str] = ("natural", "name")):
+        self.rows: Dict[str, Row] = {}
+        self.natural: Optional[List[str]] = None     # 自然顺序 (None = 按键名)
+        self.sorts = tuple(sorts)
+        self.sort, self.filter = self.sorts[0], FILTERS[0]
+        self.view: List[str] = []
+        self._view_dirty = True
+        self.cursor = 0             # 光标在视图中的位置
+        self.offset = 0             # 可见窗口起点
+        self.height = 20
+        self.version = 0            # 可见内容的版本号，界面据此决定是否重绘
+
+    # ---------- 增量更新 ----------
+    def update(self, changes: Dict[str, Optional[Row]]):
+        """{行键: 新行 (None = 删除)}；只有可见窗口内的变化或视图变化才会触发重绘"""
+        visible = set(self.window_keys()) if not self._view_dirty else set()
+        redraw = False
+        for key, row in changes.items():
+            old = self.rows.get(key)
+            if row is None:
+                if old is None: continue
+                del self.rows[key]
+                self._view_dirty = True
+                continue
+            if old == row: continue
+            self.rows[key] = row
+            if old is None or (self._reorders() and (old.flags, old.g, old.status) != (row.flags, row.g, row.status)):
+                self._view_dirty = True
+            redraw = redraw or key in visible
+        if redraw or self._view_dirty: self.version += 1
+
+    def set_natural(self, order: Optional[List[str]]):
+        self.natural = order
+        self._view_dirty = True
+        self.version += 1
+
+    def _reorders(self) -> bool:
+        """当前筛选 / 排序是否依赖行内容"""
+        return self.filter != "all" or self.sort != "natural"
+
+    # ---------- 筛选 / 排序 ----------
+    def cycle_filter(self):
+        self.filter = FILTERS[(FILTERS.index(self.filter) + 1) % len(FILTERS)]
+        self._view_dirty, self.cursor = True, 0
+        self.version += 1
+
+    def cycle_sort(self):
+        self.sort = self.sorts[(self.sorts.index(self.sort) + 1) % len(self.sorts)]
+        self._view_dirty = True
+        self.version += 1
+
+    def _rebuild(self):
+        if self.sort == "natural":
+            keys = [k for k in self.natural if k in self.rows] if self.natural is not None else sorted(self.rows)
+        else:
+            fn = self.SORTS[self.sort]
+            keys = sorted(self.rows, key=lambda k: fn(k, self.rows[k]))
+        want = {"all": 0, "errors": ERROR, "running": RUNNING}[self.filter]
+        self.view = [k for k in keys if self.rows[k].flags & want] if want else keys
+        self._view_dirty = False
+        self.move(0)
+
+    # ---------- 可见窗口 ----------
+    def move(self, delta: int, absolute: Optional[int] = None):
+        n = len(self.view)
+        cursor = self.cursor + delta if absolute is None else absolute
+        self.cursor = max(0, min(cursor, n - 1)) if n else 0
+        if self.cursor < self.offset: self.offset = self.cursor
+        elif self.cursor >= self.offset + self.height: self.offset = self.cursor - self.height + 1
+        self.offset = max(0, min(self.offset, max(0, n - self.height)))
+        self.version += 1
+
+    def resize(self, height: int):
+        if height != self.height:
+            self.height = max(1, height)
+            self.move(0)
+
+    def window_keys(self) -> List[str]:
+        if self._view_dirty: self._rebuild()
+        return self.view[self.offset:self.offset + self.height]
+
+    def selected(self) -> Optional[str]:
+        if self._view_dirty: self._rebuild()
+        return self.view[self.cursor] if self.view else None
+
+
+class VirtualTable(Widget, can_focus=True):
+    """只渲染可见窗口的表格：行数据来自 TableModel，版本号变化时才重绘"""
+    DEFAULT_CSS = """
+    VirtualTable {
         height: 1fr;
         border: solid green;
     }
+    VirtualTable:focus {
+        border: heavy green;
+    }
+    """
+    BINDINGS = [
+        Binding("up", "move(-1)", show=False), Binding("down", "move(1)", show=False),
+        Binding("pageup", "page(-1)", show=False), Binding("pagedown", "page(1)", show=False),
+        Binding("home", "jump(0)", show=False), Binding("end", "jump(-1)", show=False),
+        ("f", "filter", "Filter"), ("o", "sort", "Sort"),
+    ]
+
+    def __init__(self, columns: List[str], model: TableModel, **kwargs):
+        super().__init__(**kwargs)
+        self.columns = columns
+        self.model = model
+        self._drawn = -1
+
+    def on_resize(self):
+        self.model.resize(self.content_size.height - 1)    # 减去表头
+
+    def sync(self):
+        if self.model.version != self._drawn: self.refresh()
+
+    def render(self):
+        m = self.model
+        keys = m.window_keys()
+        self._drawn = m.version
+        table = Table(box=None, expand=True, show_edge=False, pad_edge=False)
+        for c in self.columns: table.add_column(c, no_wrap=True)
+        for i, key in enumerate(keys):
+            style = "reverse" if self.has_focus and m.offset + i == m.cursor else ""
+            table.add_row(*m.rows[key].cells, style=style)
+        n = len(m.view)
+        self.border_subtitle = (f"{m.offset + 1}-{m.offset + len(keys)} of {n}" if n else "0 rows") + \
+            f" | filter: {m.filter} | sort: {m.sort}"
+        return table
+
+    def action_move(self, delta: int): self.model.move(delta); self.sync()
+    def action_page(self, sign: int): self.model.move(sign * self.model.height); self.sync()
+    def action_jump(self, pos: int): self.model.move(0, absolute=pos if pos >= 0 else len(self.model.view) - 1); self.sync()
+    def action_filter(self): self.model.cycle_filter(); self.sync()
+    def action_sort(self): self.model.cycle_sort(); self.sync()
+    def on_focus(self): self.refresh()
+    def on_blur(self): self.refresh()
+
+
+class GibbsApp(App):
+    """一个现代化的 Btop 风格终端界面"""
+
+    CSS = """
     Label {
         background: $boost;
         color: auto;
@@ -28,10 +197,11 @@ class GibbsApp(App):
         padding-left: 1;
     }
     """
-    
+
     BINDINGS = [
         ("q", "quit", "Quit"),
-        ("s", "stop_task", "Stop Current Task")
+        ("s", "stop_task", "Stop Selected Task"),
+        ("x", "stop_all", "Stop All Tasks")
     ]
 
     def __init__(self, workflow_func, tracker, job_manager, stop_event):
@@ -40,155 +210,142 @@ class GibbsApp(App):
         self.tracker = tracker
         self.job_manager = job_manager
         self.stop_event = stop_event
-        self.processed_mains = set()
-        self.processed_sweeps = set()
-        self.main_col_keys = []
-        self.sweep_col_keys = []
-        # 缓存用于防闪烁
-        self.render_cache = {} 
+        # 事件驱动：只处理 tracker 报告变化的分子，表格只渲染可见窗口
+        self.main_model = TableModel(sorts=("natural", "name", "G", "status"))
+        self.sweep_model = TableModel(sorts=("natural", "status"))
+        self.sweep_keys: Dict[str, Set[str]] = {}   # [Extra] 分子 -> 它在清扫表中的行键
+        self.order_version = -1
+        self.seen_version = 0                       # 已经显示到的 tracker 版本
+        self.status_text = ""
 
     def compose(self) -> ComposeResult:
         yield Header(show_clock=True)
         yield Label("🔹 Main Workflow (Gibbs Energy)")
-        yield DataTable(id="main_table", zebra_stripes=True)
+        yield VirtualTable(["MOLECULE", "OPT", "GAS", "SOLV", "SP", "G(kcal)"], self.main_model, id="main_table")
         yield Label("🧹 Sweeper Tasks (Extra Jobs)")
-        yield DataTable(id="sweep_table", zebra_stripes=True)
+        yield VirtualTable(["JOB NAME", "STEP", "STATUS", "DURATION", "INFO"], self.sweep_model, id="sweep_table")
         yield Static(id="status_bar", content="Initializing...")
         yield Footer()
 
     def on_mount(self) -> None:
-        main_table = self.query_one("#main_table", DataTable)
-        main_table.cursor_type = "row"
-        self.main_col_keys = main_table.add_columns("MOLECULE", "OPT", "GAS", "SOLV", "SP", "G(kcal)")
-        
-        sweep_table = self.query_one("#sweep_table", DataTable)
-        sweep_table.cursor_type = "row"
-        self.sweep_col_keys = sweep_table.add_columns("JOB NAME", "STEP", "STATUS", "DURATION", "INFO")
-        
+        snap = self.tracker.snapshot()
+        self.seen_version = snap.version
+        self.apply_changes(snap, set(snap.records), full=True)
         self.set_interval(0.5, self.update_table)
         self.run_workflow()
 
     @work(thread=True)
     def run_workflow(self):
         self.workflow_func()
-        
+
+    def _selected_row_key(self):
+        """返回当前获得焦点的表格中光标所在行的 key"""
+        table = self.focused
+        if not isinstance(table, VirtualTable): return None
+        return table.model.selected()
+
     def action_stop_task(self):
-        self.job_manager.stop_current_job()
-        self.query_one("#status_bar", Static).update("⚠️ Sending Kill Signal...")
+        """停止光标所在行的任务：主表按分子停止，清扫表按 mol::step 槽位停止"""
+        key = self._selected_row_key()
+        if key is None:
+            n = 0
+        elif "::" in key:
+            n = int(self.job_manager.stop_job(key))
+        else:
+            n = self.job_manager.stop_mol_jobs(key)
+        msg = f"⚠️ Sending Kill Signal to {key}..." if n else "⚠️ Selected row has no running task (press x to stop all)"
+        self.query_one("#status_bar", Static).update(msg)
+
+    def action_stop_all(self):
+        self.job_manager.stop_all_jobs()
+        self.query_one("#status_bar", Static).update("⚠️ Sending Kill Signal to all tasks...")
 
     async def action_quit(self):
         if self.stop_event:
             self.stop_event.set()
-        self.job_manager.stop_current_job()
+        self.job_manager.stop_all_jobs(deliberate=False)
         self.exit()
 
-    def _smart_update(self, table: DataTable, row_key: str, col_keys: list, new_cells: list):
-        for i, content in enumerate(new_cells):
-            if i >= len(col_keys): break
-            col_key = col_keys[i]
-            cache_key = (row_key, str(col_key))
-            if self.render_cache.get(cache_key) != content:
-                table.update_cell(row_key, col_key, content)
-                self.render_cache[cache_key] = content
-
+    # ================= 增量刷新 =================
     def update_table(self):
-        main_table = self.query_one("#main_table", DataTable)
-        sweep_table = self.query_one("#sweep_table", DataTable)
-        status_bar = self.query_one("#status_bar", Static)
-        
-        status_bar.update(f"⏳ {self.tracker.current_msg}")
-        data = self.tracker.data
-        
-        # === 1. Main Table ===
-        order = self.tracker.xyz_order
-        if not order:
-            mains = sorted([k for k in data.keys() if not k.startswith("[Extra]")])
-        else:
-            mains = order 
-
-        current_main_rows = set() # 记录本轮存在的行
-        
-        for mol in mains:
-            mol_info = data.get(mol, {})
-            if mol_info.get("xyz_missing"):
-                mol_disp = f"[red][X] {mol}[/red]"
-            else:
-                mol_disp = f"[cyan]{mol}[/cyan]"
-
-            cells = [mol_disp]
-            opt = mol_info.get("opt", {})
-            cells.append(self._fmt_status(opt))
-            is_opt_ok = (opt.get("status") == "DONE")
-            for step in ["gas", "solv", "sp"]:
-                if not is_opt_ok and opt.get("status") != "RUNNING":
-                    cells.append("[dim]-[/dim]")
-                else:
-                    cells.append(self._fmt_status(mol_info.get(step, {})))
-            res = mol_info.get("result_g")
-            cells.append(f"[bold white]{res:.2f}[/]" if res else "")
+        text = f"⏳ {self.tracker.status_line()}"
+        if text != self.status_text:
+            self.status_text = text
+            self.query_one("#status_bar", Static).update(text)
+        self.seen_version, changed = self.tracker.changes_since(self.seen_version)
+        if changed or self.tracker.order_version != self.order_version:
+            self.apply_changes(self.tracker.snapshot(), changed)
+        for table in self.query(VirtualTable): table.sync()
 
-            row_key = mol
-            current_main_rows.add(row_key) # 标记存在
+    def apply_changes(self, snap: Snapshot, changed: Set[str], full: bool = False):
+        """把快照中变化的分子格式化为行并交给两张表的模型；xyz 顺序变化时重建主表成员"""
+        data, order = snap.records, snap.order
+        main: Dict[str, Optional[Row]] = {}
+        if full or snap.order_version != self.order_version:
+            self.order_version = snap.order_version
+            # 有 xyz 顺序时主表就是这些分子 (包括还没有记录的)，否则是全部非 [Extra] 记录
+            members = set(order) if order else {k for k in data if not k.startswith("[Extra]")}
+            main.update({k: None for k in self.main_model.rows if k not in members})
+            main.update({k: self.main_row(k, data.get(k, {})) for k in members
+                         if k not in self.main_model.rows and k not in changed})
+            self.main_model.set_natural(list(order) if order else None)
+        in_order = set(order) if order else None
+        for mol in changed:
+            if mol.startswith("[Extra]"):
+                self.sweep_model.update(self.sweep_rows(mol, data.get(mol)))
+            elif mol in data and (in_order is None or mol in in_order):
+                main[mol] = self.main_row(mol, data[mol])
+            elif in_order is None or mol in in_order:
+                main[mol] = None if in_order is None else self.main_row(mol, {})
+        self.main_model.update(main)
 
-            if row_key in self.processed_mains:
-                self._smart_update(main_table, row_key, self.main_col_keys, cells)
+    def main_row(self, mol: str, mol_info: Mapping) -> Row:
+        mol_disp = f"[red][X] {mol}[/red]" if mol_info.get("xyz_missing") else f"[cyan]{mol}[/cyan]"
+        cells = [mol_disp]
+        opt = mol_info.get("opt", {})
+        cells.append(self._fmt_status(opt))
+        is_opt_ok = (opt.get("status") == "DONE")
+        flags = _status_flags(opt.get("status", ""))
+        for step in ["gas", "solv", "sp"]:
+            if not is_opt_ok and opt.get("status") != "RUNNING":
+                cells.append("[dim]-[/dim]")
             else:
-                main_table.add_row(*cells, key=row_key)
-                self.processed_mains.add(row_key)
-
-        # --- 新增：主表行删除逻辑 ---
-        # 如果 processed_mains 里有，但 current_main_rows 里没有，说明任务被删了
-        removed_mains = self.processed_mains - current_main_rows
-        for row_key in removed_mains:
-            main_table.remove_row(row_key)
-        self.processed_mains -= removed_mains
-
-
-        # === 2. Sweep Table ===
-        extras = sorted([k for k in data.keys() if k.startswith("[Extra]")])
-        current_sweep_rows = set() # 记录本轮存在的行
-
-        for mol in extras:
-            mol_info = data.get(mol, {})
-            clean_name = mol.replace("[Extra]", "")
-            
-            for step, info in mol_info.items():
-                if step in ["xyz_missing", "result_g"]: continue
-                if not isinstance(info, dict): continue
-                
-                row_key = f"{mol}::{step}"
-                current_sweep_rows.add(row_key) # 标记存在
-
-                status_str = self._fmt_status(info)
-                dur = info.get("duration_str", "")
-                err = info.get("error", "")
-                
-                cells = [
-                    f"[magenta]{clean_name}[/]", step, status_str, dur, 
-                    f"[red]{err}[/]" if err else ""
-                ]
-
-                if row_key in self.processed_sweeps:
-                    self._smart_update(sweep_table, row_key, self.sweep_col_keys, cells)
-                else:
-                    sweep_table.add_row(*cells, key=row_key)
-                    self.processed_sweeps.add(row_key)
-
-        # --- 新增：清扫表行删除逻辑 ---
-        removed_sweeps = self.processed_sweeps - current_sweep_rows
-        for row_key in removed_sweeps:
-            sweep_table.remove_row(row_key)
-        self.processed_sweeps -= removed_sweeps
+                info = mol_info.get(step, {})
+                cells.append(self._fmt_status(info))
+                flags |= _status_flags(info.get("status", ""))
+        res = mol_info.get("result_g")
+        calc = mol_info.get("calc", {})
+        if calc.get("status") == "ERROR":
+            cells.append(f"[red]calc: {calc.get('error', '')}[/]")
+            flags |= ERROR
+        else:
+            cells.append(f"[bold white]{res:.2f}[/]" if res else "")
+        return Row(tuple(cells), flags, res)
 
+    def sweep_rows(self, mol: str, mol_info: Optional[Mapping]) -> Dict[str, Optional[Row]]:
+        """一个 [Extra] 分子的全部步骤行；消失的步骤 (或整个分子) 对应的行删除"""
+        rows: Dict[str, Optional[Row]] = {}
+        clean_name = mol.replace("[Extra]", "")
+        for step, info in (mol_info or {}).items():
+            if step in ["xyz_missing", "result_g"]: continue
+            if not isinstance(info, dict): continue
+            err = info.get("error", "")
+            st = info.get("status", "PENDING")
+            rows[f"{mol}::{step}"] = Row((f"[magenta]{clean_name}[/]", step, self._fmt_status(info),
+                                          info.get("duration_str", ""), f"[red]{err}[/]" if err else ""),
+                                         _status_flags(st), status=st)
+        for key in self.sweep_keys.get(mol, set()) - set(rows): rows[key] = None
+        self.sweep_keys[mol] = {k for k, r in rows.items() if r is not None}
+        return rows
 
     def _fmt_status(self, info):
         st = info.get("status", "PENDING")
         dur = info.get("duration_str", "")
         err = info.get("error", "")
-        
+
         if st == "DONE": return f"[green]DONE {dur}[/]"
         if st == "RUNNING": return f"[yellow]RUNNING...[/]"
         if st.startswith("ERR") or st == "ERROR":
             disp = f"{st}: {err}" if err else st
             return f"[red]{disp}[/]"
-        return "[dim]PENDING[/]"
\ No newline at end of file
+        return "[dim]PENDING[/]"
@@ -0,0 +1,209 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# ================= inotify 常量 (linux/inotify.h) =================
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+
+# 只关心"文件写完/出现/消失"，不订阅 IN_MODIFY，避免运行中的任务每写一行就唤醒一次
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+
+class Inotify:
+    """libc inotify 的最小 ctypes 封装"""
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+
+    def add_watch(self, path: Path, mask: int = WATCH_MASK) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(str(path)), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), str(path))
+        return wd
+
+    def read_events(self) -> List[Tuple[int, int, str]]:
+        """读出当前所有待处理事件 (wd, mask, name)"""
+        events = []
+        while True:
+            try: buf = os.read(self.fd, 64 * 1024)
+            except BlockingIOError: break
+            pos = 0
+            while pos + _EVENT.size <= len(buf):
+                wd, mask, _cookie, length = _EVENT.unpack_from(buf, pos)
+                pos += _EVENT.size
+                name = buf[pos:pos + length].rstrip(b"\0").decode(errors="replace")
+                pos += length
+                events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+class BaseWatcher:
+    """
+    目录监视器公共接口：wait(timeout) 阻塞到有文件变化、被 wake() 唤醒或超时，
+    返回变化文件的路径集合；返回 None 表示事件可能丢失，调用方应全量扫描。
+    """
+    name = "base"
+
+    def __init__(self, dirs: Iterable[Path], recursive: Iterable[Path] = ()):
+        self.dirs = [Path(d) for d in dirs]
+        self.recursive = [Path(d) for d in recursive]
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+
+    def wake(self):
+        try: os.write(self._wake_w, b"x")
+        except OSError: pass
+
+    def _drain_wake(self):
+        try:
+            while os.read(self._wake_r, 4096): pass
+        except BlockingIOError: pass
+
+    def wait(self, timeout: Optional[float]) -> Optional[Set[Path]]:
+        raise NotImplementedError
+
+    def close(self):
+        for fd in (self._wake_r, self._wake_w):
+            try: os.close(fd)
+            except OSError: pass
+
+
+class InotifyWatcher(BaseWatcher):
+    """Linux inotify：空闲时阻塞在 select 上，没有任何轮询开销"""
+    name = "inotify"
+    DEBOUNCE = 0.05  # 收到第一个事件后稍等片刻，把一批写入合并成一次唤醒
+
+    def __init__(self, dirs, recursive=()):
+        super().__init__(dirs, recursive)
+        self.inotify = Inotify()
+        self.wd_paths: Dict[int, Path] = {}
+        self.overflow = False
+        for d in self.dirs: self._watch(d)
+        for d in self.recursive: self._watch_tree(d)
+
+    def _watch(self, path: Path):
+        if not path.is_dir(): return
+        try: self.wd_paths[self.inotify.add_watch(path)] = path
+        except OSError: self.overflow = True  # 例如 max_user_watches 用尽，退化为全量扫描
+
+    def _watch_tree(self, root: Path):
+        self._watch(root)
+        if root.is_dir():
+            for sub in root.rglob("*"):
+                if sub.is_dir(): self._watch(sub)
+
+    def _collect(self, changed: Set[Path]):
+        for wd, mask, name in self.inotify.read_events():
+            if mask & IN_Q_OVERFLOW: self.overflow = True; continue
+            if mask & IN_IGNORED: self.wd_paths.pop(wd, None); continue
+            parent = self.wd_paths.get(wd)
+            if parent is None: continue
+            path = parent / name if name else parent
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                # 递归目录里新建的子目录也要加监视，并把其中已有的文件视为新增
+                if any(parent == r or r in parent.parents for r in self.recursive):
+                    self._watch_tree(path)
+                    changed.update(p for p in path.rglob("*") if p.is_file())
+                continue
+            changed.add(path)
+
+    def wait(self, timeout):
+        changed: Set[Path] = set()
+        ready, _, _ = select.select([self.inotify.fd, self._wake_r], [], [], timeout)
+        if self._wake_r in ready: self._drain_wake()
+        if self.inotify.fd in ready:
+            time.sleep(self.DEBOUNCE)
+            self._collect(changed)
+        if self.overflow:
+            self.overflow = False
+            return None
+        return changed
+
+    def close(self):
+        self.inotify.close()
+        super().close()
+
+
+class PollingWatcher(BaseWatcher):
+    """
+    非 Linux / inotify 不可用时的回退：比较目录快照 (mtime_ns, size)，
+    采用自适应退避——有变化时回到最短间隔，长时间无变化时逐步拉长到上限。
+    """
+    name = "poll"
+
+    def __init__(self, dirs, recursive=(), min_interval: float = 0.25, max_interval: float = 2.0):
+        super().__init__(dirs, recursive)
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.interval = min_interval
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        snap = {}
+        entries = [(d, False) for d in self.dirs] + [(d, True) for d in self.recursive]
+        for d, rec in entries:
+            if not d.is_dir(): continue
+            it = d.rglob("*") if rec else d.iterdir()
+            for p in it:
+                try: st = p.stat()
+                except OSError: continue
+                if not p.is_dir(): snap[p] = (st.st_mtime_ns, st.st_size)
+        return snap
+
+    def wait(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            step = self.interval if deadline is None else min(self.interval, max(0.0, deadline - time.monotonic()))
+            ready, _, _ = select.select([self._wake_r], [], [], step)
+            woken = bool(ready)
+            if woken: self._drain_wake()
+            new = self._snapshot()
+            changed = {p for p in new.keys() | self.snapshot.keys() if new.get(p) != self.snapshot.get(p)}
+            self.snapshot = new
+            if changed:
+                self.interval = self.min_interval
+                return changed
+            self.interval = min(self.interval * 2, self.max_interval)
+            if woken or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+
+def create_watcher(dirs: Iterable[Path], recursive: Iterable[Path] = (), mode: str = "auto") -> BaseWatcher:
+    """mode: "inotify" / "poll" / "auto" (Linux 上优先 inotify，失败则回退轮询)"""
+    if mode not in ("auto", "inotify", "poll"):
+        raise ValueError(f"Unknown watch mode: {mode}")
+    if mode != "poll" and sys.platform.startswith("linux"):
+        try: return InotifyWatcher(dirs, recursive)
+        except (OSError, AttributeError):
+            if mode == "inotify": raise
+    elif mode == "inotify":
+        raise OSError("inotify is only available on Linux")
+    return PollingWatcher(dirs, recursive)
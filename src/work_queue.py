@@ -0,0 +1,136 @@
+import heapq
+import itertools
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+# 文件名前缀指定优先级：P10_name.xyz / p-5_job.gjf
+_PREFIX_RE = re.compile(r"^[Pp](-?\d+)_")
+PRIORITY_SUFFIX = ".prio"
+
+
+def file_priority(path: Path, default: int = 0) -> int:
+    """
+    读取单个文件的优先级 (数值越大越先运行)：
+    1. 旁车文件 <stem>.prio，内容为一个整数 (可随时修改，无需改名)；
+    2. 文件名前缀 P<n>_；
+    都没有时返回 default。
+    """
+    sidecar = path.with_suffix(PRIORITY_SUFFIX)
+    try:
+        return int(sidecar.read_text().split()[0])
+    except (OSError, ValueError, IndexError):
+        pass
+    m = _PREFIX_RE.match(path.name)
+    return int(m.group(1)) if m else default
+
+
+@dataclass
+class QueueEntry:
+    cls: str
+    key: Hashable
+    priority: int
+    enqueued_at: float
+    payload: Any = None
+    seq: int = field(default=0, compare=False)
+
+
+class WorkQueue:
+    """
+    带优先级、加权公平共享和老化的就绪队列，按条目增量维护 (push / discard)。
+
+    * 类内：有效优先级 = priority + aging × 已等待小时数，高者先出；
+      因为所有条目以相同速率老化，排序键 priority - aging × enqueued_at 不随时间变化，
+      可以直接用堆，不需要周期性重排。
+    * 类间 (main / extra)：按权重做 stride 调度，每次派发把占用的核数记到该类的
+      虚拟时间上，总是从虚拟时间/权重最小的非空类取任务；
+      类从空变为非空时虚拟时间追平其他活跃类，不能靠空闲期"攒额度"。
+    """
+    def __init__(self, weights: Optional[Dict[str, float]] = None, aging_per_hour: float = 1.0,
+                 clock: Callable[[], float] = time.time):
+        self.weights = dict(weights or {"main": 3.0, "extra": 1.0})
+        self.aging = aging_per_hour / 3600.0
+        self.clock = clock
+        self.entries: Dict[Hashable, QueueEntry] = {}
+        self.heaps: Dict[str, List] = {c: [] for c in self.weights}
+        self.counts: Dict[str, int] = {c: 0 for c in self.weights}
+        self.vtime: Dict[str, float] = {c: 0.0 for c in self.weights}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def effective_priority(self, e: QueueEntry, now: Optional[float] = None) -> float:
+        return e.priority + self.aging * ((now or self.clock()) - e.enqueued_at)
+
+    # ================= 增量维护 =================
+    def push(self, cls: str, key: Hashable, priority: int = 0, payload: Any = None,
+             enqueued_at: Optional[float] = None) -> QueueEntry:
+        """加入或更新条目；已在队列中时保留原入队时间，老化不会因重复 push 而清零"""
+        old = self.entries.get(key)
+        if old is not None and old.cls == cls and old.priority == priority:
+            old.payload = payload
+            return old
+        if old is not None: self.discard(key)
+        if self.counts[cls] == 0: self._activate(cls)
+        if enqueued_at is None: enqueued_at = old.enqueued_at if old else self.clock()
+        e = QueueEntry(cls, key, priority, enqueued_at, payload, next(self._seq))
+        self.entries[key] = e
+        self.counts[cls] += 1
+        heapq.heappush(self.heaps[cls], (-(priority - self.aging * e.enqueued_at), e.enqueued_at, e.seq, e))
+        return e
+
+    def discard(self, key: Hashable) -> bool:
+        """移除条目 (堆中惰性删除)"""
+        e = self.entries.pop(key, None)
+        if e is None: return False
+        self.counts[e.cls] -= 1
+        heap = self.heaps[e.cls]
+        if len(heap) > 2 * self.counts[e.cls] + 64:
+            # 失效条目过多时重建堆，防止长时间运行后堆无限增长
+            heap[:] = [item for item in heap if self.entries.get(item[3].key) is item[3]]
+            heapq.heapify(heap)
+        return True
+
+    def _activate(self, cls: str):
+        active = [self.vtime[c] / self.weights[c] for c in self.weights if c != cls and self.counts[c]]
+        if active: self.vtime[cls] = max(self.vtime[cls], min(active) * self.weights[cls])
+
+    # ================= 取出 =================
+    def peek(self, cls: str) -> Optional[QueueEntry]:
+        heap = self.heaps[cls]
+        while heap:
+            e = heap[0][3]
+            if self.entries.get(e.key) is e: return e
+            heapq.heappop(heap)  # 已删除或已被更新的旧条目
+        return None
+
+    def class_order(self) -> List[str]:
+        """非空类按 虚拟时间/权重 升序 (最欠服务的类在前)"""
+        return sorted((c for c in self.weights if self.counts[c]), key=lambda c: self.vtime[c] / self.weights[c])
+
+    def pop_next(self, can_run: Callable[[QueueEntry], bool] = lambda e: True) -> Optional[QueueEntry]:
+        """
+        按公平共享顺序取各类的队首，返回第一个 can_run 为真的条目。
+        类内不越过队首去找更小的任务 (不回填)，大任务不会被小任务无限期插队。
+        """
+        for cls in self.class_order():
+            e = self.peek(cls)
+            if e is not None and can_run(e):
+                self.discard(e.key)
+                return e
+        return None
+
+    def charge(self, cls: str, amount: float = 1.0):
+        """记录某类占用的资源 (通常为核数)"""
+        self.vtime[cls] += amount
+
+    def snapshot(self) -> List[QueueEntry]:
+        """按类内有效优先级排序的全部条目 (用于显示)"""
+        now = self.clock()
+        return sorted(self.entries.values(), key=lambda e: (-self.effective_priority(e, now), e.enqueued_at))
@@ -0,0 +1,124 @@
+import os
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+_CM_RE = re.compile(r"Charge\s*=\s*(-?\d+)\s+Multiplicity\s*=\s*(\d+)", re.IGNORECASE)
+_CM_LOOSE_RE = re.compile(r"Charge\s*=\s*(-?\d+).*?Mult.*?\=\s*(\d+)", re.IGNORECASE)
+
+
+def parse_charge_mult(comment: str) -> Optional[Tuple[int, int]]:
+    """从注释行解析 Charge = X Multiplicity = Y，没有时返回 None"""
+    m = _CM_RE.search(comment) or _CM_LOOSE_RE.search(comment)
+    return (int(m.group(1)), int(m.group(2))) if m else None
+
+
+@dataclass(frozen=True)
+class XyzFrame:
+    index: int          # 帧序号 (从 0 开始)
+    comment: str
+    coords: str         # 元素 x y z 行，已去掉首尾空白
+
+    @property
+    def n_atoms(self) -> int:
+        return self.coords.count("\n") + 1 if self.coords else 0
+
+    @property
+    def charge_mult(self) -> Optional[Tuple[int, int]]:
+        return parse_charge_mult(self.comment)
+
+
+def _atom_count(line: str) -> Optional[int]:
+    parts = line.split()
+    if len(parts) != 1: return None
+    try: return int(parts[0])
+    except ValueError: return None
+
+
+def iter_frames(path: Path) -> Iterator[XyzFrame]:
+    """
+    逐帧流式读取 (多帧) XYZ：每帧 = 原子数行 + 注释行 + 原子行，内存只占一帧。
+    兼容旧的单帧写法：第一行不是原子数，或原子数写少了时，
+    多出来的行 (直到下一个原子数行) 都归入当前帧，与原先 "第 3 行以后都是坐标" 一致。
+    """
+    index, comment, coords = -1, "", None  # type: int, str, Optional[list]
+    with open(path, 'r', encoding='utf-8', errors='replace') as f:
+        lines = iter(f)
+        for line in lines:
+            if not line.strip(): continue
+            n = _atom_count(line)
+            if n is None and coords is not None:
+                coords.append(line.strip())
+                continue
+            if coords is not None: yield XyzFrame(index, comment, "\n".join(coords))
+            index += 1
+            comment, coords = next(lines, "").strip(), []
+            for _ in range(n or 0):
+                atom = next(lines, None)
+                if atom is None: break
+                if atom.strip(): coords.append(atom.strip())
+    if coords is not None: yield XyzFrame(index, comment, "\n".join(coords))
+
+
+def first_frame(path: Path) -> XyzFrame:
+    frame = next(iter_frames(path), None)
+    if frame is None: raise ValueError(f"XYZ file {path.name} is empty.")
+    return frame
+
+
+def is_ensemble(path: Path) -> bool:
+    """只读到第二帧的开头即可判断是否多帧"""
+    frames = iter_frames(path)
+    try: return next(frames, None) is not None and next(frames, None) is not None
+    finally: frames.close()
+
+
+class EnsembleIngestor:
+    """
+    把 xyz/ 中的多帧系综 (构象搜索结果) 展开成 <名字>_confNNN.xyz，每帧一个分子，
+    原文件移到 xyz/ensembles/ 留档。逐帧流式读写，几千帧也只占一帧的内存。
+    已确认是单帧的文件按 (mtime_ns, size) 记住，之后的扫描不再重复打开。
+    """
+    ARCHIVE = "ensembles"
+
+    def __init__(self, xyz_dir: Path):
+        self.xyz_dir = xyz_dir
+        self.single: Dict[str, Tuple[int, int]] = {}
+
+    def expand(self, paths) -> int:
+        """检查这些 xyz，展开其中的多帧文件；返回新写出的帧数"""
+        written = 0
+        for p in paths:
+            try: st = p.stat()
+            except OSError: continue
+            stamp = (st.st_mtime_ns, st.st_size)
+            if self.single.get(str(p)) == stamp: continue
+            try:
+                if not is_ensemble(p):
+                    self.single[str(p)] = stamp
+                    continue
+                written += self.split(p)
+            except (OSError, ValueError) as e:
+                print(f"  ⚠️ Warning: cannot expand ensemble {p.name}: {e}")
+        return written
+
+    def split(self, path: Path) -> int:
+        """逐帧写出 <stem>_confNNN.xyz (编号从 1 开始)；缺电荷/多重度的帧沿用前一帧的"""
+        cm = None
+        n = 0
+        for frame in iter_frames(path):
+            cm = frame.charge_mult or cm
+            if cm is None:
+                raise ValueError("first frame has no 'Charge=X Multiplicity=Y' in its comment line")
+            comment = frame.comment if frame.charge_mult else f"Charge={cm[0]} Multiplicity={cm[1]} {frame.comment}"
+            target = self.xyz_dir / f"{path.stem}_conf{frame.index + 1:03d}.xyz"
+            tmp = target.with_name(target.name + ".tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                f.write(f"{frame.n_atoms}\n{comment.strip()}\n{frame.coords}\n")
+            os.replace(tmp, target)
+            n += 1
+        archive = self.xyz_dir / self.ARCHIVE
+        archive.mkdir(exist_ok=True)
+        os.replace(path, archive / path.name)
+        return n